@@ -1,7 +1,15 @@
+import atexit
 import logging
 import json
+import queue
+import threading
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler
 from pathlib import Path
+from typing import Optional, List
+
+LOGS_DIR = Path(__file__).parent.parent.parent / "logs"
 
 
 class JsonFormatter(logging.Formatter):
@@ -12,24 +20,152 @@ class JsonFormatter(logging.Formatter):
             "event": record.getMessage()
         }
 
+        if hasattr(record, 'agent_id'):
+            log_data["agent_id"] = record.agent_id
         if hasattr(record, 'data'):
             log_data.update(record.data)
 
         return json.dumps(log_data)
 
 
-def setup_agent_logger(agent_id: str) -> logging.Logger:
-    project_root = Path(__file__).parent.parent.parent
-    logs_dir = project_root / "logs"
-    logs_dir.mkdir(exist_ok=True)
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records arriving while the queue is full are
+    counted and dropped."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AgentLogSink:
+    """
+    One log file shared by every agent in the process.
+
+    Agents only put records on a bounded queue; a background thread formats
+    them as JSON lines and writes them in batches, flushing at least every
+    flush_interval seconds. The file is rotated once it passes max_bytes or
+    is older than rotate_seconds.
+    """
+
+    _STOP = object()
+
+    def __init__(self, logs_dir: Path = LOGS_DIR, max_bytes: int = 50 * 1024 * 1024,
+                 rotate_seconds: float = 3600, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 100_000):
+        self.logs_dir = Path(logs_dir)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.formatter = JsonFormatter()
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.written = 0
+
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Writes out everything already queued, then stops the writer."""
+        if not self._thread.is_alive():
+            return
+        self.queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[logging.LogRecord] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            if batch:
+                self._write(batch)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                self.handler.handleError(record)
+        data = ("\n".join(lines) + "\n").encode()
+
+        if self._should_rotate(len(data)):
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(lines)
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if self._file is None:
+            return True
+        if self._file_bytes and self._file_bytes + incoming > self.max_bytes:
+            return True
+        return time.monotonic() - self._file_opened > self.rotate_seconds
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%d,%m,%Y_%H,%M,%S_%f')
+        self._file = open(self.logs_dir / f"agents_{stamp}.log", "ab")
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+
+
+class AgentLogger(logging.LoggerAdapter):
+    """Tags every record with the agent's id and keeps the caller's extra."""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**kwargs.get("extra", {}), "agent_id": self.extra["agent_id"]}
+        return msg, kwargs
+
+
+_sink: Optional[AgentLogSink] = None
+_sink_lock = threading.Lock()
+
 
-    logger = logging.getLogger(f"agent.{agent_id}")
-    logger.setLevel(logging.INFO)
+def get_agent_sink() -> AgentLogSink:
+    """The process-wide sink behind the "agent" logger, started on first use."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = AgentLogSink()
+            base = logging.getLogger("agent")
+            base.setLevel(logging.INFO)
+            base.propagate = False
+            base.addHandler(_sink.handler)
+            atexit.register(_sink.close)
+        return _sink
 
-    if not logger.handlers:
-        log_file = logs_dir / f"agent_{agent_id}_{datetime.now().strftime('%d,%m,%Y_%H,%M,%S')}.log"
-        handler = logging.FileHandler(log_file)
-        handler.setFormatter(JsonFormatter())
-        logger.addHandler(handler)
 
-    return logger
+def setup_agent_logger(agent_id: str) -> AgentLogger:
+    get_agent_sink()
+    return AgentLogger(logging.getLogger("agent"), {"agent_id": agent_id})
@@ -5,18 +5,44 @@ from random import sample
 from typing import Optional, Tuple, List, Dict, Any
 
 from project.conversation_graph.agents.agent_logger import setup_agent_logger
+from project.conversation_graph.agents.context import ConversationContext
+from project.conversation_graph.agents.response_cache import ResponseCache
 from project.conversation_graph.graph.conversation_graph import ConversationGraph, Node, NodeType
+from project.conversation_graph.metrics import metrics, QUERY_BUCKETS
 
 
 class ResponseGenerator(ABC):
-    def __init__(self, model_config: Dict[str, Any], system_prompt: str):
+    def __init__(self, model_config: Dict[str, Any], system_prompt: str,
+                 response_cache: Optional[ResponseCache] = None):
         self.model_config = model_config
         self.system_prompt = system_prompt
+        self.response_cache = response_cache
 
     @abstractmethod
     def get_response(self, prompt: str, context: List[Node]) -> str:
         pass
 
+    def respond(self, prompt: str, context: List[Node]) -> str:
+        """get_response() behind the response cache, if one is configured and
+        the model settings allow caching."""
+        if self.response_cache is None or not self.response_cache.cacheable(self.model_config):
+            return self._timed_response(prompt, context)
+
+        key = self.response_cache.key(
+            [node.id for node in context],
+            prompt,
+            {**self.model_config, "system": self.system_prompt}
+        )
+        response = self.response_cache.get(key)
+        if response is None:
+            response = self._timed_response(prompt, context)
+            self.response_cache.put(key, response)
+        return response
+
+    def _timed_response(self, prompt: str, context: List[Node]) -> str:
+        with metrics.timed("agent_phase_seconds", phase="get_response"):
+            return self.get_response(prompt, context)
+
 
 class Agent(ABC):
     def __init__(self, graph: ConversationGraph, response_generator: ResponseGenerator, model_config: Dict[str, Any]):
@@ -26,8 +52,10 @@ class Agent(ABC):
         self.graph = graph
         self.response_generator = response_generator
         self.current_node_id = None
+        self._context = ConversationContext(graph)
         self.current_prompt_choices = []
         self.max_choices = 5
+        self._finished = False
 
         self.logger.info("Agent started", extra={
             'data': {
@@ -36,10 +64,9 @@ class Agent(ABC):
         })
 
     @property
-    def context(self) -> List[Node]:
-        if self.current_node_id is None:
-            return []
-        return self.graph.get_conversation_path(self.current_node_id)
+    def context(self) -> ConversationContext:
+        self._context.move_to(self.current_node_id)
+        return self._context
 
     @abstractmethod
     def generate_decision(self, choices) -> str:
@@ -47,7 +74,14 @@ class Agent(ABC):
 
     def hop(self, start_node_id: str) -> str:
         # Should travel one hop from start_node to a response node
-
+        queries_before = metrics.thread_queries()
+        with metrics.timed("agent_hop_seconds"):
+            node_id = self._hop(start_node_id)
+        metrics.observe("agent_hop_queries", metrics.thread_queries() - queries_before, buckets=QUERY_BUCKETS)
+        return node_id
+
+    def _hop(self, start_node_id: str) -> str:
+        # Only checks nodes written since the last validation run
         self.graph.validate_tree()
 
         node = self.graph.get_node(start_node_id)
@@ -76,6 +110,7 @@ class Agent(ABC):
         if len(prompt_nodes) > self.max_choices:
             prompt_nodes = sample(prompt_nodes, self.max_choices)
 
+        self.graph.load_content(prompt_nodes)
         self.current_prompt_choices = prompt_nodes
 
         self.logger.info("Available choices", extra={
@@ -140,9 +175,11 @@ class Agent(ABC):
 
     def _process_current_position(self) -> None:
 
-        choices = self._present_choices()
+        with metrics.timed("agent_phase_seconds", phase="present_choices"):
+            choices = self._present_choices()
 
-        output = self.generate_decision(choices)
+        with metrics.timed("agent_phase_seconds", phase="generate_decision"):
+            output = self.generate_decision(choices)
 
         self.logger.info("AI output", extra={
             'data': {
@@ -150,41 +187,51 @@ class Agent(ABC):
             }
         })
 
-        is_new_path, result, _ = self._process_agent_decision(output)
+        with metrics.timed("agent_phase_seconds", phase="process_agent_decision"):
+            is_new_path, result, _ = self._process_agent_decision(output)
 
         if is_new_path:
-            prompt_id = self.graph.add_node(
-                content=result,
-                node_type=NodeType.PROMPT,
-                parent_id=self.current_node_id,
-                model_config=self.model_config
-            )
-
-            response = self.response_generator.get_response(
+            response = self.response_generator.respond(
                 result,
                 self.context
             )
 
-            response_id = self.graph.add_node(
-                content=response,
-                node_type=NodeType.RESPONSE,
-                parent_id=prompt_id,
-                model_config=self.response_generator.model_config
-            )
+            # Prompt and response land in one transaction, so agents running
+            # concurrently never see (and try to FOLLOW) an unanswered prompt
+            _, response_id = self.graph.add_nodes_bulk([
+                {
+                    'content': result,
+                    'node_type': NodeType.PROMPT,
+                    'parent_id': self.current_node_id,
+                    'model_config': self.model_config
+                },
+                {
+                    'content': response,
+                    'node_type': NodeType.RESPONSE,
+                    'parent_index': 0,
+                    'model_config': self.response_generator.model_config
+                }
+            ])
 
             self.current_node_id = response_id
 
         else:
             self.current_node_id = result
 
+    def finish(self) -> None:
+        """Logs where the agent ended up from what its context already holds,
+        without querying the graph. The context path can trail final_node_id
+        by the last hop, which is only fetched when the context is next used."""
+        if getattr(self, '_finished', True):
+            return
+        self._finished = True
+        self.logger.info("Agent finished", extra={
+            'data': {
+                'agent_id': self.id,
+                'final_node_id': self.current_node_id,
+                'path': [(node.node_type.name, node.id) for node in self._context]
+            }
+        })
+
     def __del__(self):
-        if hasattr(self, 'logger'):
-            self.logger.info("Agent finished", extra={
-                'data': {
-                    'agent_id': self.id,
-                    'path': [(node.node_type.name, node.id) for node in self.context]
-                }
-            })
-            for handler in self.logger.handlers[:]:
-                handler.close()
-                self.logger.removeHandler(handler)
+        self.finish()
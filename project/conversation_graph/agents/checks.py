@@ -0,0 +1,422 @@
+"""
+Behavioural checks for the agent layer, run without the network or a
+database server: model calls go through httpx mock transports, graphs are
+in memory or in SQLite, and agents follow scripted decisions.
+
+    python -m project.conversation_graph.agents.checks
+"""
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional
+
+import anthropic
+
+try:
+    # Recent SDK releases are built on the httpx2 fork and reject httpx transports
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+from project.conversation_graph.agents.base import Agent, ResponseGenerator
+from project.conversation_graph.agents.context import ConversationContext, MAX_PARENT_WALK
+from project.conversation_graph.agents.model_client import ModelClient
+from project.conversation_graph.agents.response_cache import ResponseCache, ResponseCacheEntry, SQLResponseStore
+from project.conversation_graph.graph.conversation_graph import ConversationGraph, Node, NodeType
+from project.conversation_graph.graph.models import Base
+from project.conversation_graph.metrics import metrics
+from project.conversation_graph.runner.agent_runner import AgentRunner
+
+
+CHECK_MODEL_CONFIG = {"model": "check-model", "temperature": 0}
+
+MESSAGE = {
+    "id": "msg_check",
+    "type": "message",
+    "role": "assistant",
+    "model": "check-model",
+    "content": [{"type": "text", "text": "checked"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 1, "output_tokens": 1}
+}
+REQUEST = {"model": "check-model", "max_tokens": 16, "messages": [{"role": "user", "content": "check"}]}
+
+
+def _model_client(handler, async_handler=None, **kwargs) -> ModelClient:
+    """A ModelClient whose sync and async calls are answered by the handlers,
+    with no backoff between retries."""
+    return ModelClient(
+        api_key="check",
+        backoff_base=0.0,
+        http_client=anthropic.DefaultHttpxClient(transport=httpx.MockTransport(handler)),
+        async_http_client=anthropic.DefaultAsyncHttpxClient(transport=httpx.MockTransport(async_handler or handler)),
+        **kwargs
+    )
+
+
+def _replies(*responses) -> Callable[[httpx.Request], httpx.Response]:
+    """A handler answering with responses in order, raising any exceptions
+    among them; handler.calls counts the requests seen."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = responses[min(handler.calls, len(responses) - 1)]
+        handler.calls += 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    handler.calls = 0
+    return handler
+
+
+def _ok() -> httpx.Response:
+    return httpx.Response(200, json=MESSAGE)
+
+
+def _error(status: int) -> httpx.Response:
+    return httpx.Response(status, json={"type": "error", "error": {"type": "api_error", "message": "check"}})
+
+
+def check_model_client_retries() -> None:
+    handler = _replies(_error(529), _error(503), _ok())
+    client = _model_client(handler)
+    message = client.create_message(**REQUEST)
+    assert message.content[0].text == "checked", "retried call returned the wrong message"
+    assert handler.calls == 3, f"expected 2 retries before success, saw {handler.calls} calls"
+
+    handler = _replies(httpx.ConnectError("refused"), _ok())
+    client = _model_client(handler)
+    client.create_message(**REQUEST)
+    assert handler.calls == 2, "connection errors should be retried"
+
+    handler = _replies(_ok())
+    client = _model_client(handler, async_handler=_replies(_error(429), _ok()))
+    message = asyncio.run(client.acreate_message(**REQUEST))
+    assert message.content[0].text == "checked", "async retry returned the wrong message"
+
+
+def check_model_client_errors() -> None:
+    handler = _replies(_error(400))
+    client = _model_client(handler)
+    try:
+        client.create_message(**REQUEST)
+    except anthropic.BadRequestError:
+        pass
+    else:
+        raise AssertionError("a 400 should be raised")
+    assert handler.calls == 1, "a 400 should not be retried"
+
+    handler = _replies(_error(503))
+    client = _model_client(handler, max_retries=2)
+    try:
+        client.create_message(**REQUEST)
+    except anthropic.APIStatusError as e:
+        assert e.status_code == 503, f"wrong final error {e.status_code}"
+    else:
+        raise AssertionError("retries should give up after max_retries")
+    assert handler.calls == 3, f"expected 1 call and 2 retries, saw {handler.calls}"
+
+
+def check_model_client_concurrency() -> None:
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0}
+
+    def enter():
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+
+    def leave():
+        with lock:
+            state["in_flight"] -= 1
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        enter()
+        time.sleep(0.02)
+        leave()
+        return _ok()
+
+    async def async_handler(request: httpx.Request) -> httpx.Response:
+        enter()
+        await asyncio.sleep(0.02)
+        leave()
+        return _ok()
+
+    client = _model_client(handler, async_handler, max_in_flight=2)
+    threads = [threading.Thread(target=client.create_message, kwargs=REQUEST) for _ in range(6)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    assert state["peak"] == 2, f"sync calls should run 2 at a time, peaked at {state['peak']}"
+
+    async def burst():
+        await asyncio.gather(*(client.acreate_message(**REQUEST) for _ in range(6)))
+
+    # The second loop must not trip over a semaphore bound to the first
+    for _ in range(2):
+        state["peak"] = 0
+        asyncio.run(burst())
+        assert state["peak"] == 2, f"async calls should run 2 at a time, peaked at {state['peak']}"
+
+
+def check_model_client_close() -> None:
+    client = _model_client(_replies(_ok()))
+    asyncio.run(client.acreate_message(**REQUEST))
+    client.close()
+    assert client._client.is_closed(), "close() left the sync client open"
+    assert client._async_client.is_closed(), "close() left the async client open"
+
+
+class EchoResponseGenerator(ResponseGenerator):
+    """Answers every prompt with its own text and counts the calls."""
+
+    def __init__(self, model_config: Optional[dict] = None, response_cache: Optional[ResponseCache] = None):
+        super().__init__(model_config or CHECK_MODEL_CONFIG, "check system", response_cache)
+        self.calls = 0
+
+    def get_response(self, prompt: str, context: List[Node]) -> str:
+        self.calls += 1
+        return f"answer to {prompt}"
+
+
+class ScriptedAgent(Agent):
+    """Replays decisions in order, repeating the last one, and keeps the
+    choices text it was shown."""
+
+    def __init__(self, graph: ConversationGraph, *decisions: str):
+        super().__init__(graph, EchoResponseGenerator(), CHECK_MODEL_CONFIG)
+        self.decisions = list(decisions)
+        self.shown: List[str] = []
+
+    def generate_decision(self, choices: str) -> str:
+        self.shown.append(choices)
+        return self.decisions.pop(0) if len(self.decisions) > 1 else self.decisions[0]
+
+
+def _turns(graph: ConversationGraph, parent_id: str, count: int) -> List[str]:
+    """Appends count prompt/response pairs in a line below parent_id and
+    returns their ids in order."""
+    ids = []
+    for turn in range(count):
+        ids.append(graph.add_node(f"prompt {turn}", NodeType.PROMPT, parent_id))
+        ids.append(graph.add_node(f"response {turn}", NodeType.RESPONSE, ids[-1]))
+        parent_id = ids[-1]
+    return ids
+
+
+def check_agent_new_branch() -> None:
+    graph = ConversationGraph.in_memory()
+    root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+    inserts = []
+    graph.add_write_listener(inserts.append)
+
+    agent = ScriptedAgent(graph, "<choice>NEW: where next</choice>")
+    response_id = agent.hop(root_id)
+    response = graph.get_node(response_id)
+    prompt = graph.get_node(response.parent_id)
+    assert response.node_type == NodeType.RESPONSE and response.content == "answer to where next", \
+        "NEW should end on the generated response"
+    assert prompt.content == "where next" and prompt.parent_id == root_id, "NEW prompt not under the start node"
+    assert [[node.id for node in nodes] for nodes in inserts] == [[prompt.id, response_id]], \
+        "prompt and response should be written in one insert"
+    assert [node.id for node in agent.context] == [root_id, prompt.id, response_id], "context path wrong"
+
+
+def check_agent_follow() -> None:
+    graph = ConversationGraph.in_memory()
+    root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+    prompt_id, response_id = _turns(graph, root_id, 1)
+    inserts = []
+    graph.add_write_listener(inserts.append)
+
+    agent = ScriptedAgent(graph, "<choice>FOLLOW: 1</choice>")
+    assert agent.hop(root_id) == response_id, "FOLLOW should end on the chosen prompt's response"
+    assert "Content: prompt 0" in agent.shown[0], "existing prompt not offered as a choice"
+    assert not inserts, "FOLLOW should not write anything"
+    assert agent.response_generator.calls == 0, "FOLLOW should not call the model"
+    assert [node.id for node in agent.context] == [root_id, prompt_id, response_id], "context should follow the hop"
+
+
+def check_agent_finish() -> None:
+    graph = ConversationGraph.sqlite()
+    root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+    agent = ScriptedAgent(graph, "<choice>NEW: once</choice>")
+    response_id = agent.hop(root_id)
+    path = [node.id for node in agent.context]
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(record) if record.getMessage() == "Agent finished" else None
+    agent_logger = logging.getLogger("agent")
+    agent_logger.addHandler(handler)
+    try:
+        queries_before = metrics.thread_queries()
+        agent.finish()
+        agent.finish()
+        assert metrics.thread_queries() == queries_before, "finish() should not query the graph"
+    finally:
+        agent_logger.removeHandler(handler)
+        graph.close()
+
+    assert len(records) == 1, f"finish() should log once, logged {len(records)} times"
+    assert records[0].data["final_node_id"] == response_id, "finish() logged the wrong final node"
+    assert [node_id for _, node_id in records[0].data["path"]] == path, "finish() logged the wrong path"
+
+
+def check_runner() -> None:
+    graph = ConversationGraph.in_memory()
+    root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+
+    runner = AgentRunner(lambda: ScriptedAgent(graph, "<choice>NEW: step</choice>"), concurrency=2, hops_per_agent=3)
+    stats = runner.run([root_id, root_id])
+    assert stats["hops"] == 6 and stats["errors"] == 0, f"expected 6 clean hops, got {stats}"
+    for final_id in stats["final_nodes"]:
+        path = graph.get_conversation_path(final_id)
+        assert len(path) == 7 and path[0].id == root_id, "each agent should have gone 3 turns deep"
+    assert graph.validate_tree(full=True), "runner left an invalid tree"
+
+    runner = AgentRunner(lambda: ScriptedAgent(graph, "no decision"), hops_per_agent=10, max_consecutive_errors=3)
+    stats = runner.run([root_id])
+    assert stats["hops"] == 0 and stats["errors"] == 3, f"agent should stop after 3 failed hops, got {stats}"
+    assert stats["final_nodes"] == [root_id], "a failing agent should stay on its start node"
+
+    runner = AgentRunner(lambda: ScriptedAgent(graph, "<choice>NEW: stopped</choice>"))
+    runner.stop()
+    runner.run([root_id])
+    assert not runner.stopping, "run() should clear an earlier stop()"
+
+
+def check_concurrent_branches() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        graph = ConversationGraph.sqlite(os.path.join(directory, "check.db"))
+        root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+        names = itertools.count()
+
+        # Every agent opens its own branch under the root at the same time
+        runner = AgentRunner(lambda: ScriptedAgent(graph, f"<choice>NEW: branch {next(names)}</choice>"),
+                             concurrency=8, hops_per_agent=1)
+        stats = runner.run([root_id] * 8)
+        assert stats["hops"] == 8 and stats["errors"] == 0, f"expected 8 clean hops, got {stats}"
+        prompts = graph.get_children(root_id)
+        assert sorted(prompt.content for prompt in prompts) == sorted(f"branch {i}" for i in range(8)), \
+            "every agent should have added its own sibling prompt"
+        for prompt in prompts:
+            assert [node.content for node in graph.get_children(prompt.id)] == [f"answer to {prompt.content}"], \
+                f"prompt {prompt.content!r} should have exactly its own response"
+        assert graph.validate_tree(full=True), "concurrent agents left an invalid tree"
+        graph.close()
+
+
+def check_context_moves() -> None:
+    graph = ConversationGraph.sqlite()
+    root_id = graph.create_root("check system", CHECK_MODEL_CONFIG)
+    trunk = _turns(graph, root_id, 2)
+    branch = _turns(graph, trunk[1], 1)
+    deep = _turns(graph, root_id, MAX_PARENT_WALK)
+
+    context = ConversationContext(graph)
+    context.move_to(trunk[-1])
+    assert [node.id for node in context] == [root_id] + trunk, "path to the trunk tip wrong"
+    assert context.system_prompt == "check system", "system prompt wrong"
+    messages = context.messages()
+    assert [message["role"] for message in messages] == ["user", "assistant"] * 2, "message roles wrong"
+
+    # Moving to a sibling branch only fetches the nodes below the shared prefix
+    graph.cache.clear()
+    queries_before = metrics.thread_queries()
+    context.move_to(branch[-1])
+    assert metrics.thread_queries() - queries_before == len(branch), "move_to should only fetch the new nodes"
+    assert [node.id for node in context] == [root_id] + trunk[:2] + branch, "path after branching wrong"
+    assert [message["content"][0]["text"] for message in context.messages()] == \
+        ["prompt 0", "response 0", "prompt 0", "response 0"], "messages not rebuilt after branching"
+    with_prompt = context.messages("next")
+    assert with_prompt[-1]["content"][0]["text"] == "next" and len(context.messages()) == 4, \
+        "messages(prompt) should not keep the prompt"
+
+    context.move_to(trunk[1])
+    assert context.node_id == trunk[1] and len(context) == 3, "moving up should truncate the path"
+    context.move_to(deep[-1])
+    assert [node.id for node in context] == [root_id] + deep, "long jump path wrong"
+    context.move_to(None)
+    assert len(context) == 0 and context.messages() == [], "move_to(None) should empty the context"
+    graph.close()
+
+
+def check_response_cache() -> None:
+    config = {"model": "check-model", "temperature": 0, "max_tokens": 16}
+    key = ResponseCache.key(["a", "b"], "prompt", config)
+    assert key == ResponseCache.key(["a", "b"], "prompt", {**config, "metadata": "ignored"}), \
+        "settings that don't change the answer should not change the key"
+    for other in (ResponseCache.key(["a"], "prompt", config), ResponseCache.key(["a", "b"], "other", config),
+                  ResponseCache.key(["a", "b"], "prompt", {**config, "max_tokens": 32})):
+        assert other != key, "context, prompt and model settings should all change the key"
+
+    cache = ResponseCache(max_entries=2)
+    assert cache.cacheable(config) and not cache.cacheable({**config, "temperature": 1}), \
+        "only temperature 0 is cacheable by default"
+    assert ResponseCache(cache_nonzero_temperature=True).cacheable({**config, "temperature": 1}), \
+        "cache_nonzero_temperature should allow sampled calls"
+    for name in ("one", "two", "three"):
+        cache.put(name, name.upper())
+    assert cache.get("one") is None and cache.get("three") == "THREE", "cache should evict least recently used"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["skipped"], stats["entries"]) == (1, 1, 1, 2), \
+        f"wrong stats {stats}"
+
+    assert ResponseCacheEntry.__tablename__ not in Base.metadata.tables, \
+        "graph backends should not create the response cache table"
+    store = SQLResponseStore("sqlite://")
+    ResponseCache(store=store).put(key, "stored")
+    second = ResponseCache(store=store)
+    assert second.get(key) == "stored" and second.get(key) == "stored", "store should back a fresh cache"
+    assert (second.stats()["store_hits"], second.stats()["hits"]) == (1, 1), "store hit should be kept in memory"
+
+    generator = EchoResponseGenerator(config, ResponseCache())
+    assert generator.respond("same", []) == generator.respond("same", []) == "answer to same", "wrong response"
+    assert generator.calls == 1, "a repeated deterministic call should come from the cache"
+    sampled = EchoResponseGenerator({**config, "temperature": 1}, ResponseCache())
+    sampled.respond("same", [])
+    sampled.respond("same", [])
+    assert sampled.calls == 2, "sampled calls should not be cached"
+
+
+CHECKS = [
+    check_model_client_retries,
+    check_model_client_errors,
+    check_model_client_concurrency,
+    check_model_client_close,
+    check_agent_new_branch,
+    check_agent_follow,
+    check_agent_finish,
+    check_runner,
+    check_concurrent_branches,
+    check_context_moves,
+    check_response_cache,
+]
+
+
+def run_checks() -> List[str]:
+    """Runs every check and returns the failures."""
+    failures = []
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError as e:
+            failures.append(f"{check.__name__}: {e}")
+    return failures
+
+
+def main():
+    failures = run_checks()
+    print(f"agents: {'ok' if not failures else 'FAILED'}")
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
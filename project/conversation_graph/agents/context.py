@@ -0,0 +1,124 @@
+from collections.abc import Sequence
+from typing import List, Dict, Optional, Any
+
+from project.conversation_graph.graph.conversation_graph import ConversationGraph, Node, NodeType
+
+# Jumps further than this from the current path re-fetch the whole path in one
+# query rather than walking up one node at a time
+MAX_PARENT_WALK = 8
+
+ROLES = {
+    NodeType.PROMPT: "user",
+    NodeType.RESPONSE: "assistant"
+}
+
+
+def node_message(node: Node) -> Dict[str, Any]:
+    return {
+        "role": ROLES[node.node_type],
+        "content": [{"type": "text", "text": node.content}]
+    }
+
+
+class ConversationContext(Sequence):
+    """
+    The root->node path an agent is standing on, kept across hops.
+
+    move_to() reuses the shared prefix with the previous position and only
+    fetches the nodes that are new, so a normal hop costs O(new nodes) lookups
+    (usually cache hits) instead of a full path query. The model message list
+    is built lazily and extended in place as the path grows.
+    """
+
+    def __init__(self, graph: Optional[ConversationGraph] = None, nodes: Optional[List[Node]] = None):
+        self.graph = graph
+        self._nodes: List[Node] = []
+        self._positions: Dict[str, int] = {}
+        self._messages: List[Dict[str, Any]] = []
+        self._messages_from = 0
+        for node in nodes or []:
+            self._append(node)
+
+    @classmethod
+    def from_nodes(cls, nodes: List[Node]) -> "ConversationContext":
+        return cls(nodes=list(nodes))
+
+    @property
+    def node_id(self) -> Optional[str]:
+        return self._nodes[-1].id if self._nodes else None
+
+    @property
+    def system_prompt(self) -> Optional[str]:
+        if self._nodes and self._nodes[0].node_type == NodeType.SYSTEM:
+            return self._nodes[0].content
+        return None
+
+    def move_to(self, node_id: Optional[str]) -> None:
+        if node_id == self.node_id:
+            return
+
+        if node_id is None:
+            self._truncate(0)
+            return
+
+        if node_id in self._positions:
+            self._truncate(self._positions[node_id] + 1)
+            return
+
+        # Walk up from the target until we meet the current path
+        suffix = []
+        current_id = node_id
+        while current_id is not None and current_id not in self._positions:
+            if len(suffix) >= MAX_PARENT_WALK:
+                self._reset(self.graph.get_conversation_path(node_id))
+                return
+            node = self.graph.get_node(current_id)
+            if node is None:
+                raise ValueError(f"Node {current_id} not found")
+            suffix.append(node)
+            current_id = node.parent_id
+
+        self._truncate(self._positions[current_id] + 1 if current_id is not None else 0)
+        for node in reversed(suffix):
+            self._append(node)
+
+    def messages(self, prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Model messages for every non-system node on the path, optionally
+        followed by a new user prompt."""
+        for node in self._nodes[self._messages_from:]:
+            if node.node_type != NodeType.SYSTEM:
+                self._messages.append(node_message(node))
+        self._messages_from = len(self._nodes)
+
+        if prompt is None:
+            return list(self._messages)
+        return self._messages + [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
+
+    def _append(self, node: Node) -> None:
+        self._positions[node.id] = len(self._nodes)
+        self._nodes.append(node)
+
+    def _truncate(self, length: int) -> None:
+        for node in self._nodes[length:]:
+            del self._positions[node.id]
+        del self._nodes[length:]
+
+        if self._messages_from > length:
+            kept = sum(1 for node in self._nodes if node.node_type != NodeType.SYSTEM)
+            del self._messages[kept:]
+            self._messages_from = length
+
+    def _reset(self, path: List[Node]) -> None:
+        # Keep the shared prefix so its messages don't need rebuilding
+        shared = 0
+        while shared < min(len(path), len(self._nodes)) and path[shared].id == self._nodes[shared].id:
+            shared += 1
+        self._truncate(shared)
+        for node in path[shared:]:
+            self._append(node)
+
+    def __getitem__(self, index):
+        return self._nodes[index]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
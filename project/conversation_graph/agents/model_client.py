@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Optional, Any
+
+import anthropic
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class ModelClient:
+    """
+    One long-lived Anthropic client shared by every response generator and
+    agent, so HTTP connections and TLS sessions are reused across calls.
+
+    Calls are capped at max_in_flight concurrent requests (separately for the
+    sync API and for each event loop using the async one) and retried with jittered exponential backoff on
+    connection errors, rate limits and overloaded/5xx responses. Pass
+    http_client/async_http_client built on a mock transport, or a base_url
+    pointing at a local stub server, to run without the network.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_in_flight: int = 8, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 120.0,
+                 http_client: Optional[anthropic.DefaultHttpxClient] = None,
+                 async_http_client: Optional[anthropic.DefaultAsyncHttpxClient] = None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # The SDK's own retries are disabled so the policy here is the only one
+        self._client = anthropic.Anthropic(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=http_client
+        )
+        self._async_client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=async_http_client
+        )
+        self.max_in_flight = max_in_flight
+        self._sync_slots = threading.BoundedSemaphore(max_in_flight)
+        # An asyncio.Semaphore belongs to the loop it is first used on, so
+        # each event loop calling acreate_message gets its own
+        self._async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+
+    def create_message(self, **kwargs) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._sync_slots:
+                    return self._client.messages.create(**kwargs)
+            except anthropic.APIError as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"Model call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def acreate_message(self, **kwargs) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._loop_slots():
+                    return await self._async_client.messages.create(**kwargs)
+            except anthropic.APIError as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"Model call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.max_in_flight)
+        return slots
+
+    def _retry_delay(self, error: anthropic.APIError, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the error is final."""
+        if attempt >= self.max_retries:
+            return None
+
+        if isinstance(error, anthropic.APIStatusError):
+            if error.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        elif not isinstance(error, anthropic.APIConnectionError):
+            return None
+
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def close(self) -> None:
+        """Closes both HTTP clients; from a coroutine, await aclose() instead."""
+        asyncio.run(self._async_client.close())
+        self._client.close()
+
+    async def aclose(self) -> None:
+        await self._async_client.close()
+        self._client.close()
+
+
+_default_client: Optional[ModelClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> ModelClient:
+    """Returns the process-wide client, created on first use from ANTHROPIC_API_KEY."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ModelClient(api_key=os.getenv('ANTHROPIC_API_KEY'))
+        return _default_client
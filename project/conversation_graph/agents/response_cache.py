@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Union
+
+from sqlalchemy import Column, String, Text, DateTime, create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from project.conversation_graph.metrics import metrics
+
+# model_config fields that change what the model would answer
+KEY_FIELDS = ("model", "temperature", "max_tokens", "top_p", "top_k", "stop_sequences", "system")
+
+# Kept apart from the graph's metadata, so the table only exists where a store uses it
+CacheBase = declarative_base()
+
+
+class ResponseCacheEntry(CacheBase):
+    __tablename__ = 'response_cache'
+
+    key = Column(String(64), primary_key=True)
+    response = Column(Text, nullable=False)
+    timestamp = Column(DateTime, default=datetime.now)
+
+
+class SQLResponseStore:
+    """Persistent second tier; pass a SQLite file URL for an on-disk cache or
+    a SQL backend's engine to share the cache between processes."""
+
+    def __init__(self, engine: Union[Engine, str]):
+        self.engine = create_engine(engine) if isinstance(engine, str) else engine
+        ResponseCacheEntry.__table__.create(self.engine, checkfirst=True)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def get(self, key: str) -> Optional[str]:
+        with self.Session() as session:
+            entry = session.get(ResponseCacheEntry, key)
+            return entry.response if entry else None
+
+    def put(self, key: str, response: str) -> None:
+        with self.Session() as session:
+            session.merge(ResponseCacheEntry(key=key, response=response))
+            session.commit()
+
+
+class ResponseCache:
+    """
+    Model responses keyed on the context path, the prompt and the model
+    settings: an in-memory LRU in front of an optional persistent store.
+
+    Only deterministic calls (temperature 0) are cached unless
+    cache_nonzero_temperature is set, since replaying a sampled answer changes
+    what the tree would otherwise contain.
+    """
+
+    def __init__(self, max_entries: int = 10_000, store: Optional[SQLResponseStore] = None,
+                 cache_nonzero_temperature: bool = False):
+        self.max_entries = max_entries
+        self.store = store
+        self.cache_nonzero_temperature = cache_nonzero_temperature
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        metrics.register_collector("response_cache", self.stats)
+
+    def cacheable(self, model_config: Dict[str, Any]) -> bool:
+        if self.cache_nonzero_temperature or model_config.get("temperature") == 0:
+            return True
+        with self._lock:
+            self.skipped += 1
+        return False
+
+    @staticmethod
+    def key(context_ids: List[str], prompt: str, model_config: Dict[str, Any]) -> str:
+        settings = {field: model_config.get(field) for field in KEY_FIELDS if field in model_config}
+        payload = json.dumps([context_ids, prompt, settings], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+
+        response = self.store.get(key) if self.store else None
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.store_hits += 1
+            self._remember(key, response)
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._remember(key, response)
+        if self.store:
+            self.store.put(key, response)
+
+    def _remember(self, key: str, response: str) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
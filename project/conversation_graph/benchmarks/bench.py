@@ -0,0 +1,304 @@
+"""
+Benchmarks for ConversationGraph and agent hops on a synthetic tree.
+
+    python -m project.conversation_graph.benchmarks.bench --backend sqlite --depth 6 --branching 3
+    python -m project.conversation_graph.benchmarks.bench --backend mysql --mysql-database conversation_graph_bench
+
+Every run writes one JSON file (parameters, environment and results) so runs
+can be compared over time. The MySQL database must exist and should be a
+scratch one: the benchmark only adds rows, but it adds a lot of them.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from project.conversation_graph.benchmarks.synthetic import build_tree, StubAgent, StubResponseGenerator, \
+    BENCH_MODEL_CONFIG, random_text, sample
+from project.conversation_graph.config import MYSQL_CONFIG
+from project.conversation_graph.graph.conversation_graph import ConversationGraph, NodeType
+from project.conversation_graph.metrics import metrics
+
+RESULTS_DIR = Path(__file__).parent.parent.parent / "benchmark_results"
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Latency stats in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000
+    }
+
+
+def time_calls(func: Callable[[str], Any], args: List[str], cold: Optional[ConversationGraph] = None) -> List[float]:
+    """Times func once per argument; with cold set, that graph's cache is
+    cleared before every call so each one reaches the backend."""
+    samples = []
+    for arg in args:
+        if cold is not None:
+            cold.cache.clear()
+        started = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_inserts(graph: ConversationGraph, args) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    started = time.perf_counter()
+    tree = build_tree(graph, args.depth, args.branching, args.content_size, args.seed, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    nodes = sum(len(level) for level in tree["levels"])
+
+    # Single-row inserts, one transaction each, extending leaves of the tree
+    rng = random.Random(args.seed)
+    parents = sample(rng, tree["levels"][-1], args.samples)
+    single = []
+    for parent_id in parents:
+        content = random_text(rng, args.content_size)
+        started_one = time.perf_counter()
+        prompt_id = graph.add_node(content, NodeType.PROMPT, parent_id, BENCH_MODEL_CONFIG)
+        single.append(time.perf_counter() - started_one)
+        graph.add_node(content, NodeType.RESPONSE, prompt_id, BENCH_MODEL_CONFIG)
+
+    return tree, {
+        "bulk": {"nodes": nodes, "seconds": elapsed, "nodes_per_second": nodes / elapsed if elapsed else 0.0},
+        "add_node": summarize(single)
+    }
+
+
+def bench_concurrent_inserts(graph: ConversationGraph, tree: Dict[str, Any], args) -> Dict[str, Any]:
+    """add_node from args.insert_threads threads at once, each writing its own
+    transaction directly and then through a GroupCommitWriter on the same backend."""
+    rng = random.Random(args.seed)
+    per_thread = max(args.samples // args.insert_threads, 1)
+    parents = sample(rng, tree["levels"][-1], args.insert_threads)
+    results = {}
+
+    grouped = ConversationGraph(backend=graph.backend, group_commit=True,
+                                group_commit_delay=args.group_commit_delay)
+    for mode, target in (("direct", graph), ("group_commit", grouped)):
+        latencies: List[float] = []
+        lock = threading.Lock()
+
+        def insert(parent_id: str, seed: int) -> None:
+            thread_rng = random.Random(seed)
+            own = []
+            for _ in range(per_thread):
+                content = random_text(thread_rng, args.content_size)
+                started_one = time.perf_counter()
+                target.add_node(content, NodeType.PROMPT, parent_id, BENCH_MODEL_CONFIG)
+                own.append(time.perf_counter() - started_one)
+            with lock:
+                latencies.extend(own)
+
+        threads = [threading.Thread(target=insert, args=(parent_id, args.seed + i))
+                   for i, parent_id in enumerate(parents)]
+        started = time.perf_counter()
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+        elapsed = time.perf_counter() - started
+        results[mode] = {
+            "threads": len(threads),
+            "nodes": len(latencies),
+            "seconds": elapsed,
+            "nodes_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "add_node": summarize(latencies)
+        }
+
+    results["group_commit"]["writer"] = grouped.writer.stats()
+    grouped.writer.close()
+    return results
+
+
+def bench_reads(graph: ConversationGraph, tree: Dict[str, Any], args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    levels = tree["levels"]
+
+    path_by_depth = {}
+    for depth, ids in enumerate(levels):
+        picked = sample(rng, ids, args.samples)
+        path_by_depth[depth] = {
+            "cold": summarize(time_calls(graph.get_conversation_path, picked, cold=graph)),
+            "warm": summarize(time_calls(graph.get_conversation_path, picked))
+        }
+
+    leaves = {}
+    started = time.perf_counter()
+    leaf_count = len(graph.get_leaf_nodes())
+    leaves["get_leaf_nodes"] = {"leaves": leaf_count, "ms": (time.perf_counter() - started) * 1000}
+    started = time.perf_counter()
+    ref_count = sum(1 for _ in graph.iter_leaf_nodes(with_content=False))
+    leaves["iter_leaf_nodes_refs"] = {"leaves": ref_count, "ms": (time.perf_counter() - started) * 1000}
+
+    descendants = {}
+    for depth in range(0, len(levels), 2):
+        picked = sample(rng, levels[depth], max(args.samples // 10, 1))
+        descendants[depth] = summarize(time_calls(graph.count_descendants, picked))
+
+    children = summarize(time_calls(graph.get_children, sample(rng, levels[len(levels) // 2], args.samples),
+                                    cold=graph))
+
+    return {
+        "get_conversation_path_by_depth": path_by_depth,
+        "leaf_listing": leaves,
+        "count_descendants_by_depth": descendants,
+        "get_children_cold": children
+    }
+
+
+def bench_hops(graph: ConversationGraph, tree: Dict[str, Any], args) -> Dict[str, Any]:
+    graph.validate_tree()
+    metrics.reset()
+    agent = StubAgent(graph, StubResponseGenerator(args.content_size, args.seed),
+                      follow_ratio=args.follow_ratio, content_size=args.content_size, seed=args.seed)
+
+    samples = []
+    node_id = tree["root_id"]
+    for hop in range(args.hops):
+        started = time.perf_counter()
+        node_id = agent.hop(node_id)
+        samples.append(time.perf_counter() - started)
+        # Start over once the walk has gone as deep as the synthetic tree
+        if (hop + 1) % max(args.depth, 1) == 0:
+            node_id = tree["root_id"]
+    agent.finish()
+
+    snapshot = metrics.snapshot()
+    phases = {
+        dict(labels).get("phase"): {"count": data["count"], "mean_ms": data["sum"] / data["count"] * 1000}
+        for labels, data in snapshot["histograms"].get("agent_phase_seconds", {}).items() if data["count"]
+    }
+    queries = next(iter(snapshot["histograms"].get("agent_hop_queries", {}).values()), None)
+    return {
+        "hop": summarize(samples),
+        "phases": phases,
+        "queries_per_hop": queries["sum"] / queries["count"] if queries and queries["count"] else None
+    }
+
+
+def bench_api(tree: Dict[str, Any], args) -> Dict[str, Any]:
+    """Times the read endpoints in-process through FastAPI's TestClient, cold
+    (response cache cleared before each request) and warm."""
+    from fastapi.testclient import TestClient
+    from project.conversation_graph.graph.async_conversation_graph import AsyncConversationGraph
+    from project.frontend import api
+
+    api.graph = AsyncConversationGraph(**mysql_config(args), content_store=args.content_store)
+    rng = random.Random(args.seed)
+    node_ids = sample(rng, tree["levels"][len(tree["levels"]) // 2], args.samples)
+    endpoints = {
+        "node": "/api/nodes/{}",
+        "content": "/api/nodes/{}/content",
+        "children": "/api/nodes/{}/children",
+        "subtree": "/api/nodes/{}/subtree?depth=3"
+    }
+
+    results = {}
+    with TestClient(api.app) as client:
+        for name, template in endpoints.items():
+            def request(node_id, template=template):
+                client.get(template.format(node_id)).raise_for_status()
+
+            cold = []
+            for node_id in node_ids:
+                api.response_cache.clear()
+                cold.extend(time_calls(request, [node_id]))
+            results[name] = {"cold": summarize(cold), "warm": summarize(time_calls(request, node_ids))}
+    return results
+
+
+def mysql_config(args) -> Dict[str, str]:
+    return {**MYSQL_CONFIG, "host": args.mysql_host, "user": args.mysql_user,
+            "password": args.mysql_password, "database": args.mysql_database}
+
+
+def make_graph(args) -> ConversationGraph:
+    if args.backend == "mysql":
+        return ConversationGraph(**mysql_config(args), content_store=args.content_store)
+    if args.backend == "memory":
+        return ConversationGraph.in_memory()
+    path = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix="backlooms-bench-"), "bench.db")
+    return ConversationGraph.sqlite(path, content_store=args.content_store)
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit}
+
+
+def run(args) -> Dict[str, Any]:
+    graph = make_graph(args)
+    started = datetime.now()
+
+    tree, inserts = bench_inserts(graph, args)
+    if args.insert_threads:
+        inserts["concurrent"] = bench_concurrent_inserts(graph, tree, args)
+    results = {"inserts": inserts, "reads": bench_reads(graph, tree, args)}
+    if args.hops:
+        results["hops"] = bench_hops(graph, tree, args)
+    if args.backend == "mysql" and not args.skip_api:
+        results["api"] = bench_api(tree, args)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("mysql_password", "output")}
+    return {"started": started.isoformat(), "params": params, "environment": environment(), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "mysql", "memory"], default="sqlite")
+    parser.add_argument("--sqlite-path", help="database file; a fresh temporary one by default")
+    parser.add_argument("--mysql-host", default=MYSQL_CONFIG["host"])
+    parser.add_argument("--mysql-user", default=MYSQL_CONFIG["user"])
+    parser.add_argument("--mysql-password", default=MYSQL_CONFIG["password"])
+    parser.add_argument("--mysql-database", default="conversation_graph_bench")
+    parser.add_argument("--depth", type=int, default=5, help="turns (prompt + response) below the root")
+    parser.add_argument("--branching", type=int, default=3, help="prompts under every response")
+    parser.add_argument("--content-size", type=int, default=500, help="characters per node")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=200, help="nodes timed per measurement")
+    parser.add_argument("--insert-threads", type=int, default=8,
+                        help="threads for the direct vs group-commit insert comparison; 0 to skip")
+    parser.add_argument("--group-commit-delay", type=float, default=0.005)
+    parser.add_argument("--hops", type=int, default=200, help="agent hops to time; 0 to skip")
+    parser.add_argument("--follow-ratio", type=float, default=0.8)
+    parser.add_argument("--content-store", action="store_true", help="keep node text in the content store")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file; a timestamped file in benchmark_results/ by default")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"bench_{args.backend}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import random
+import re
+import string
+from typing import List, Dict, Any
+
+from project.conversation_graph.agents.base import Agent, ResponseGenerator
+from project.conversation_graph.graph.conversation_graph import ConversationGraph, Node, NodeType
+
+BENCH_MODEL_CONFIG = {"model": "bench-stub", "temperature": 0}
+
+
+def random_text(rng: random.Random, size: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + " ", k=size))
+
+
+def build_tree(graph: ConversationGraph, depth: int, branching: int, content_size: int,
+               seed: int = 0, chunk_size: int = 500) -> Dict[str, Any]:
+    """
+    Writes one synthetic tree: a root, then depth turns below it where every
+    response (and the root) has branching prompts, each answered by one
+    response. Levels are inserted with add_nodes_bulk, one batch per level.
+    Returns the root id and the ids of every node grouped by tree depth.
+    """
+    rng = random.Random(seed)
+    root_id = graph.create_root(random_text(rng, content_size), BENCH_MODEL_CONFIG)
+    levels: List[List[str]] = [[root_id]]
+
+    for _ in range(depth):
+        entries = []
+        for parent_id in levels[-1]:
+            for _ in range(branching):
+                entries.append({'content': random_text(rng, content_size), 'node_type': NodeType.PROMPT,
+                                'parent_id': parent_id, 'model_config': BENCH_MODEL_CONFIG})
+                entries.append({'content': random_text(rng, content_size), 'node_type': NodeType.RESPONSE,
+                                'parent_index': len(entries) - 1, 'model_config': BENCH_MODEL_CONFIG})
+
+        # An even batch size keeps each prompt and its response in the same batch
+        batch_size = max(chunk_size - chunk_size % 2, 2)
+        ids = []
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            batch = [dict(entry, parent_index=entry['parent_index'] - start) if 'parent_index' in entry else entry
+                     for entry in batch]
+            ids.extend(graph.add_nodes_bulk(batch, chunk_size=chunk_size))
+        levels.append(ids[0::2])
+        levels.append(ids[1::2])
+
+    return {"root_id": root_id, "levels": levels}
+
+
+class StubResponseGenerator(ResponseGenerator):
+    """Answers instantly with fixed-size random text, so hops measure graph
+    and agent overhead only."""
+
+    def __init__(self, content_size: int = 200, seed: int = 0):
+        super().__init__(BENCH_MODEL_CONFIG, "")
+        self.content_size = content_size
+        self.rng = random.Random(seed)
+
+    def get_response(self, prompt: str, context: List[Node]) -> str:
+        # Touch the messages the way a real generator would
+        if hasattr(context, "messages"):
+            context.messages(prompt)
+        return random_text(self.rng, self.content_size)
+
+
+class StubAgent(Agent):
+    """Follows an existing path with probability follow_ratio and otherwise
+    branches with a new random prompt."""
+
+    def __init__(self, graph: ConversationGraph, response_generator: ResponseGenerator,
+                 follow_ratio: float = 0.8, content_size: int = 200, seed: int = 0):
+        super().__init__(graph, response_generator, BENCH_MODEL_CONFIG)
+        self.follow_ratio = follow_ratio
+        self.content_size = content_size
+        self.rng = random.Random(seed)
+
+    def generate_decision(self, choices: str) -> str:
+        paths = len(re.findall(r'^Path \d+:', choices, re.MULTILINE))
+        if paths and self.rng.random() < self.follow_ratio:
+            return f"<choice>FOLLOW: {self.rng.randint(1, paths)}</choice>"
+        return f"<choice>NEW: {random_text(self.rng, self.content_size)}</choice>"
+
+
+def sample(rng: random.Random, ids: List[str], count: int) -> List[str]:
+    return ids if len(ids) <= count else rng.sample(ids, count)
+
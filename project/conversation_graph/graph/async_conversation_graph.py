@@ -0,0 +1,281 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, func, event, and_, or_
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from project.conversation_graph.metrics import instrument_methods
+from project.conversation_graph.graph.models import Base, Node, NodeAncestry, NodeStats, SubtreeStats, \
+    NodeContent, NodeType
+from project.conversation_graph.graph.pagination import Page, SearchPage, NodeView, DEFAULT_PAGE_SIZE, \
+    decode_cursor, make_page, build_node_view, check_page_size
+from project.conversation_graph.graph.search_index import SearchIndex, query_terms, make_search_page
+from project.conversation_graph.storage.sql import node_view_query, split_node_view, children_page_query, \
+    subtree_query, count_subtree_query, subtree_stats_query, count_query, search_query, ancestor_ids_query, \
+    group_ancestor_ids
+from project.conversation_graph.storage.content_store import decode_content
+
+
+# Rows read per query while building the content store's search index
+SEARCH_INDEX_BATCH_SIZE = 5000
+# Nodes stamped this long before the newest indexed one are checked again on
+# every search, since a slow transaction can commit after a later node
+SEARCH_CATCH_UP_WINDOW = timedelta(seconds=30)
+
+# Methods timed into async_graph_operation_seconds
+TIMED_OPERATIONS = (
+    "get_node", "get_node_view", "get_conversation_path", "get_children", "get_siblings",
+    "get_children_page", "get_siblings_page", "get_subtree", "search", "count_subtree",
+    "count_descendants", "get_subtree_stats",
+)
+
+
+@instrument_methods("async_graph_operation_seconds", TIMED_OPERATIONS)
+class AsyncConversationGraph:
+    """
+    Read-side counterpart of ConversationGraph on an async engine with its own
+    connection pool, so async callers such as the API server never block the
+    event loop on a database round-trip. Writes still go through ConversationGraph.
+
+    content_store says whether the writers keep node text in a content store;
+    left as None it is read off the newest stored node when search first needs it.
+    With a content store, search builds its own in-process SearchIndex, since
+    the FULLTEXT index only covers inline content.
+    """
+
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 pool_size: int = 10, max_overflow: int = 20, content_store: Optional[bool] = None):
+        db_url = f"mysql+aiomysql://{user}:{password}@{host}/{database}"
+        self.engine = create_async_engine(
+            db_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True
+        )
+        event.listen(self.engine.sync_engine, "before_cursor_execute", count_query)
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.content_store = content_store
+        self._search_index: Optional[SearchIndex] = None
+        self._search_lock = asyncio.Lock()
+
+    async def create_tables(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+
+    @asynccontextmanager
+    async def get_session(self):
+        session = self.Session()
+        try:
+            yield session
+            await session.commit()
+        except:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    @staticmethod
+    async def _fill_content(session, nodes: List[Node]) -> None:
+        """Loads the text of nodes written through a content store, with one
+        query for the whole list; lazy loading can't run on the event loop."""
+        hashes = {node.content_hash for node in nodes if node.loaded_content is None and node.content_hash}
+        if not hashes:
+            return
+        result = await session.execute(
+            select(NodeContent.hash, NodeContent.encoding, NodeContent.data).where(NodeContent.hash.in_(hashes))
+        )
+        contents = {row.hash: decode_content(row.encoding, row.data) for row in result}
+        for node in nodes:
+            if node.loaded_content is None and node.content_hash in contents:
+                node.set_loaded_content(contents[node.content_hash])
+
+    async def get_node(self, node_id: str) -> Optional[Node]:
+        async with self.get_session() as session:
+            result = await session.execute(select(Node).where(Node.id == node_id))
+            node = result.scalars().first()
+            if node:
+                await self._fill_content(session, [node])
+                session.expunge(node)
+            return node
+
+    async def get_node_view(self, node_id: str, limit: int = DEFAULT_PAGE_SIZE) -> Optional[NodeView]:
+        check_page_size(limit)
+        async with self.get_session() as session:
+            result = await session.execute(node_view_query(node_id, limit + 1))
+            view = split_node_view(result.all())
+            if view is None:
+                return None
+            node, children, siblings = view
+            await self._fill_content(session, [node] + [child for child, _ in children + siblings])
+            session.expunge_all()
+            return build_node_view(node, children, siblings, limit)
+
+    async def get_conversation_path(self, node_id: str) -> List[Node]:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(Node)
+                .join(NodeAncestry, NodeAncestry.ancestor_id == Node.id)
+                .where(NodeAncestry.descendant_id == node_id)
+                .order_by(NodeAncestry.distance.desc())
+            )
+            path = result.scalars().all()
+            await self._fill_content(session, path)
+            [session.expunge(node) for node in path]
+            return list(path)
+
+    async def get_children(self, node_id: Optional[str]) -> List[Node]:
+        async with self.get_session() as session:
+            result = await session.execute(select(Node).where(Node.parent_id == node_id))
+            nodes = result.scalars().all()
+            await self._fill_content(session, nodes)
+            [session.expunge(node) for node in nodes]
+            return list(nodes)
+
+    async def get_siblings(self, node_id: str) -> List[Node]:
+        async with self.get_session() as session:
+            result = await session.execute(select(Node.parent_id).where(Node.id == node_id))
+            parent_id = result.scalar()
+            if not parent_id:
+                return []
+
+            result = await session.execute(
+                select(Node).where(Node.parent_id == parent_id, Node.id != node_id)
+            )
+            siblings = result.scalars().all()
+            await self._fill_content(session, siblings)
+            [session.expunge(sibling) for sibling in siblings]
+            return list(siblings)
+
+    async def get_children_page(self, node_id: Optional[str], limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None, exclude_id: Optional[str] = None) -> Page:
+        check_page_size(limit)
+        after = decode_cursor(cursor) if cursor else None
+        async with self.get_session() as session:
+            result = await session.execute(children_page_query(node_id, limit + 1, after, exclude_id))
+            rows = result.all()
+            await self._fill_content(session, [row.Node for row in rows])
+            session.expunge_all()
+            return make_page([(row.Node, row.child_count) for row in rows], limit)
+
+    async def get_siblings_page(self, node_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> Page:
+        async with self.get_session() as session:
+            result = await session.execute(select(Node.parent_id).where(Node.id == node_id))
+            parent_id = result.scalar()
+        if not parent_id:
+            return Page(items=[], next_cursor=None)
+        return await self.get_children_page(parent_id, limit, cursor, exclude_id=node_id)
+
+    async def get_subtree(self, node_id: str, max_depth: int, max_nodes: int) -> List[Tuple[Node, int]]:
+        async with self.get_session() as session:
+            result = await session.execute(subtree_query(node_id, max_depth, max_nodes))
+            rows = result.all()
+            await self._fill_content(session, [row.Node for row in rows])
+            session.expunge_all()
+            return [(row.Node, row.child_count) for row in rows]
+
+    async def search(self, query: str, node_type: Optional[NodeType] = None, root_id: Optional[str] = None,
+                     limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> SearchPage:
+        """ConversationGraph.search over the MySQL FULLTEXT index, or over an
+        in-process SearchIndex when node text lives in a content store."""
+        check_page_size(limit)
+        terms = query_terms(query)
+        if not terms:
+            raise ValueError("Search query needs at least one word of three or more characters")
+        after = decode_cursor(cursor) if cursor else None
+
+        async with self.get_session() as session:
+            if self.content_store is None:
+                result = await session.execute(
+                    select(Node.content_hash).order_by(Node.timestamp.desc(), Node.id.desc()).limit(1)
+                )
+                newest = result.first()
+                if newest is not None:
+                    self.content_store = newest.content_hash is not None
+            if self.content_store:
+                index = await self._updated_search_index(session)
+                node_ids = index.search(terms, node_type, root_id, limit + 1, after)
+                result = await session.execute(select(Node).where(Node.id.in_(node_ids)))
+                found = {node.id: node for node in result.scalars()}
+                nodes = [found[node_id] for node_id in node_ids if node_id in found]
+            else:
+                result = await session.execute(search_query(terms, node_type, root_id, limit + 1, after))
+                nodes = list(result.scalars().all())
+            await self._fill_content(session, nodes[:limit])
+            paths = {}
+            if nodes:
+                result = await session.execute(ancestor_ids_query([node.id for node in nodes[:limit]]))
+                paths = group_ancestor_ids(result)
+            session.expunge_all()
+            return make_search_page(nodes, terms, paths, limit)
+
+    async def _updated_search_index(self, session) -> SearchIndex:
+        """
+        The content store's search index: built from every node on first use,
+        then topped up before each search with the nodes written since, as
+        found among those stamped within SEARCH_CATCH_UP_WINDOW of the newest
+        indexed one. Writers are other processes, so there are no inserts to
+        hook into.
+        """
+        async with self._search_lock:
+            index = self._search_index
+            query = select(Node)
+            if index is not None:
+                latest = index.latest_timestamp()
+                new_ids = select(Node.id)
+                if latest is not None:
+                    new_ids = new_ids.where(Node.timestamp >= latest - SEARCH_CATCH_UP_WINDOW)
+                result = await session.execute(new_ids)
+                new_ids = [node_id for node_id in result.scalars() if node_id not in index]
+                if not new_ids:
+                    return index
+                query = query.where(Node.id.in_(new_ids))
+            else:
+                index = SearchIndex()
+
+            # Shallowest first, so every node's parent is indexed before it
+            query = query.order_by(Node.depth, Node.timestamp, Node.id).limit(SEARCH_INDEX_BATCH_SIZE)
+            last = None
+            while True:
+                batch_query = query
+                if last is not None:
+                    batch_query = query.where(or_(
+                        Node.depth > last.depth,
+                        and_(Node.depth == last.depth, or_(
+                            Node.timestamp > last.timestamp,
+                            and_(Node.timestamp == last.timestamp, Node.id > last.id)
+                        ))
+                    ))
+                result = await session.execute(batch_query)
+                batch = list(result.scalars().all())
+                if not batch:
+                    break
+                await self._fill_content(session, batch)
+                index.add(batch)
+                last = batch[-1]
+                session.expunge_all()
+            self._search_index = index
+            return index
+
+    async def count_subtree(self, node_id: str, max_depth: int, limit: Optional[int] = None) -> int:
+        async with self.get_session() as session:
+            result = await session.execute(count_subtree_query(node_id, max_depth, limit))
+            return result.scalar() or 0
+
+    async def count_descendants(self, node_id: str) -> int:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(NodeStats.descendant_count).where(NodeStats.node_id == node_id)
+            )
+            return result.scalar() or 0
+
+    async def get_subtree_stats(self, node_id: str) -> Optional[SubtreeStats]:
+        async with self.get_session() as session:
+            result = await session.execute(subtree_stats_query(node_id))
+            row = result.first()
+            return SubtreeStats(*row) if row else None
@@ -1,315 +1,514 @@
-import uuid
-from contextlib import contextmanager
-from datetime import datetime
-from enum import Enum
-from typing import List, Dict, Optional, Any
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Index, Enum as SQLEnum, text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.mysql import JSON
-
-Base = declarative_base()
-
-
-class NodeType(Enum):
-    SYSTEM = "SYSTEM"
-    PROMPT = "PROMPT"
-    RESPONSE = "RESPONSE"
-
-
-class Node(Base):
-    __tablename__ = 'conversation_nodes'
-
-    id = Column(String(36), primary_key=True)
-    content = Column(Text, nullable=False)
-    node_type = Column(SQLEnum(NodeType), nullable=False)
-    model_config = Column(JSON, nullable=True)
-    timestamp = Column(DateTime, default=datetime.now, index=True)
-    parent_id = Column(String(36), index=True, nullable=True)
-
-    __table_args__ = (
-        Index('idx_parent_type', 'parent_id', 'node_type'),
-        Index('idx_timestamp', 'timestamp'),
-    )
-
-    def __init__(self, **kwargs):
-        # Handle model_config specially to ensure it's always a dict if present
-        if 'model_config' in kwargs:
-            model_config = kwargs['model_config']
-            if isinstance(model_config, str):
-                import json
-                try:
-                    kwargs['model_config'] = json.loads(model_config)
-                except json.JSONDecodeError:
-                    kwargs['model_config'] = {
-                        "model": "unknown",
-                        "temperature": "unknown"
-                    }
-        super().__init__(**kwargs)
-
-    def to_dict(self) -> Dict:
-        return {
-            'id': self.id,
-            'content': self.content,
-            'node_type': self.node_type,
-            'model_config': self.model_config,
-            'timestamp': self.timestamp,
-            'parent_id': self.parent_id
-        }
-
-
+import itertools
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Any, Tuple, Iterator, Union, Callable
+
+from project.conversation_graph.metrics import metrics, instrument_methods
+from project.conversation_graph.graph.models import Base, Node, NodeAncestry, NodeType, NodeRef, \
+    GraphMetadata, SubtreeStats, VALID_TRANSITIONS, new_node_id
+from project.conversation_graph.graph.node_cache import NodeCache
+from project.conversation_graph.graph.pagination import Page, SearchPage, NodeView, DEFAULT_PAGE_SIZE, \
+    decode_cursor, make_page, build_node_view, check_page_size
+from project.conversation_graph.graph.search_index import query_terms, make_search_page
+from project.conversation_graph.graph.topology_index import TopologyIndex
+from project.conversation_graph.graph.write_queue import GroupCommitWriter
+from project.conversation_graph.storage.base import StorageBackend
+from project.conversation_graph.storage.sql import MySQLBackend, SQLiteBackend
+from project.conversation_graph.storage.memory import MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Nodes stamped within this window before the validation watermark are checked
+# again, since a slow transaction can commit after a later node was validated
+VALIDATION_GRACE_PERIOD = timedelta(seconds=30)
+VALIDATION_WATERMARK_KEY = "validated_up_to"
+# Most ids fetched in one IN (...) query when resolving many nodes at once
+FETCH_CHUNK_SIZE = 500
+# Default cap on the nodes returned by one get_subtree call
+SUBTREE_MAX_NODES = 2000
+
+_graph_numbers = itertools.count()
+
+# Methods timed into graph_operation_seconds: reads and writes that can reach
+# the database, not configuration or cache bookkeeping
+TIMED_OPERATIONS = (
+    "create_root", "add_node", "add_nodes_bulk", "import_conversation",
+    "get_node", "get_conversation_path", "get_children", "get_siblings", "get_children_page",
+    "get_siblings_page", "get_node_view", "get_leaf_nodes", "iter_children", "iter_leaf_nodes",
+    "iter_subtree", "validate_tree", "get_subtree", "count_subtree", "count_descendants",
+    "get_subtree_stats", "search", "subtree_size",
+)
+
+
+@instrument_methods("graph_operation_seconds", TIMED_OPERATIONS)
 class ConversationGraph:
-    def __init__(self, host: str, user: str, password: str, database: str):
-        db_url = f"mysql+mysqlconnector://{user}:{password}@{host}/{database}"
-        self.engine = create_engine(
-            db_url,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True
-        )
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
-
-    @contextmanager
-    def get_session(self):
-        session = self.Session()
-        try:
-            yield session
-            session.commit()
-        except:
-            session.rollback()
-            raise
-        finally:
-            session.close()
+    def __init__(self, host: Optional[str] = None, user: Optional[str] = None,
+                 password: Optional[str] = None, database: Optional[str] = None,
+                 backend: Optional[StorageBackend] = None,
+                 cache_max_entries: int = 100_000, cache_max_bytes: int = 64 * 1024 * 1024,
+                 cache_children: bool = True, topology_index: bool = False,
+                 group_commit: bool = False, group_commit_delay: float = 0.005,
+                 group_commit_max_nodes: int = 500, content_store: bool = False):
+        """
+        Connects to MySQL with the given credentials unless a storage backend is
+        passed instead; see sqlite() and in_memory() for the local backends.
+
+        Nodes read or written through this graph are kept in a bounded LRU cache.
+        Child lists are cached too unless cache_children is False, which callers
+        should set when other processes add nodes to the same tables, since the
+        cached lists only see writes made through this instance.
+
+        With topology_index=True the shape of the whole tree is loaded into a
+        TopologyIndex, and children, siblings, leaves and descendant counts are
+        answered from it. It has the same single-writer caveat as cached child
+        lists; call rebuild_topology() to pick up writes made elsewhere.
+
+        With group_commit=True, inserts from concurrent callers are gathered
+        for up to group_commit_delay seconds (or group_commit_max_nodes nodes)
+        and committed together by one background writer; see GroupCommitWriter.
+        Calls still return only once their nodes are committed. Call close()
+        to flush and stop the writer.
+
+        content_store=True keeps node text in the MySQL backend's content store
+        (see SQLBackend); nodes then load their content on first access, and
+        load_content() fetches it for many nodes at once.
+        """
+        self.backend = backend or MySQLBackend(host, user, password, database, content_store=content_store)
+        self.cache = NodeCache(max_entries=cache_max_entries, max_bytes=cache_max_bytes)
+        self.cache_children = cache_children
+        self.topology: Optional[TopologyIndex] = None
+        self._write_listeners: List[Callable[[List[Node]], None]] = []
+        self.writer: Optional[GroupCommitWriter] = None
+        if group_commit:
+            self.writer = GroupCommitWriter(self.backend, max_delay=group_commit_delay,
+                                            max_nodes=group_commit_max_nodes)
+        metrics.register_collector("graph_node_cache", self.cache_stats, graph=str(next(_graph_numbers)))
+        if topology_index:
+            self.rebuild_topology()
+
+    @classmethod
+    def sqlite(cls, path: str = ":memory:", content_store: bool = False, **kwargs) -> "ConversationGraph":
+        return cls(backend=SQLiteBackend(path, content_store=content_store), **kwargs)
+
+    @classmethod
+    def in_memory(cls, **kwargs) -> "ConversationGraph":
+        return cls(backend=MemoryBackend(), **kwargs)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.backend.close()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def rebuild_topology(self) -> TopologyIndex:
+        self.topology = TopologyIndex.load(self.backend.iter_topology())
+        return self.topology
 
     def create_root(self, system_prompt: str, model_config: Dict[str, Any]) -> str:
-        with self.get_session() as session:
-            root = Node(
-                id=str(uuid.uuid4()),
-                content=system_prompt,
-                node_type=NodeType.SYSTEM,
-                model_config=model_config
-            )
-            session.add(root)
-            return root.id
+        root = self._new_node(system_prompt, NodeType.SYSTEM, None, model_config)
+        self._insert([root])
+        self._after_insert([root])
+        return root.id
 
     def add_node(self, content: str, node_type: NodeType, parent_id: str,
                  model_config: Optional[Dict[str, Any]] = None) -> str:
         try:
-            self.validate_node_addition(parent_id, node_type)
+            parent = self._check_node_addition(parent_id, node_type)
         except ValueError as e:
-            self.logger.error(f"Invalid node addition attempted: {e}")
+            logger.error(f"Invalid node addition attempted: {e}")
             raise
 
-        with self.get_session() as session:
-            node = Node(
-                id=str(uuid.uuid4()),
-                content=content,
-                node_type=node_type,
-                parent_id=parent_id,
-                model_config=model_config
-            )
-            session.add(node)
-            return node.id
+        node = self._new_node(content, node_type, parent, model_config)
+        self._insert([node])
+        self._after_insert([node])
+        return node.id
+
+    @staticmethod
+    def _new_node(content: str, node_type: NodeType, parent: Optional[Node],
+                  model_config: Optional[Dict[str, Any]]) -> Node:
+        if parent is None:
+            depth = 0
+        else:
+            depth = parent.depth + 1 if parent.depth is not None else None
+
+        return Node(
+            id=new_node_id(),
+            content=content,
+            node_type=node_type,
+            parent_id=parent.id if parent is not None else None,
+            model_config=model_config,
+            timestamp=datetime.now(),
+            depth=depth
+        )
+
+    def add_nodes_bulk(self, nodes: List[Dict[str, Any]], chunk_size: int = 500) -> List[str]:
+        """
+        Inserts a batch of nodes in one transaction and returns their ids in order.
+
+        Each entry has content, node_type and optionally model_config, plus either
+        parent_id (an existing node) or parent_index (an earlier entry in the same
+        batch); entries with neither are roots. Type transitions are validated in
+        memory against one prefetch of the existing parents, and rows are written
+        in chunks of chunk_size.
+        """
+        external_parent_ids = list({entry['parent_id'] for entry in nodes if entry.get('parent_id')})
+        parents = {parent.id: parent for parent in self._get_nodes(external_parent_ids)}
+
+        new_nodes = []
+        for index, entry in enumerate(nodes):
+            node_type = entry['node_type']
+            parent_index = entry.get('parent_index')
+
+            if parent_index is not None:
+                if not 0 <= parent_index < index:
+                    raise ValueError(f"parent_index {parent_index} of entry {index} must refer to an earlier entry")
+                parent = new_nodes[parent_index]
+            elif entry.get('parent_id'):
+                parent = parents.get(entry['parent_id'])
+                if parent is None:
+                    raise ValueError(f"Parent node {entry['parent_id']} not found")
+            else:
+                parent = None
+
+            if parent is None:
+                if node_type != NodeType.SYSTEM:
+                    raise ValueError(f"Root nodes must be SYSTEM nodes. Invalid entry: {index}")
+            else:
+                self._check_transition(parent.node_type, node_type, f"at batch index {index}")
+
+            new_nodes.append(self._new_node(entry['content'], node_type, parent, entry.get('model_config')))
+
+        self._insert(new_nodes, chunk_size=chunk_size)
+        self._after_insert(new_nodes)
+        return [node.id for node in new_nodes]
+
+    def import_conversation(self, system_prompt: str, model_config: Dict[str, Any],
+                            turns: List[Tuple[str, str]], chunk_size: int = 500) -> List[str]:
+        """
+        Creates a new tree holding one linear conversation of (prompt, response)
+        turns in a single bulk insert. Returns the ids root first.
+        """
+        nodes = [{'content': system_prompt, 'node_type': NodeType.SYSTEM, 'model_config': model_config}]
+        for prompt, response in turns:
+            nodes.append({'content': prompt, 'node_type': NodeType.PROMPT,
+                          'model_config': model_config, 'parent_index': len(nodes) - 1})
+            nodes.append({'content': response, 'node_type': NodeType.RESPONSE,
+                          'model_config': model_config, 'parent_index': len(nodes) - 1})
+
+        return self.add_nodes_bulk(nodes, chunk_size=chunk_size)
+
+    def _insert(self, nodes: List[Node], chunk_size: int = 500) -> None:
+        if self.writer is not None:
+            self.writer.write(nodes)
+        else:
+            self.backend.insert_nodes(nodes, chunk_size=chunk_size)
+
+    def add_write_listener(self, listener: Callable[[List[Node]], None]) -> None:
+        """Registers a callback run with the new nodes after every committed
+        insert through this graph, e.g. to invalidate caches built on top of it."""
+        self._write_listeners.append(listener)
+
+    def _after_insert(self, nodes: List[Node]) -> None:
+        for node in nodes:
+            self._cache_new_node(node)
+        for listener in self._write_listeners:
+            try:
+                listener(nodes)
+            except Exception as e:
+                logger.error(f"Write listener failed: {e}")
+
+    def _cache_new_node(self, node: Node) -> None:
+        if self.topology is not None:
+            self.topology.add(node.id, node.parent_id, node.node_type)
+        self.cache.put_node(node)
+        if self.cache_children:
+            self.cache.add_child(node.parent_id, node.id)
+            self.cache.put_child_ids(node.id, [])
 
     def get_node(self, node_id: str) -> Optional[Node]:
-        with self.get_session() as session:
-            node = session.query(Node).filter(Node.id == node_id).first()
-            if node: session.expunge(node)
+        node = self.cache.get_node(node_id)
+        if node:
             return node
 
+        node = self.backend.get_node(node_id)
+        if node:
+            self.cache.put_node(node)
+        return node
+
+    def _get_nodes(self, node_ids: List[str]) -> List[Node]:
+        """Fetches nodes by id, preserving order, with one query for all cache misses."""
+        found = {}
+        missing = []
+        for node_id in node_ids:
+            node = self.cache.get_node(node_id)
+            if node:
+                found[node_id] = node
+            else:
+                missing.append(node_id)
+
+        for start in range(0, len(missing), FETCH_CHUNK_SIZE):
+            for node in self.backend.get_nodes(missing[start:start + FETCH_CHUNK_SIZE]):
+                self.cache.put_node(node)
+                found[node.id] = node
+
+        return [found[node_id] for node_id in node_ids if node_id in found]
+
     def get_conversation_path(self, node_id: str) -> List[Node]:
-        recursive_query = text("""
-            WITH RECURSIVE path_cte AS (
-                SELECT *, 1 as level 
-                FROM conversation_nodes 
-                WHERE id = :node_id
-                UNION ALL
-                SELECT n.*, p.level + 1
-                FROM conversation_nodes n
-                INNER JOIN path_cte p ON n.id = p.parent_id
-            )
-            SELECT * FROM path_cte
-            ORDER BY level DESC;
-        """)
-
-        with self.get_session() as session:
-            result = session.execute(recursive_query, {'node_id': node_id})
-            return [
-                Node(
-                    id=row.id,
-                    content=row.content,
-                    node_type=NodeType(row.node_type),
-                    model_config=row.model_config,
-                    timestamp=row.timestamp,
-                    parent_id=row.parent_id
-                )
-                for row in result
-            ]
-
-    def get_children(self, node_id: str) -> List[Node]:
-        with self.get_session() as session:
-            nodes = session.query(Node).filter(Node.parent_id == node_id).all()
-            [session.expunge(node) for node in nodes]
-            return nodes
+        cached_path = self.cache.get_path(node_id)
+        if cached_path is not None:
+            # Nodes cached from child listings may not have loaded their content yet
+            return self.backend.load_content(cached_path)
+
+        path = self.backend.get_path(node_id)
+        for node in path:
+            self.cache.put_node(node)
+        return path
+
+    def load_content(self, nodes: List[Node]) -> List[Node]:
+        """Fetches the content of every node that has not loaded it yet in one
+        go; worth calling before reading .content on a list of nodes."""
+        return self.backend.load_content(nodes)
+
+    def get_children(self, node_id: Optional[str]) -> List[Node]:
+        if self.topology is not None:
+            child_ids = self.topology.root_ids() if node_id is None else self.topology.child_ids(node_id)
+            if child_ids is not None:
+                return self._get_nodes(child_ids)
+
+        if self.cache_children:
+            child_ids = self.cache.get_child_ids(node_id)
+            if child_ids is not None:
+                return self._get_nodes(child_ids)
+
+        stamp = self.cache.child_write_stamp()
+        nodes = self.backend.get_children(node_id)
+
+        for node in nodes:
+            self.cache.put_node(node)
+        if self.cache_children:
+            self.cache.put_child_ids(node_id, [node.id for node in nodes], stamp)
+        return nodes
 
     def get_siblings(self, node_id: str) -> List[Node]:
-        with self.get_session() as session:
-            node = session.query(Node).filter(Node.id == node_id).first()
-            if not node or not node.parent_id:
-                return []
+        if self.topology is not None:
+            sibling_ids = self.topology.sibling_ids(node_id)
+            if sibling_ids is not None:
+                return self._get_nodes(sibling_ids)
+
+        node = self.get_node(node_id)
+        if not node or not node.parent_id:
+            return []
 
-            siblings = session.query(Node).filter(
-                Node.parent_id == node.parent_id,
-                Node.id != node_id
-            ).all()
+        return [sibling for sibling in self.get_children(node.parent_id) if sibling.id != node_id]
 
-            [session.expunge(sibling) for sibling in siblings]
-            return siblings
+    def get_children_page(self, node_id: Optional[str], limit: int = DEFAULT_PAGE_SIZE,
+                          cursor: Optional[str] = None, exclude_id: Optional[str] = None) -> Page:
+        """
+        One page of node_id's children (roots when None) ordered by (timestamp,
+        id), each with its own child count. Pass the returned next_cursor back
+        to get the following page; each page costs one indexed range scan
+        however many children come before it.
+        """
+        check_page_size(limit)
+        after = decode_cursor(cursor) if cursor else None
+        rows = self.backend.get_children_page(node_id, limit + 1, after, exclude_id)
+        for node, _ in rows:
+            self.cache.put_node(node)
+        return make_page(rows, limit)
+
+    def get_siblings_page(self, node_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                          cursor: Optional[str] = None) -> Page:
+        node = self.get_node(node_id)
+        if not node or not node.parent_id:
+            return Page(items=[], next_cursor=None)
+        return self.get_children_page(node.parent_id, limit, cursor, exclude_id=node_id)
+
+    def get_node_view(self, node_id: str, limit: int = DEFAULT_PAGE_SIZE) -> Optional[NodeView]:
+        """
+        Returns the node with the first page of its children and of its
+        siblings, each child with its own child count, from one backend query.
+        The pages' cursors continue through get_children_page and
+        get_siblings_page.
+        """
+        check_page_size(limit)
+        view = self.backend.get_node_view(node_id, limit + 1)
+        if view is None:
+            return None
+        node, children, siblings = view
+        self.cache.put_node(node)
+        for child, _ in children + siblings:
+            self.cache.put_node(child)
+        return build_node_view(node, children, siblings, limit)
 
     def get_leaf_nodes(self) -> List[Node]:
-        leaf_query = text("""
-            SELECT n.*
-            FROM conversation_nodes n
-            LEFT JOIN conversation_nodes c ON n.id = c.parent_id
-            WHERE c.id IS NULL;
-        """)
-
-        with self.get_session() as session:
-            result = session.execute(leaf_query)
-            return [
-                Node(
-                    id=row.id,
-                    content=row.content,
-                    node_type=NodeType(row.node_type),
-                    model_config=row.model_config,
-                    timestamp=row.timestamp,
-                    parent_id=row.parent_id
-                )
-                for row in result
-            ]
-
-    def validate_tree(self) -> bool:
+        if self.topology is not None:
+            return self._get_nodes(self.topology.leaf_ids())
+        return self.backend.get_leaf_nodes()
+
+    def iter_children(self, node_id: Optional[str], batch_size: int = 1000,
+                      with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        """
+        Streams the children of node_id (roots when None) batch_size rows at a
+        time instead of building the whole list. Pass with_content=False to get
+        NodeRefs (id, parent, type, depth) without reading content at all.
+        """
+        if self.topology is not None:
+            child_ids = self.topology.root_ids() if node_id is None else self.topology.child_ids(node_id)
+            if child_ids is not None:
+                return self._iter_indexed(child_ids, batch_size, with_content)
+        return self.backend.iter_children(node_id, batch_size, with_content)
+
+    def iter_leaf_nodes(self, batch_size: int = 1000,
+                        with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        if self.topology is not None:
+            return self._iter_indexed(self.topology.leaf_ids(), batch_size, with_content)
+        return self.backend.iter_leaf_nodes(batch_size, with_content)
+
+    def iter_subtree(self, node_id: str, batch_size: int = 1000,
+                     with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        """Streams node_id and all its descendants, shallowest first."""
+        if self.topology is not None and node_id in self.topology:
+            return self._iter_indexed(list(self.topology.iter_subtree_ids(node_id)), batch_size, with_content)
+        return self.backend.iter_subtree(node_id, batch_size, with_content)
+
+    def _iter_indexed(self, node_ids: List[str], batch_size: int,
+                      with_content: bool) -> Iterator[Union[Node, NodeRef]]:
+        # Streamed nodes bypass the cache so one long scan cannot evict the hot set
+        for start in range(0, len(node_ids), batch_size):
+            batch = node_ids[start:start + batch_size]
+            if not with_content:
+                yield from (self.topology.ref(node_id) for node_id in batch)
+                continue
+
+            fetched = {node.id: node for node in self.backend.get_nodes(batch)}
+            yield from (fetched[node_id] for node_id in batch if node_id in fetched)
+
+    def validate_tree(self, full: bool = False) -> bool:
         """
         Validates that the conversation tree follows the required structure:
         - All roots must be system nodes
         - Any child of a System node must be a Prompt
         - Any child of a Prompt node must be a Response
         - Any child of a Response node must be a Prompt
+
+        By default only nodes written since the last run are checked, using the
+        watermark persisted in graph_metadata. Pass full=True to check every node
+        again, e.g. for an offline audit.
         Returns True if valid, raises ValueError with description if invalid
         """
-        with self.get_session() as session:
-            root_nodes = session.query(Node).filter(Node.parent_id == None).all()
-            if not root_nodes:
-                raise ValueError("No root nodes found")
-
-            invalid_roots = [root for root in root_nodes if root.node_type != NodeType.SYSTEM]
-            if invalid_roots:
-                invalid_ids = [root.id for root in invalid_roots]
-                raise ValueError(f"Root nodes must be SYSTEM nodes. Invalid roots: {invalid_ids}")
-
-            query = text("""
-                   WITH RECURSIVE tree_cte AS (
-                       SELECT 
-                           id,
-                           node_type,
-                           parent_id,
-                           0 as level,
-                           id as root_id
-                       FROM conversation_nodes
-                       WHERE parent_id IS NULL
-
-                       UNION ALL
-
-                       SELECT 
-                           n.id,
-                           n.node_type,
-                           n.parent_id,
-                           t.level + 1,
-                           t.root_id
-                       FROM conversation_nodes n
-                       INNER JOIN tree_cte t ON t.id = n.parent_id
-                   )
-                   SELECT 
-                       n.id,
-                       n.node_type as current_type,
-                       p.node_type as parent_type,
-                       t.root_id
-                   FROM tree_cte t
-                   JOIN conversation_nodes n ON n.id = t.id
-                   LEFT JOIN conversation_nodes p ON p.id = n.parent_id
-                   ORDER BY t.root_id, t.level;
-               """)
-
-            result = session.execute(query)
-
-            valid_transitions = {
-                None: [NodeType.SYSTEM],
-                NodeType.SYSTEM: [NodeType.PROMPT],
-                NodeType.PROMPT: [NodeType.RESPONSE],
-                NodeType.RESPONSE: [NodeType.PROMPT]
-            }
-
-            for row in result:
-                current_type = NodeType(row.current_type)
-                parent_type = NodeType(row.parent_type) if row.parent_type else None
-
-                if parent_type is None:
-                    continue
-
-                if parent_type not in valid_transitions:
-                    raise ValueError(f"Invalid parent type {parent_type} for node {row.id}")
-
-                if current_type not in valid_transitions[parent_type]:
-                    raise ValueError(
-                        f"Invalid node type transition: {parent_type} -> {current_type} "
-                        f"for node {row.id} in tree with root {row.root_id}"
-                    )
-
-            return True
+        watermark = self.backend.get_metadata(VALIDATION_WATERMARK_KEY)
+        latest = self.backend.latest_timestamp()
 
-    def validate_node_addition(self, parent_id: str, node_type: NodeType) -> bool:
-        with self.get_session() as session:
-            parent = session.query(Node).filter(Node.id == parent_id).first()
-            if not parent:
-                raise ValueError(f"Parent node {parent_id} not found")
+        if full or watermark is None:
+            since = None
+        else:
+            since = datetime.fromisoformat(watermark) - VALIDATION_GRACE_PERIOD
 
-            valid_transitions = {
-                NodeType.SYSTEM: [NodeType.PROMPT],
-                NodeType.PROMPT: [NodeType.RESPONSE],
-                NodeType.RESPONSE: [NodeType.PROMPT]
-            }
+        root_count = 0
+        for row in self.backend.iter_transitions(since):
+            if row.parent_id is None:
+                if row.node_type != NodeType.SYSTEM:
+                    raise ValueError(f"Root nodes must be SYSTEM nodes. Invalid roots: {[row.id]}")
+                root_count += 1
+                continue
 
-            if parent.node_type not in valid_transitions:
-                raise ValueError(f"Invalid parent node type: {parent.node_type}")
+            if row.parent_type is None:
+                raise ValueError(f"Parent node {row.parent_id} of node {row.id} not found")
 
-            if node_type not in valid_transitions[parent.node_type]:
-                raise ValueError(
-                    f"Cannot add node of type {node_type} to parent of type {parent.node_type}"
-                )
+            self._check_transition(row.parent_type, row.node_type, row.id)
 
-            return True
+        if since is None and root_count == 0:
+            raise ValueError("No root nodes found")
 
-    def count_descendants(self, node_id: str) -> int:
-        recursive_query = text("""
-            WITH RECURSIVE descendants_cte AS (
-                -- Base case: direct children
-                SELECT id
-                FROM conversation_nodes 
-                WHERE parent_id = :node_id
-
-                UNION ALL
-
-                -- Recursive case: children of children
-                SELECT n.id
-                FROM conversation_nodes n
-                INNER JOIN descendants_cte d ON n.parent_id = d.id
+        if latest is not None and (watermark is None or latest > datetime.fromisoformat(watermark)):
+            self.backend.set_metadata(VALIDATION_WATERMARK_KEY, latest.isoformat())
+
+        return True
+
+    @staticmethod
+    def _check_transition(parent_type: NodeType, node_type: NodeType, node_id: str) -> None:
+        if parent_type not in VALID_TRANSITIONS:
+            raise ValueError(f"Invalid parent type {parent_type} for node {node_id}")
+
+        if node_type not in VALID_TRANSITIONS[parent_type]:
+            raise ValueError(
+                f"Invalid node type transition: {parent_type} -> {node_type} "
+                f"for node {node_id}"
             )
-            SELECT COUNT(*) as count
-            FROM descendants_cte;
-        """)
 
-        with self.get_session() as session:
-            result = session.execute(recursive_query, {'node_id': node_id})
-            return result.scalar() or 0
+    def validate_node_addition(self, parent_id: str, node_type: NodeType) -> bool:
+        self._check_node_addition(parent_id, node_type)
+        return True
+
+    def _check_node_addition(self, parent_id: str, node_type: NodeType) -> Node:
+        parent = self.get_node(parent_id)
+        if not parent:
+            raise ValueError(f"Parent node {parent_id} not found")
 
+        if parent.node_type not in VALID_TRANSITIONS:
+            raise ValueError(f"Invalid parent node type: {parent.node_type}")
+
+        if node_type not in VALID_TRANSITIONS[parent.node_type]:
+            raise ValueError(
+                f"Cannot add node of type {node_type} to parent of type {parent.node_type}"
+            )
+
+        return parent
+
+    def get_subtree(self, node_id: str, max_depth: int,
+                    max_nodes: int = SUBTREE_MAX_NODES) -> List[Tuple[Node, int]]:
+        """
+        The region at most max_depth levels below node_id, itself included, as
+        (node, child count) pairs in one query. Shallower levels come first and
+        every parent precedes its children; at most max_nodes are returned, so
+        a cut-off region is complete down to its last level.
+        """
+        rows = self.backend.get_subtree(node_id, max_depth, max_nodes)
+        for node, _ in rows:
+            self.cache.put_node(node)
+        return rows
+
+    def count_subtree(self, node_id: str, max_depth: int) -> int:
+        return self.backend.count_subtree(node_id, max_depth)
+
+    def count_descendants(self, node_id: str) -> int:
+        if self.topology is not None:
+            count = self.topology.count_descendants(node_id)
+            if count is not None:
+                return count
+        return self.backend.count_descendants(node_id)
+
+    def get_subtree_stats(self, node_id: str) -> Optional[SubtreeStats]:
+        """Descendant count, levels below and leaf count of node_id's subtree,
+        read from counters the backend maintains on insert."""
+        return self.backend.get_subtree_stats(node_id)
+
+    def search(self, query: str, node_type: Optional[NodeType] = None, root_id: Optional[str] = None,
+               limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> SearchPage:
+        """
+        One page of nodes whose content contains every word of query (words
+        under three characters are ignored), newest first, optionally of one
+        type and under root_id. Each hit carries a snippet around the match and
+        its path of ids from the root. Pass next_cursor back for the next page.
+        """
+        check_page_size(limit)
+        terms = query_terms(query)
+        if not terms:
+            raise ValueError("Search query needs at least one word of three or more characters")
+        after = decode_cursor(cursor) if cursor else None
+
+        nodes = self.backend.search(terms, node_type, root_id, limit + 1, after)
+        self.backend.load_content(nodes[:limit])
+        for node in nodes[:limit]:
+            self.cache.put_node(node)
+        paths = self.backend.get_ancestor_ids([node.id for node in nodes[:limit]])
+        return make_search_page(nodes, terms, paths, limit)
+
+    def subtree_size(self, node_id: str) -> int:
+        """Nodes in the subtree rooted at node_id, itself included; 0 if the
+        node does not exist."""
+        if self.topology is not None and node_id in self.topology:
+            return self.topology.subtree_size(node_id)
+        return self.count_descendants(node_id) + 1 if self.get_node(node_id) else 0
@@ -0,0 +1,305 @@
+"""
+Bulk export and import of whole graphs or single trees.
+
+    python -m project.conversation_graph.graph.export export graph.arrow [--root NODE_ID]
+    python -m project.conversation_graph.graph.export import graph.arrow [--skip-existing]
+
+The file format follows the extension: .arrow (Arrow IPC, uncompressed so it
+can be memory-mapped), .parquet, or .jsonl / .jsonl.gz when pyarrow is not
+installed. Nodes are streamed batch_size at a time in both directions, parents
+before children, so neither side holds more than a batch of content in memory.
+"""
+import argparse
+import gzip
+import json
+from datetime import datetime
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Iterable, Optional
+
+from project.conversation_graph.graph.conversation_graph import VALIDATION_WATERMARK_KEY
+from project.conversation_graph.graph.models import Node, NodeType, VALID_TRANSITIONS
+from project.conversation_graph.storage.base import StorageBackend
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("arrow", "parquet", "jsonl")
+# Topology first, content last, so readers that only want the shape can stop early
+COLUMNS = ("id", "parent_id", "node_type", "depth", "timestamp", "model_config", "content")
+TOPOLOGY_COLUMNS = ("id", "parent_id", "node_type", "depth")
+
+
+def arrow_schema():
+    return pyarrow.schema([
+        ("id", pyarrow.string()),
+        ("parent_id", pyarrow.string()),
+        ("node_type", pyarrow.string()),
+        ("depth", pyarrow.int32()),
+        ("timestamp", pyarrow.timestamp("us")),
+        ("model_config", pyarrow.string()),
+        ("content", pyarrow.large_string()),
+    ])
+
+
+def detect_format(path: str) -> str:
+    if path.endswith((".arrow", ".feather", ".ipc")):
+        return "arrow"
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        return "jsonl"
+    raise ValueError(f"Can't tell the export format of {path}; use .arrow, .parquet or .jsonl[.gz]")
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt != "jsonl" and pyarrow is None:
+        raise ValueError(f"The {fmt} format needs the pyarrow package; use .jsonl instead")
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _row(node: Node) -> Dict[str, Any]:
+    return {
+        "id": node.id,
+        "parent_id": node.parent_id,
+        "node_type": node.node_type.value,
+        "depth": node.depth,
+        "timestamp": node.timestamp,
+        "model_config": json.dumps(node.model_config) if node.model_config is not None else None,
+        "content": node.content,
+    }
+
+
+def _node(row: Dict[str, Any]) -> Node:
+    timestamp = row["timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return Node(
+        id=row["id"],
+        content=row["content"],
+        node_type=NodeType(row["node_type"]),
+        model_config=row["model_config"],
+        timestamp=timestamp,
+        parent_id=row["parent_id"],
+        depth=row["depth"],
+    )
+
+
+def iter_export_nodes(backend: StorageBackend, root_id: Optional[str] = None,
+                      batch_size: int = 5000) -> Iterator[List[Node]]:
+    """Batches of every node in root_id's tree, or of every tree when root_id
+    is None, each tree in distance order so parents precede their children."""
+    if root_id is not None:
+        root_ids = [root_id]
+    else:
+        root_ids = [ref.id for ref in backend.iter_children(None, batch_size, with_content=False)]
+
+    for tree_root_id in root_ids:
+        for batch in _batches(backend.iter_subtree(tree_root_id, batch_size), batch_size):
+            # One content fetch per batch instead of one per node on a content-store backend
+            yield backend.load_content(batch)
+
+
+class _ArrowWriter:
+    def __init__(self, path: str, fmt: str):
+        schema = arrow_schema()
+        if fmt == "arrow":
+            self._writer = pyarrow.ipc.new_file(path, schema)
+        else:
+            self._writer = pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+        self._schema = schema
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._writer.write_batch(pyarrow.RecordBatch.from_pylist(rows, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self._file = gzip.open(path, "wt") if path.endswith(".gz") else open(path, "w")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._file.write("".join(json.dumps(row, default=datetime.isoformat) + "\n" for row in rows))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def export_graph(backend: StorageBackend, path: str, root_id: Optional[str] = None,
+                 fmt: Optional[str] = None, batch_size: int = 5000) -> int:
+    """Writes root_id's tree (every tree if None) to path; returns the node count."""
+    fmt = fmt or detect_format(path)
+    _check_format(fmt)
+    writer = _JsonlWriter(path) if fmt == "jsonl" else _ArrowWriter(path, fmt)
+    exported = 0
+    try:
+        for batch in iter_export_nodes(backend, root_id, batch_size):
+            writer.write([_row(node) for node in batch])
+            exported += len(batch)
+    finally:
+        writer.close()
+    return exported
+
+
+def iter_file_rows(path: str, fmt: Optional[str] = None, batch_size: int = 5000,
+                   columns: Iterable[str] = COLUMNS) -> Iterator[List[Dict[str, Any]]]:
+    """Batches of rows read back from an export, limited to columns."""
+    fmt = fmt or detect_format(path)
+    _check_format(fmt)
+    columns = list(columns)
+
+    if fmt == "jsonl":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as file:
+            for lines in _batches(file, batch_size):
+                rows = [json.loads(line) for line in lines]
+                yield [{column: row[column] for column in columns} for row in rows]
+        return
+
+    if fmt == "arrow":
+        with pyarrow.memory_map(path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index).select(columns)
+                for start in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(start, batch_size).to_pylist()
+        return
+
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pylist()
+
+
+def read_topology(path: str):
+    """
+    The id, parent_id, node_type and depth columns of an Arrow export as a
+    pyarrow Table over a memory map: nothing is copied and the content column
+    is never paged in, so analytics can scan the shape of very large graphs.
+    """
+    if detect_format(path) != "arrow":
+        raise ValueError("read_topology needs an .arrow export")
+    _check_format("arrow")
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all().select(list(TOPOLOGY_COLUMNS))
+
+
+def _check_batch(nodes: List[Node], parent_types: Dict[Optional[str], NodeType]) -> None:
+    """Applies the tree rules ConversationGraph.validate_tree enforces to one
+    batch, in file order, raising on the first node that breaks them."""
+    for node in nodes:
+        parent_type = parent_types.get(node.parent_id) if node.parent_id is not None else None
+        if node.parent_id is None and node.node_type != NodeType.SYSTEM:
+            raise ValueError(f"Root nodes must be SYSTEM nodes. Invalid root: {node.id}")
+        if node.parent_id is not None and parent_type not in VALID_TRANSITIONS:
+            raise ValueError(f"Invalid parent type {parent_type} for node {node.id}")
+        if node.node_type not in VALID_TRANSITIONS[parent_type]:
+            raise ValueError(f"Invalid node type transition: {parent_type} -> {node.node_type} "
+                             f"for node {node.id}")
+
+
+def import_graph(backend: StorageBackend, path: str, fmt: Optional[str] = None,
+                 batch_size: int = 5000, skip_existing: bool = False) -> int:
+    """
+    Inserts the nodes of an export, one transaction per batch, and returns how
+    many were inserted. Each batch is checked against the same rules as
+    ConversationGraph.validate_tree before it is written, and the import
+    stops at the first node that breaks them or whose parent is neither in the
+    file nor already stored; batches written before that stay. With
+    skip_existing, nodes already present are left alone, so an interrupted
+    import can be re-run.
+
+    Imported nodes keep their original timestamps, so the validation watermark
+    is moved back to the oldest of them for validate_tree to cover them too.
+    Graphs over the same backend won't see the new nodes in cached child lists
+    or a topology index until those are rebuilt.
+    """
+    imported = 0
+    oldest: Optional[datetime] = None
+    previous_types: Dict[Optional[str], NodeType] = {}
+    try:
+        for rows in iter_file_rows(path, fmt, batch_size):
+            nodes = [_node(row) for row in rows]
+            batch_types = {node.id: node.node_type for node in nodes}
+
+            if skip_existing:
+                existing = {node.id for node in backend.get_nodes(list(batch_types))}
+                nodes = [node for node in nodes if node.id not in existing]
+
+            # Parents usually sit in this batch or the one before; only look up the rest
+            parent_types = {**previous_types, **batch_types}
+            unresolved = list({
+                node.parent_id for node in nodes
+                if node.parent_id is not None and node.parent_id not in parent_types
+            })
+            if unresolved:
+                found = backend.get_nodes(unresolved)
+                missing = set(unresolved) - {node.id for node in found}
+                if missing:
+                    raise ValueError(f"{len(missing)} parent nodes are neither in the export nor stored, "
+                                     f"e.g. {next(iter(missing))}")
+                parent_types.update((node.id, node.node_type) for node in found)
+            _check_batch(nodes, parent_types)
+
+            if nodes:
+                backend.insert_nodes(nodes, chunk_size=min(batch_size, 500))
+                batch_oldest = min(node.timestamp for node in nodes)
+                oldest = batch_oldest if oldest is None else min(oldest, batch_oldest)
+            imported += len(nodes)
+            previous_types = batch_types
+    finally:
+        if oldest is not None:
+            _rewind_watermark(backend, oldest)
+    return imported
+
+
+def _rewind_watermark(backend: StorageBackend, oldest: datetime) -> None:
+    watermark = backend.get_metadata(VALIDATION_WATERMARK_KEY)
+    if watermark is not None and oldest <= datetime.fromisoformat(watermark):
+        backend.set_metadata(VALIDATION_WATERMARK_KEY, oldest.isoformat())
+
+
+def main():
+    from project.conversation_graph.config import MYSQL_CONFIG
+    from project.conversation_graph.storage.sql import MySQLBackend, SQLiteBackend
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--root", help="export only this root's tree (or any node's subtree)")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--skip-existing", action="store_true", help="import: leave nodes already stored")
+    parser.add_argument("--sqlite-path", help="use this SQLite database instead of MySQL")
+    parser.add_argument("--mysql-database", default=MYSQL_CONFIG["database"])
+    args = parser.parse_args()
+
+    if args.sqlite_path:
+        backend = SQLiteBackend(args.sqlite_path)
+    else:
+        backend = MySQLBackend(**{**MYSQL_CONFIG, "database": args.mysql_database})
+    try:
+        if args.command == "export":
+            count = export_graph(backend, args.path, args.root, args.format, args.batch_size)
+            print(f"Exported {count} nodes to {args.path}")
+        else:
+            count = import_graph(backend, args.path, args.format, args.batch_size, args.skip_existing)
+            print(f"Imported {count} nodes from {args.path}")
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, inspect, text, insert, select, update, func, MetaData, Table, BINARY, \
+    VARBINARY, LargeBinary
+
+from project.conversation_graph.graph.models import Node, NodeAncestry, NodeStats
+from project.conversation_graph.storage.sql import SQLBackend, MySQLBackend
+
+
+def ensure_depth_column(backend: SQLBackend) -> None:
+    """Adds conversation_nodes.depth to tables created before it existed."""
+    columns = {column['name'] for column in inspect(backend.engine).get_columns('conversation_nodes')}
+    if 'depth' not in columns:
+        with backend.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE conversation_nodes ADD COLUMN depth INTEGER NULL"))
+
+
+def ensure_indexes(backend: SQLBackend) -> None:
+    """Creates conversation_nodes indexes added after the table was created."""
+    existing = {index['name'] for index in inspect(backend.engine).get_indexes('conversation_nodes')}
+    for index in Node.__table__.indexes:
+        if index.name not in existing:
+            index.create(backend.engine)
+
+
+def _node_snapshot(backend: SQLBackend) -> Tuple[int, Optional[datetime]]:
+    with backend.engine.connect() as conn:
+        row = conn.execute(select(func.count(), func.max(Node.timestamp)).select_from(Node)).one()
+    return row[0], row[1]
+
+
+def _check_no_writes(backend: SQLBackend, before: Tuple[int, Optional[datetime]], migration: str) -> None:
+    """Raises if nodes were inserted since before was taken, since a rebuild
+    that ran alongside writers leaves their rows wrong or missing."""
+    if _node_snapshot(backend) != before:
+        raise RuntimeError(f"Nodes were written during {migration}; stop every writer and run it again")
+
+
+def backfill_ancestry(backend: SQLBackend, batch_size: int = 1000) -> int:
+    """
+    Fills in depth and rebuilds conversation_ancestry for every existing node,
+    one tree level at a time, so no statement recurses and each level is
+    derived from the one above it. Safe to re-run; returns the number of levels.
+
+    The closure table is emptied first, so run it while nothing else writes:
+    nodes inserted meanwhile would get ancestry from a half-built table. It
+    raises RuntimeError if it sees that happen, and re-running then repairs it.
+    """
+    ensure_depth_column(backend)
+    before = _node_snapshot(backend)
+
+    with backend.engine.begin() as conn:
+        conn.execute(text("DELETE FROM conversation_ancestry"))
+        conn.execute(text("UPDATE conversation_nodes SET depth = NULL"))
+        conn.execute(text("UPDATE conversation_nodes SET depth = 0 WHERE parent_id IS NULL"))
+
+    level = 0
+    while True:
+        with backend.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO conversation_ancestry (ancestor_id, descendant_id, distance)
+                SELECT n.id, n.id, 0
+                FROM conversation_nodes n
+                WHERE n.depth = :level
+            """), {'level': level})
+
+            if level > 0:
+                conn.execute(text("""
+                    INSERT INTO conversation_ancestry (ancestor_id, descendant_id, distance)
+                    SELECT a.ancestor_id, n.id, a.distance + 1
+                    FROM conversation_nodes n
+                    JOIN conversation_ancestry a ON a.descendant_id = n.parent_id
+                    WHERE n.depth = :level
+                """), {'level': level})
+
+        # MySQL can't UPDATE a table filtered by a subquery on itself, so the
+        # next level's ids are read out and updated in batches
+        with backend.engine.connect() as conn:
+            child_ids = [row.id for row in conn.execute(text("""
+                SELECT c.id
+                FROM conversation_nodes c
+                JOIN conversation_nodes p ON p.id = c.parent_id
+                WHERE p.depth = :level AND c.depth IS NULL
+            """), {'level': level})]
+
+        if not child_ids:
+            _check_no_writes(backend, before, "backfill_ancestry")
+            return level + 1
+
+        for start in range(0, len(child_ids), batch_size):
+            batch = child_ids[start:start + batch_size]
+            with backend.engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE conversation_nodes SET depth = :depth WHERE id IN :ids")
+                    .bindparams(bindparam('ids', expanding=True)),
+                    {'depth': level + 1, 'ids': batch}
+                )
+
+        level += 1
+
+
+def rebuild_node_stats(backend: SQLBackend) -> int:
+    """
+    Recomputes conversation_node_stats for every node from the closure table
+    in one pass, for data written before the table existed or after a
+    backfill_ancestry. Run it while nothing else writes; returns the row count.
+    """
+    with backend.engine.begin() as conn:
+        conn.execute(text("DELETE FROM conversation_node_stats"))
+        result = conn.execute(text("""
+            INSERT INTO conversation_node_stats (node_id, descendant_count, max_depth_below, leaf_count)
+            SELECT a.ancestor_id,
+                   COUNT(*) - 1,
+                   MAX(a.distance),
+                   SUM(CASE WHEN p.parent_id IS NULL THEN 1 ELSE 0 END)
+            FROM conversation_ancestry a
+            LEFT JOIN (
+                SELECT DISTINCT parent_id FROM conversation_nodes WHERE parent_id IS NOT NULL
+            ) p ON p.parent_id = a.descendant_id
+            GROUP BY a.ancestor_id
+        """))
+        return result.rowcount
+
+
+# Tables keyed on node ids, as (model, id columns)
+NODE_ID_TABLES = (
+    (Node, ('id', 'parent_id')),
+    (NodeAncestry, ('ancestor_id', 'descendant_id')),
+    (NodeStats, ('node_id',)),
+)
+
+
+def _rebuild_table(backend: SQLBackend, table: Table, batch_size: int) -> int:
+    """Renames table to <table>_legacy (numbered if that is taken by an earlier
+    rebuild), recreates it from the model and copies the rows over in
+    batches; returns the number copied."""
+    inspector = inspect(backend.engine)
+    legacy_name = f"{table.name}_legacy"
+    suffix = 1
+    while inspector.has_table(legacy_name):
+        suffix += 1
+        legacy_name = f"{table.name}_legacy{suffix}"
+    with backend.engine.begin() as conn:
+        for index in inspector.get_indexes(table.name):
+            conn.execute(text(f"DROP INDEX {index['name']}" if backend.engine.dialect.name == 'sqlite'
+                              else f"DROP INDEX {index['name']} ON {table.name}"))
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy_name}"))
+    table.create(backend.engine)
+
+    legacy = Table(legacy_name, MetaData(), autoload_with=backend.engine)
+    # Columns added to the model since the legacy table was created start out NULL
+    columns = [legacy.c[column.name] for column in table.columns if column.name in legacy.c]
+    copied = 0
+    with backend.engine.connect() as source:
+        result = source.execution_options(stream_results=True, yield_per=batch_size).execute(select(*columns))
+        for rows in result.mappings().partitions():
+            with backend.engine.begin() as conn:
+                conn.execute(insert(table), [dict(row) for row in rows])
+            copied += len(rows)
+    return copied
+
+
+def convert_ids_to_binary(backend: SQLBackend, batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Moves tables whose node id columns are still CHAR(36) to the 16-byte
+    binary form: each is renamed to <table>_legacy (its secondary indexes
+    dropped, since SQLite index names are global), recreated from the model
+    and refilled in batches, the NodeId type converting every id on the way.
+    The legacy copies are kept for the operator to drop. Run it while nothing
+    else writes; safe to re-run, and returns the rows copied per table.
+    """
+    copied = {}
+    for model, id_columns in NODE_ID_TABLES:
+        table = model.__table__
+        inspector = inspect(backend.engine)
+        if not inspector.has_table(table.name):
+            continue
+        column_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        if all(isinstance(column_types[name], (BINARY, VARBINARY, LargeBinary)) for name in id_columns):
+            continue
+
+        copied[table.name] = _rebuild_table(backend, table, batch_size)
+
+    return copied
+
+
+def ensure_content_columns(backend: SQLBackend, batch_size: int = 5000) -> None:
+    """
+    Prepares conversation_nodes for the content store: adds content_hash and
+    makes content nullable. SQLite can't relax a NOT NULL constraint in place,
+    so there the table is rebuilt (into conversation_nodes_legacy, as above).
+    """
+    table = Node.__table__
+    columns = {column['name']: column for column in inspect(backend.engine).get_columns(table.name)}
+    if backend.engine.dialect.name == 'sqlite':
+        if 'content_hash' not in columns or not columns['content']['nullable']:
+            _rebuild_table(backend, table, batch_size)
+        return
+
+    with backend.engine.begin() as conn:
+        if 'content_hash' not in columns:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN content_hash VARCHAR(64) NULL"))
+        if not columns['content']['nullable']:
+            conn.execute(text(f"ALTER TABLE {table.name} MODIFY content TEXT NULL"))
+
+
+def move_content_to_store(backend: SQLBackend, batch_size: int = 1000) -> int:
+    """
+    Moves the inline content of existing nodes into the backend's content
+    store, batch_size nodes per transaction, leaving only the hash behind.
+    Needs a backend created with content_store=True; safe to re-run and
+    to run alongside writers. Returns the number of nodes moved.
+    """
+    if backend.content_store is None:
+        raise ValueError("move_content_to_store needs a backend with content_store=True")
+    ensure_content_columns(backend)
+
+    moved = 0
+    statement = update(Node.__table__) \
+        .where(Node.__table__.c.id == bindparam('b_id')) \
+        .values(content=None, content_hash=bindparam('b_hash'))
+    while True:
+        with backend.engine.begin() as conn:
+            rows = conn.execute(
+                select(Node.__table__.c.id, Node.__table__.c.content)
+                .where(Node.__table__.c.content_hash.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return moved
+            hashes = backend.content_store.write(conn, (row.content for row in rows))
+            conn.execute(statement, [{'b_id': row.id, 'b_hash': hashes[row.content]} for row in rows])
+        moved += len(rows)
+
+
+if __name__ == "__main__":
+    from project.conversation_graph.config import MYSQL_CONFIG
+
+    backend = MySQLBackend(**MYSQL_CONFIG)
+    for table, rows in convert_ids_to_binary(backend).items():
+        print(f"Converted {rows} rows of {table} to binary ids")
+    ensure_content_columns(backend)
+    ensure_indexes(backend)
+    levels = backfill_ancestry(backend)
+    print(f"Ancestry backfilled for {levels} levels")
+    rows = rebuild_node_stats(backend)
+    print(f"Subtree stats rebuilt for {rows} nodes")
@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import List, Dict, Optional, Tuple, NamedTuple
+from sqlalchemy import Column, String, DateTime, Text, Index, Integer, BINARY, LargeBinary, Enum as SQLEnum
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.mysql import JSON
+
+Base = declarative_base()
+
+
+class NodeId(TypeDecorator):
+    """
+    Node ids as 16 raw bytes in the database and canonical UUID strings
+    everywhere else, so keys are under half the size of CHAR(36) ones.
+    Strings that are not UUIDs bind as an empty value, which matches no row,
+    so looking up a malformed id finds nothing instead of raising.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        # SQLite has no BINARY and would give the column numeric affinity
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(LargeBinary())
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        # Ids are converted on every bind, so the canonical form skips uuid.UUID
+        if len(value) == 36 and value[8] == value[13] == value[18] == value[23] == '-':
+            try:
+                return bytes.fromhex(value[:8] + value[9:13] + value[14:18] + value[19:23] + value[24:])
+            except ValueError:
+                return b""
+        try:
+            return uuid.UUID(value).bytes
+        except (ValueError, TypeError, AttributeError):
+            return b""
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        h = bytes(value).hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_id_sequence = 0
+
+
+def new_node_id() -> str:
+    """
+    A UUIDv7-style id: 48 bits of Unix milliseconds, then a 12-bit sequence
+    that keeps ids from one process increasing within a millisecond, then
+    random bits. New rows therefore land at the right edge of every id index
+    instead of at random pages.
+    """
+    global _last_id_ms, _id_sequence
+    with _id_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_id_ms:
+            _last_id_ms = now_ms
+            _id_sequence = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            _id_sequence += 1
+            if _id_sequence > 0xFFF:
+                # Sequence exhausted; borrow the next millisecond
+                _last_id_ms += 1
+                _id_sequence = 0
+        ms, sequence = _last_id_ms, _id_sequence
+
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= sequence << 64
+    value |= 0b10 << 62
+    value |= int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    return str(uuid.UUID(int=value))
+
+
+class NodeType(Enum):
+    SYSTEM = "SYSTEM"
+    PROMPT = "PROMPT"
+    RESPONSE = "RESPONSE"
+
+
+class Node(Base):
+    __tablename__ = 'conversation_nodes'
+
+    id = Column(NodeId, primary_key=True)
+    # NULL when the text lives in the content store under content_hash
+    _content = Column('content', Text, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    node_type = Column(SQLEnum(NodeType), nullable=False)
+    model_config = Column(JSON, nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
+    parent_id = Column(NodeId, index=True, nullable=True)
+    # Distance from the root; NULL only on rows written before the ancestry backfill
+    depth = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('idx_parent_type', 'parent_id', 'node_type'),
+        Index('idx_timestamp', 'timestamp'),
+        # Keyset pagination over one parent's children
+        Index('idx_parent_timestamp_id', 'parent_id', 'timestamp', 'id'),
+        # Content search on MySQL; other backends keep an in-process SearchIndex
+        Index('idx_content_fulltext', 'content', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+    def __init__(self, **kwargs):
+        # Handle model_config specially to ensure it's always a dict if present
+        if 'model_config' in kwargs:
+            model_config = kwargs['model_config']
+            if isinstance(model_config, str):
+                import json
+                try:
+                    kwargs['model_config'] = json.loads(model_config)
+                except json.JSONDecodeError:
+                    kwargs['model_config'] = {
+                        "model": "unknown",
+                        "temperature": "unknown"
+                    }
+        super().__init__(**kwargs)
+
+    @property
+    def content(self) -> Optional[str]:
+        """The node's text, fetched from the content store on first access
+        when the row only references it by hash."""
+        if self._content is None and self.content_hash is not None:
+            loader = getattr(self, '_content_loader', None)
+            if loader is not None:
+                self.set_loaded_content(loader(self.content_hash))
+        return self._content
+
+    @content.setter
+    def content(self, value: Optional[str]) -> None:
+        self._content = value
+
+    @property
+    def loaded_content(self) -> Optional[str]:
+        """The text if it is already in memory, without loading it."""
+        return self._content
+
+    def set_loaded_content(self, value: str) -> None:
+        # Not a change to the row, so a session holding the node won't write it back
+        set_committed_value(self, '_content', value)
+        # Set by a NodeCache holding the node, to count the text it now carries
+        listener = getattr(self, '_content_listener', None)
+        if listener is not None:
+            listener(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'content': self.content,
+            'node_type': self.node_type,
+            'model_config': self.model_config,
+            'timestamp': self.timestamp,
+            'parent_id': self.parent_id,
+            'depth': self.depth
+        }
+
+    def to_ref(self) -> "NodeRef":
+        return NodeRef(id=self.id, parent_id=self.parent_id, node_type=self.node_type, depth=self.depth)
+
+
+class NodeAncestry(Base):
+    """
+    Closure table: one row per (ancestor, descendant) pair, including each node
+    paired with itself at distance 0, so path and subtree queries are index
+    range scans instead of recursive CTEs.
+    """
+    __tablename__ = 'conversation_ancestry'
+
+    ancestor_id = Column(NodeId, primary_key=True)
+    distance = Column(Integer, primary_key=True)
+    descendant_id = Column(NodeId, primary_key=True)
+
+    __table_args__ = (
+        Index('idx_descendant_distance', 'descendant_id', 'distance'),
+    )
+
+
+class NodeStats(Base):
+    """
+    Aggregates over each node's subtree, kept current by every insert in the
+    same transaction, so subtree statistics are single-row reads. A leaf
+    counts itself in leaf_count.
+    """
+    __tablename__ = 'conversation_node_stats'
+
+    node_id = Column(NodeId, primary_key=True)
+    descendant_count = Column(Integer, nullable=False, default=0)
+    max_depth_below = Column(Integer, nullable=False, default=0)
+    leaf_count = Column(Integer, nullable=False, default=1)
+
+
+class NodeContent(Base):
+    """Content-addressed node text, shared by every node with the same
+    content; data is the UTF-8 text, compressed as named by encoding."""
+    __tablename__ = 'node_content'
+
+    hash = Column(String(64), primary_key=True)
+    encoding = Column(String(8), nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary(length=2 ** 24), nullable=False)
+
+
+class GraphMetadata(Base):
+    __tablename__ = 'graph_metadata'
+
+    key = Column(String(64), primary_key=True)
+    value = Column(String(255), nullable=True)
+
+
+VALID_TRANSITIONS = {
+    None: [NodeType.SYSTEM],
+    NodeType.SYSTEM: [NodeType.PROMPT],
+    NodeType.PROMPT: [NodeType.RESPONSE],
+    NodeType.RESPONSE: [NodeType.PROMPT]
+}
+
+
+class Transition(NamedTuple):
+    """A node's type next to its parent's, as scanned by tree validation."""
+    id: str
+    parent_id: Optional[str]
+    node_type: NodeType
+    parent_type: Optional[NodeType]
+
+
+class NodeRef(NamedTuple):
+    """A node's place in the tree without its content or model settings."""
+    id: str
+    parent_id: Optional[str]
+    node_type: NodeType
+    depth: Optional[int]
+
+
+class SearchHit(NamedTuple):
+    """A node matching a search, a snippet of its content around the match
+    and the ids on its path, root first."""
+    node: Node
+    snippet: str
+    path: List[str]
+
+
+class SubtreeStats(NamedTuple):
+    descendant_count: int
+    max_depth_below: int
+    leaf_count: int
@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Rough per-entry bookkeeping cost (OrderedDict slot, tuple, ORM instance state)
+ENTRY_OVERHEAD_BYTES = 512
+CHILD_ID_BYTES = 80
+# How many parents' latest child write is remembered for stale-read detection
+TRACKED_CHILD_WRITES = 10_000
+
+
+class NodeCache:
+    """
+    Thread-safe LRU cache of nodes and child-id lists, bounded both by number of
+    entries and by an approximate memory footprint.
+
+    Nodes are immutable once inserted, so cached nodes never go stale. Child-id
+    lists only grow, and are kept current by add_child() for writes made through
+    the owning ConversationGraph.
+    """
+
+    def __init__(self, max_entries: int = 100_000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._write_seq = 0
+        self._child_writes: "OrderedDict[Optional[str], int]" = OrderedDict()
+        self._untracked_before = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_node(self, node_id: str):
+        return self._get(("node", node_id))
+
+    def put_node(self, node) -> None:
+        if node.loaded_content is None:
+            # Text kept in a content store arrives later; it is counted then
+            node._content_listener = self._content_loaded
+        self._put(("node", node.id), node, self._node_size(node))
+
+    @staticmethod
+    def _node_size(node) -> int:
+        return ENTRY_OVERHEAD_BYTES + len(node.loaded_content or "")
+
+    def _content_loaded(self, node) -> None:
+        """Re-sizes a cached node once its content has been loaded into it."""
+        key = ("node", node.id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not node:
+                return
+            size = self._node_size(node)
+            # Assigning to an existing key keeps its place in the LRU order
+            self._entries[key] = (node, size)
+            self.bytes += size - entry[1]
+            self._evict()
+
+    def get_child_ids(self, parent_id: Optional[str]) -> Optional[List[str]]:
+        with self._lock:
+            child_ids = self._get(("children", parent_id))
+            return list(child_ids) if child_ids is not None else None
+
+    def child_write_stamp(self) -> int:
+        """Taken before reading a child list from the database, and passed back
+        to put_child_ids() so a list that raced with a concurrent add_child() is
+        not cached."""
+        with self._lock:
+            return self._write_seq
+
+    def put_child_ids(self, parent_id: Optional[str], child_ids: List[str],
+                      stamp: Optional[int] = None) -> None:
+        size = ENTRY_OVERHEAD_BYTES + CHILD_ID_BYTES * len(child_ids)
+        with self._lock:
+            if stamp is not None and self._written_since(parent_id, stamp):
+                return
+            self._put(("children", parent_id), list(child_ids), size)
+
+    def _written_since(self, parent_id: Optional[str], stamp: int) -> bool:
+        if parent_id in self._child_writes:
+            return self._child_writes[parent_id] > stamp
+        return stamp < self._untracked_before
+
+    def add_child(self, parent_id: Optional[str], child_id: str) -> None:
+        """Appends to the parent's child list if it is cached; otherwise it is
+        loaded complete on the next read."""
+        key = ("children", parent_id)
+        with self._lock:
+            self._write_seq += 1
+            self._child_writes[parent_id] = self._write_seq
+            self._child_writes.move_to_end(parent_id)
+            if len(self._child_writes) > TRACKED_CHILD_WRITES:
+                _, self._untracked_before = self._child_writes.popitem(last=False)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            child_ids, size = entry
+            if child_id not in child_ids:
+                child_ids.append(child_id)
+                self._entries[key] = (child_ids, size + CHILD_ID_BYTES)
+                self.bytes += CHILD_ID_BYTES
+                self._evict()
+
+    def get_path(self, node_id: str) -> Optional[List[Any]]:
+        """Returns the root->node path if every node on it is cached, else None."""
+        with self._lock:
+            path = []
+            current_id = node_id
+            while current_id is not None:
+                entry = self._entries.get(("node", current_id))
+                if entry is None:
+                    self.misses += 1
+                    return None
+                path.append(entry[0])
+                current_id = entry[0].parent_id
+
+            for node in path:
+                self._entries.move_to_end(("node", node.id))
+            self.hits += 1
+            return path[::-1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key, value, size: int) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
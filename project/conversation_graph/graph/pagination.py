@@ -0,0 +1,64 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple, NamedTuple
+
+from project.conversation_graph.graph.models import Node, SearchHit
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class Page(NamedTuple):
+    """One page of a child listing ordered by (timestamp, id), each node with
+    its own child count. next_cursor is None on the last page."""
+    items: List[Tuple[Node, int]]
+    next_cursor: Optional[str]
+
+
+class NodeView(NamedTuple):
+    """A node with the first page of its children and of its siblings."""
+    node: Node
+    children: Page
+    siblings: Page
+
+
+class SearchPage(NamedTuple):
+    """One page of search hits, newest first by (timestamp, id)."""
+    items: List[SearchHit]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(node: Node) -> str:
+    """Opaque keyset cursor pointing just past node."""
+    raw = f"{node.timestamp.isoformat()}|{node.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        timestamp, node_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(timestamp), node_id
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid page cursor: {cursor}")
+
+
+def make_page(rows: List[Tuple[Node, int]], limit: int) -> Page:
+    """Builds a page from up to limit + 1 rows; the extra row only signals
+    that another page exists."""
+    if len(rows) <= limit:
+        return Page(items=rows, next_cursor=None)
+    items = rows[:limit]
+    return Page(items=items, next_cursor=encode_cursor(items[-1][0]))
+
+
+def build_node_view(node: Node, children: List[Tuple[Node, int]], siblings: List[Tuple[Node, int]],
+                    limit: int) -> NodeView:
+    """Builds a view from up to limit + 1 children and siblings, as
+    make_page does for one listing."""
+    return NodeView(node=node, children=make_page(children, limit), siblings=make_page(siblings, limit))
+
+
+def check_page_size(limit: int) -> None:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"Page size must be between 1 and {MAX_PAGE_SIZE}, got {limit}")
@@ -0,0 +1,209 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Tuple
+
+from project.conversation_graph.graph.models import Node, NodeType, SearchHit
+from project.conversation_graph.graph.pagination import SearchPage, encode_cursor
+
+# Same bounds as InnoDB's default FULLTEXT token size, so every backend
+# ignores the same short words
+MIN_TOKEN_LENGTH = 3
+MAX_TOKEN_LENGTH = 84
+TOKEN_PATTERN = re.compile(r"\w+")
+
+NO_DOC = -1
+TYPE_CODES = {node_type: code for code, node_type in enumerate(NodeType)}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of text that the search indexes keep, in order."""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH
+    ]
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct searchable words of a query; a hit must contain all of them."""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def make_snippet(content: str, terms: List[str], width: int = 160) -> str:
+    """About width characters of content around the first query term, with
+    an ellipsis wherever text was cut."""
+    lowered = content.lower()
+    positions = [match.start() for term in terms
+                 for match in [re.search(rf"\b{re.escape(term)}\b", lowered)] if match]
+    first = min(positions) if positions else 0
+    start = max(first - width // 4, 0)
+    end = min(start + width, len(content))
+    snippet = " ".join(content[start:end].split())
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(content) else "")
+
+
+def make_search_page(nodes: List[Node], terms: List[str], paths: Dict[str, List[str]], limit: int) -> SearchPage:
+    """Builds a page of hits from up to limit + 1 matching nodes, whose content
+    must be loaded; the extra node only signals that another page exists."""
+    hits = [
+        SearchHit(node=node, snippet=make_snippet(node.content or "", terms), path=paths.get(node.id, [node.id]))
+        for node in nodes[:limit]
+    ]
+    next_cursor = encode_cursor(nodes[limit - 1]) if len(nodes) > limit else None
+    return SearchPage(items=hits, next_cursor=next_cursor)
+
+
+class SearchIndex:
+    """
+    In-process inverted index over node content for backends without a
+    native full-text index. Every node gets an integer doc number, kept in
+    (timestamp, id) order, and every word a sorted array of the docs holding
+    it, so a query walks its rarest word's postings newest first and checks
+    the others by binary search; a page costs a few lookups per hit however
+    many nodes are indexed. Each tree's docs are kept the same way, so a
+    root_id filter is just one more list to intersect.
+
+    Docs are renumbered on the next search if nodes arrive out of timestamp
+    order, which only bulk imports of old data do.
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, int] = {}
+        self._keys: List[Tuple[datetime, str]] = []
+        self._parent = array('i')
+        self._root = array('i')
+        self._type = array('b')
+        self._postings: Dict[str, array] = {}
+        # root doc -> docs of every node in its tree
+        self._tree_docs: Dict[int, array] = {}
+        self._ordered = True
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._docs
+
+    def latest_timestamp(self) -> Optional[datetime]:
+        with self._lock:
+            if not self._keys:
+                return None
+            return (self._keys[-1] if self._ordered else max(self._keys))[0]
+
+    def add(self, nodes: Iterable[Node], timestamps: Optional[Dict[str, datetime]] = None) -> None:
+        """Indexes nodes, parents before children; nodes already indexed are
+        skipped. timestamps overrides node timestamps by id, for storage that
+        does not keep them exactly as written."""
+        with self._lock:
+            for node in nodes:
+                if node.id in self._docs:
+                    continue
+                doc = len(self._keys)
+                timestamp = timestamps.get(node.id, node.timestamp) if timestamps else node.timestamp
+                key = (timestamp, node.id)
+                if self._keys and key < self._keys[-1]:
+                    self._ordered = False
+                parent = self._docs.get(node.parent_id, NO_DOC) if node.parent_id is not None else NO_DOC
+
+                self._docs[node.id] = doc
+                self._keys.append(key)
+                self._parent.append(parent)
+                root = self._root[parent] if parent != NO_DOC else doc
+                self._root.append(root)
+                self._type.append(TYPE_CODES[node.node_type])
+                self._tree_docs.setdefault(root, array('i')).append(doc)
+                for token in set(tokenize(node.content or "")):
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = array('i')
+                    postings.append(doc)
+
+    def search(self, terms: List[str], node_type: Optional[NodeType] = None, root_id: Optional[str] = None,
+               limit: int = 50, after: Optional[Tuple[datetime, str]] = None) -> List[str]:
+        """Ids of nodes containing every term, newest first by (timestamp, id),
+        starting just after the key in after."""
+        with self._lock:
+            if not self._ordered:
+                self._renumber()
+
+            postings = [self._postings.get(term) for term in terms]
+            if not postings or any(p is None for p in postings):
+                return []
+
+            # Below a tree root every doc of its tree qualifies; below an inner
+            # node the tree's docs narrow the walk and ancestry is checked per hit
+            ancestor = NO_DOC
+            if root_id is not None:
+                ancestor = self._docs.get(root_id, NO_DOC)
+                if ancestor == NO_DOC:
+                    return []
+                postings.append(self._tree_docs[self._root[ancestor]])
+            inner = ancestor != NO_DOC and self._parent[ancestor] != NO_DOC
+            under: Dict[int, bool] = {}
+
+            postings.sort(key=len)
+            rarest, others = postings[0], postings[1:]
+            type_code = TYPE_CODES[node_type] if node_type is not None else None
+
+            # Docs are numbered in key order, so "older than after" is a doc bound
+            end = bisect_left(rarest, bisect_left(self._keys, after)) if after is not None else len(rarest)
+            hits = []
+            for position in range(end - 1, -1, -1):
+                doc = rarest[position]
+                if type_code is not None and self._type[doc] != type_code:
+                    continue
+                if not all(self._contains(other, doc) for other in others):
+                    continue
+                if inner and not self._under(doc, ancestor, under):
+                    continue
+                hits.append(self._keys[doc][1])
+                if len(hits) == limit:
+                    break
+            return hits
+
+    @staticmethod
+    def _contains(postings: array, doc: int) -> bool:
+        position = bisect_left(postings, doc)
+        return position < len(postings) and postings[position] == doc
+
+    def _under(self, doc: int, ancestor: int, known: Dict[int, bool]) -> bool:
+        """Whether ancestor is on doc's path; known memoizes the answer for
+        every doc walked, so one search walks each part of the tree once."""
+        walked = []
+        result = False
+        while doc != NO_DOC:
+            if doc == ancestor:
+                result = True
+                break
+            if doc in known:
+                result = known[doc]
+                break
+            walked.append(doc)
+            doc = self._parent[doc]
+        for doc in walked:
+            known[doc] = result
+        return result
+
+    def _renumber(self) -> None:
+        order = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        new_doc = array('i', [0]) * len(order)
+        for doc, old in enumerate(order):
+            new_doc[old] = doc
+
+        def remap(old: int) -> int:
+            return new_doc[old] if old != NO_DOC else NO_DOC
+
+        self._keys = [self._keys[old] for old in order]
+        self._parent = array('i', (remap(self._parent[old]) for old in order))
+        self._root = array('i', (new_doc[self._root[old]] for old in order))
+        self._type = array('b', (self._type[old] for old in order))
+        self._docs = {key[1]: doc for doc, key in enumerate(self._keys)}
+        for token, postings in self._postings.items():
+            self._postings[token] = array('i', sorted(new_doc[old] for old in postings))
+        self._tree_docs = {}
+        for doc, root in enumerate(self._root):
+            self._tree_docs.setdefault(root, array('i')).append(doc)
+        self._ordered = True
@@ -0,0 +1,198 @@
+import logging
+import threading
+from array import array
+from typing import List, Dict, Optional, Iterator, Iterable
+
+from project.conversation_graph.graph.models import NodeType, NodeRef
+
+logger = logging.getLogger(__name__)
+
+NO_SLOT = -1
+TYPE_CODES = {node_type: code for code, node_type in enumerate(NodeType)}
+CODE_TYPES = list(NodeType)
+
+
+class TopologyIndex:
+    """
+    In-process copy of the tree's shape: every node id maps to an integer slot,
+    and parent, first child, last child, next sibling, type, depth and
+    descendant count are kept in flat arrays indexed by slot. Content stays in
+    the database, so the index costs a few dozen bytes per node and leaf,
+    sibling and subtree queries never leave the process.
+
+    Descendant counts are maintained on add() by walking up the parent chain,
+    so they cost O(depth) per insert and O(1) per lookup.
+    """
+
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._parent = array('i')
+        self._first_child = array('i')
+        self._last_child = array('i')
+        self._next_sibling = array('i')
+        self._type = array('b')
+        self._depth = array('i')
+        self._descendants = array('i')
+        self._roots: List[int] = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, refs: Iterable[NodeRef]) -> "TopologyIndex":
+        """
+        Builds the index from a stream of node refs, e.g. a backend's
+        iter_topology(). Parents may appear after their children; nodes whose
+        parent never appears are indexed as roots.
+        """
+        index = cls()
+        refs = list(refs)
+        for ref in refs:
+            index._allocate(ref.id, ref.node_type)
+
+        for ref in refs:
+            parent_slot = index._slots.get(ref.parent_id, NO_SLOT) if ref.parent_id is not None else NO_SLOT
+            index._link(index._slots[ref.id], parent_slot)
+
+        # Depths and descendant counts in one pass over each tree, parents first
+        order = []
+        stack = list(index._roots)
+        while stack:
+            slot = stack.pop()
+            order.append(slot)
+            parent = index._parent[slot]
+            index._depth[slot] = index._depth[parent] + 1 if parent != NO_SLOT else 0
+            child = index._first_child[slot]
+            while child != NO_SLOT:
+                stack.append(child)
+                child = index._next_sibling[child]
+
+        for slot in reversed(order):
+            parent = index._parent[slot]
+            if parent != NO_SLOT:
+                index._descendants[parent] += index._descendants[slot] + 1
+        return index
+
+    def _allocate(self, node_id: str, node_type: NodeType) -> int:
+        if node_id in self._slots:
+            raise ValueError(f"Node {node_id} already indexed")
+        slot = len(self._ids)
+        self._slots[node_id] = slot
+        self._ids.append(node_id)
+        self._parent.append(NO_SLOT)
+        self._first_child.append(NO_SLOT)
+        self._last_child.append(NO_SLOT)
+        self._next_sibling.append(NO_SLOT)
+        self._type.append(TYPE_CODES[node_type])
+        self._depth.append(0)
+        self._descendants.append(0)
+        return slot
+
+    def _link(self, slot: int, parent_slot: int) -> None:
+        self._parent[slot] = parent_slot
+        if parent_slot == NO_SLOT:
+            self._roots.append(slot)
+            return
+
+        last = self._last_child[parent_slot]
+        if last == NO_SLOT:
+            self._first_child[parent_slot] = slot
+        else:
+            self._next_sibling[last] = slot
+        self._last_child[parent_slot] = slot
+
+    def add(self, node_id: str, parent_id: Optional[str], node_type: NodeType) -> None:
+        """Indexes a node that has just been stored. Its parent must already be
+        indexed; a parent written by another process is logged and the node is
+        indexed as a root until the index is reloaded."""
+        with self._lock:
+            parent_slot = NO_SLOT
+            if parent_id is not None:
+                parent_slot = self._slots.get(parent_id, NO_SLOT)
+                if parent_slot == NO_SLOT:
+                    logger.warning(f"Parent {parent_id} of node {node_id} is not in the topology index")
+
+            slot = self._allocate(node_id, node_type)
+            self._link(slot, parent_slot)
+
+            if parent_slot != NO_SLOT:
+                self._depth[slot] = self._depth[parent_slot] + 1
+            ancestor = parent_slot
+            while ancestor != NO_SLOT:
+                self._descendants[ancestor] += 1
+                ancestor = self._parent[ancestor]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._slots
+
+    def _children_of(self, slot: int) -> List[int]:
+        children = []
+        child = self._first_child[slot]
+        while child != NO_SLOT:
+            children.append(child)
+            child = self._next_sibling[child]
+        return children
+
+    def ref(self, node_id: str) -> Optional[NodeRef]:
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return None
+            parent = self._parent[slot]
+            return NodeRef(
+                id=node_id,
+                parent_id=self._ids[parent] if parent != NO_SLOT else None,
+                node_type=CODE_TYPES[self._type[slot]],
+                depth=self._depth[slot]
+            )
+
+    def root_ids(self) -> List[str]:
+        with self._lock:
+            return [self._ids[slot] for slot in self._roots]
+
+    def child_ids(self, node_id: str) -> Optional[List[str]]:
+        """Child ids in insertion order, or None if the node is not indexed."""
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return None
+            return [self._ids[child] for child in self._children_of(slot)]
+
+    def sibling_ids(self, node_id: str) -> Optional[List[str]]:
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return None
+            parent = self._parent[slot]
+            if parent == NO_SLOT:
+                return []
+            return [self._ids[child] for child in self._children_of(parent) if child != slot]
+
+    def leaf_ids(self) -> List[str]:
+        with self._lock:
+            return [self._ids[slot] for slot, child in enumerate(self._first_child) if child == NO_SLOT]
+
+    def count_descendants(self, node_id: str) -> Optional[int]:
+        with self._lock:
+            slot = self._slots.get(node_id)
+            return self._descendants[slot] if slot is not None else None
+
+    def subtree_size(self, node_id: str) -> Optional[int]:
+        """Number of nodes in the subtree rooted at node_id, itself included."""
+        count = self.count_descendants(node_id)
+        return count + 1 if count is not None else None
+
+    def iter_subtree_ids(self, node_id: str) -> Iterator[str]:
+        """Ids under node_id, itself first and shallowest first. The subtree
+        is snapshotted up front, so nodes added while iterating are skipped."""
+        with self._lock:
+            slot = self._slots.get(node_id)
+            if slot is None:
+                return
+            order = [slot]
+            for current in order:
+                order.extend(self._children_of(current))
+            ids = [self._ids[current] for current in order]
+        yield from ids
@@ -0,0 +1,169 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, NamedTuple
+
+from project.conversation_graph.graph.models import Node
+from project.conversation_graph.metrics import metrics
+from project.conversation_graph.storage.base import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+GROUP_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class WriteRequest(NamedTuple):
+    nodes: List[Node]
+    future: Future
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue that folds inserts from many threads into shared
+    transactions on one background connection.
+
+    The writer takes the first waiting request, then keeps collecting for up
+    to max_delay seconds or until max_nodes nodes are pending, and commits
+    them all with one insert_nodes call. write() blocks until the group holding
+    its nodes has committed, so returning still means the nodes are durable,
+    and charges the calling thread its share of the group's statements, so
+    per-operation query counts include work done on the writer thread.
+    If a group fails, its requests are retried one by one so only the bad
+    request sees the error. Any other failure on the writer thread fails the
+    requests it was holding and the writer carries on with the next group.
+    """
+
+    _STOP = object()
+
+    def __init__(self, backend: StorageBackend, max_delay: float = 0.005, max_nodes: int = 500,
+                 chunk_size: int = 500):
+        self.backend = backend
+        self.max_delay = max_delay
+        self.max_nodes = max_nodes
+        self.chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.groups = 0
+        self.requests = 0
+        self.nodes = 0
+        self.retried_groups = 0
+        self._thread = threading.Thread(target=self._run, name="graph-group-commit", daemon=True)
+        self._thread.start()
+        metrics.register_collector("graph_group_commit", self.stats)
+
+    def submit(self, nodes: List[Node]) -> Future:
+        """Queues nodes (parents before children) for the next group commit;
+        the future resolves once they are committed, to the statements the
+        commit ran on their behalf (a group's count split by node share)."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed")
+            self._queue.put(WriteRequest(nodes, future))
+        return future
+
+    def write(self, nodes: List[Node]) -> None:
+        metrics.add_thread_queries(self.submit(nodes).result())
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Commits everything already queued, then stops the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "groups": self.groups,
+                "requests": self.requests,
+                "nodes": self.nodes,
+                "retried_groups": self.retried_groups,
+                "pending": self._queue.qsize(),
+                "nodes_per_group": self.nodes / self.groups if self.groups else 0.0
+            }
+
+    def _run(self) -> None:
+        try:
+            stopping = False
+            while not stopping:
+                group: List[WriteRequest] = []
+                try:
+                    stopping = self._collect(group)
+                    if group:
+                        self._commit(group)
+                except Exception as e:
+                    logger.exception(f"Group commit writer failed on a group of {len(group)} requests")
+                    self._fail(group, e)
+        finally:
+            # Whatever stopped the loop, nothing will drain the queue any more:
+            # refuse new requests and fail the ones still waiting.
+            with self._lock:
+                self._closed = True
+            self._fail_queued(RuntimeError("GroupCommitWriter is closed"))
+
+    def _collect(self, group: List[WriteRequest]) -> bool:
+        """Fills group with the next batch of requests; returns whether the
+        stop marker was reached."""
+        first = self._queue.get()
+        if first is self._STOP:
+            return True
+        group.append(first)
+
+        pending = len(first.nodes)
+        deadline = time.monotonic() + self.max_delay
+        while pending < self.max_nodes:
+            try:
+                request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if request is self._STOP:
+                return True
+            group.append(request)
+            pending += len(request.nodes)
+        return False
+
+    @staticmethod
+    def _fail(group: List[WriteRequest], error: BaseException) -> None:
+        for request in group:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _fail_queued(self, error: BaseException) -> None:
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not self._STOP:
+                self._fail([request], error)
+
+    def _commit(self, group: List[WriteRequest]) -> None:
+        nodes = [node for request in group for node in request.nodes]
+        queries_before = metrics.thread_queries()
+        try:
+            self.backend.insert_nodes(nodes, chunk_size=self.chunk_size)
+        except Exception as e:
+            if len(group) == 1:
+                group[0].future.set_exception(e)
+                return
+            logger.warning(f"Group commit of {len(group)} requests failed, retrying them one by one: {e}")
+            with self._lock:
+                self.retried_groups += 1
+            for request in group:
+                self._commit([request])
+            return
+
+        with self._lock:
+            self.groups += 1
+            self.requests += len(group)
+            self.nodes += len(nodes)
+        metrics.observe("graph_group_commit_nodes", len(nodes), buckets=GROUP_SIZE_BUCKETS)
+        queries = metrics.thread_queries() - queries_before
+        for request in group:
+            request.future.set_result(queries * len(request.nodes) / len(nodes) if nodes else 0)
@@ -1,6 +1,7 @@
 from project.conversation_graph.agents.basic_agent import BasicAgent, BasicResponseGenerator
 from project.conversation_graph.config import MYSQL_CONFIG
 from project.conversation_graph.graph.conversation_graph import ConversationGraph
+from project.conversation_graph.runner.agent_runner import AgentRunner
 
 
 def main():
@@ -17,11 +18,16 @@ def main():
 
     id = "325a3db7-41d7-4f61-bab8-ddb9643bff12"
 
-    agent = BasicAgent(graph, BasicResponseGenerator(), "system")
-
-    for i in range(0, 7):
-        id = agent.hop(id)
+    runner = AgentRunner(
+        lambda: BasicAgent(graph, BasicResponseGenerator(), "system"),
+        concurrency=4,
+        hops_per_agent=7
+    )
+    stats = runner.run([id] * 4)
+    print(f"{stats['hops']} hops in {stats['elapsed_seconds']:.1f}s "
+          f"({stats['hops_per_second']:.2f} hops/sec, {stats['errors']} errors)")
 
+    id = stats["final_nodes"][0]
     path = graph.get_conversation_path(id)
     print("\nConversation path:")
     for node in path:
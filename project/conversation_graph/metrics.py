@@ -0,0 +1,257 @@
+import functools
+import inspect
+import itertools
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Tuple, Iterable, Iterator
+
+# Upper bounds in seconds; spans sub-millisecond cache hits to multi-second model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class MetricsRegistry:
+    """
+    Process-wide histograms, counters and gauge collectors.
+
+    Histograms and counters are keyed on a name plus labels. Gauges are read
+    on demand from collectors, callables returning a dict of numbers, which
+    is how cache stats are exposed without copying them on every lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._collectors: Dict[str, List[Tuple[Labels, Callable[[], Optional[Dict[str, Any]]]]]] = {}
+        self._instances: Dict[str, Iterator[int]] = {}
+        self._local = threading.local()
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]], **labels) -> None:
+        """Exposes collect()'s numeric values as gauges named name_<key>. Bound
+        methods are held weakly, so registering does not keep their object alive.
+        A collector registered under the same name and labels as a live one gets
+        an extra instance label, so each keeps its own series."""
+        if hasattr(collect, "__self__"):
+            method = weakref.WeakMethod(collect)
+
+            def collect_weak():
+                bound = method()
+                return bound() if bound is not None else None
+
+            entry = collect_weak
+        else:
+            entry = collect
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entries = self._collectors.setdefault(name, [])
+            taken = {entry_labels for entry_labels, _ in entries}
+            if key in taken:
+                instances = self._instances.setdefault(name, itertools.count(1))
+                while key in taken:
+                    key = tuple(sorted({**labels, "instance": str(next(instances))}.items()))
+            entries.append((key, entry))
+
+    def count_query(self) -> None:
+        """Counts one database statement, overall and for the calling thread."""
+        self.inc("db_queries_total")
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+
+    def add_thread_queries(self, count: float) -> None:
+        """Charges statements another thread ran on this one's behalf, such as
+        a group commit writer's, to the calling thread's count; the overall
+        total already has them."""
+        self._local.queries = getattr(self._local, "queries", 0) + count
+
+    def thread_queries(self) -> float:
+        """Statements issued so far by the calling thread; diff two readings to
+        count the queries of one operation."""
+        return getattr(self._local, "queries", 0)
+
+    def _gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            collectors = {name: list(entries) for name, entries in self._collectors.items()}
+
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        dead = []
+        for name, entries in collectors.items():
+            for entry in entries:
+                labels, collect = entry
+                values = collect()
+                if values is None:
+                    dead.append((name, entry))
+                    continue
+                for key, value in values.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        gauges.setdefault(f"{name}_{key}", {})[labels] = value
+
+        # Forget collectors whose object has been garbage collected
+        with self._lock:
+            for name, entry in dead:
+                if entry in self._collectors.get(name, []):
+                    self._collectors[name].remove(entry)
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        gauges = self._gauges()
+        with self._lock:
+            return {
+                "histograms": {
+                    name: {labels: histogram.snapshot() for labels, histogram in series.items()}
+                    for name, series in self._histograms.items()
+                },
+                "counters": {name: dict(series) for name, series in self._counters.items()},
+                "gauges": gauges
+            }
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        for name, series in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, data in series.items():
+                for bound, count in data["buckets"]:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {data['sum']}")
+                lines.append(f"{name}_count{format_labels(labels)} {data['count']}")
+
+        for name, series in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for name, series in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in series.items():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drops recorded histograms and counters; collectors stay registered."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_methods(metric: str, methods: Iterable[str], **labels):
+    """
+    Class decorator timing the named methods of the class into the metric
+    histogram, labelled with the method name. Coroutines are timed until they
+    complete. A method returning an iterator is timed across the iteration:
+    the call plus every next() on the iterator, recorded once it is exhausted
+    or closed, so the caller's own work between items is left out.
+    """
+    def decorate(cls):
+        for method in methods:
+            setattr(cls, method, _timed_method(vars(cls)[method], metric, method, labels))
+        return cls
+    return decorate
+
+
+def _timed_method(func, metric: str, method: str, labels: Dict[str, str]):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe(metric, time.perf_counter() - started, method=method, **labels)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            metrics.observe(metric, time.perf_counter() - started, method=method, **labels)
+            raise
+        elapsed = time.perf_counter() - started
+        if isinstance(result, Iterator):
+            return _timed_iteration(result, elapsed, metric, method, labels)
+        metrics.observe(metric, elapsed, method=method, **labels)
+        return result
+    return wrapper
+
+
+def _timed_iteration(iterator: Iterator, elapsed: float, metric: str, method: str,
+                     labels: Dict[str, str]) -> Iterator:
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        metrics.observe(metric, elapsed, method=method, **labels)
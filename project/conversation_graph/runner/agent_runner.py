@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any
+
+from project.conversation_graph.agents.base import Agent
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRunner:
+    """
+    Runs many agents at once on a thread pool against a shared ConversationGraph.
+
+    Hops spend nearly all their time waiting on model calls, so threads give
+    near-linear speedup up to the model's rate limit. Each agent walks its own
+    path; agents that branch from the same node simply create sibling prompts,
+    which the graph writes atomically with their responses.
+    """
+
+    def __init__(self, agent_factory: Callable[[], Agent], concurrency: int = 4,
+                 hops_per_agent: int = 7, max_consecutive_errors: int = 3):
+        self.agent_factory = agent_factory
+        self.concurrency = concurrency
+        self.hops_per_agent = hops_per_agent
+        self.max_consecutive_errors = max_consecutive_errors
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._hops = 0
+        self._errors = 0
+
+    def stop(self) -> None:
+        """Asks every agent to finish its current hop and exit."""
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self, start_node_ids: List[str]) -> Dict[str, Any]:
+        """
+        Starts one agent per entry of start_node_ids (repeat an id to send
+        several agents from the same node) and blocks until every agent has
+        used its hop budget or stop() was called. Returns aggregate stats.
+        """
+        self._stop.clear()
+        self._hops = 0
+        self._errors = 0
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="agent") as executor:
+            futures = [executor.submit(self._run_agent, start_id) for start_id in start_node_ids]
+            try:
+                final_nodes = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                logger.info("Interrupted, waiting for in-flight hops to finish")
+                self.stop()
+                final_nodes = [future.result() for future in futures]
+
+        elapsed = time.perf_counter() - started
+        return {
+            "agents": len(start_node_ids),
+            "concurrency": self.concurrency,
+            "hops": self._hops,
+            "errors": self._errors,
+            "elapsed_seconds": elapsed,
+            "hops_per_second": self._hops / elapsed if elapsed > 0 else 0.0,
+            "final_nodes": final_nodes
+        }
+
+    def _run_agent(self, start_node_id: str) -> str:
+        agent = self.agent_factory()
+        node_id = start_node_id
+        consecutive_errors = 0
+
+        for _ in range(self.hops_per_agent):
+            if self._stop.is_set():
+                break
+
+            try:
+                node_id = agent.hop(node_id)
+            except Exception as e:
+                # A malformed model decision only costs this hop; the agent
+                # retries from the same node until it keeps failing
+                logger.warning(f"Agent {agent.id} hop failed at {node_id}: {e}")
+                with self._lock:
+                    self._errors += 1
+                consecutive_errors += 1
+                if consecutive_errors >= self.max_consecutive_errors:
+                    break
+                continue
+
+            consecutive_errors = 0
+            with self._lock:
+                self._hops += 1
+
+        agent.finish()
+        return node_id
@@ -0,0 +1,137 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Dict, Optional, Iterator, Tuple, Union
+
+from project.conversation_graph.graph.models import Node, NodeRef, NodeType, Transition, SubtreeStats
+
+
+class StorageBackend(ABC):
+    """
+    Persistence layer behind ConversationGraph. Backends only store and query;
+    id generation, type-transition rules, caching and validation policy live in
+    ConversationGraph, so every backend enforces the same tree semantics.
+
+    Nodes are never updated or deleted once inserted. Returned Node instances
+    are detached from any session and may be shared with the graph's cache, so
+    callers must treat them as read-only.
+    """
+
+    @abstractmethod
+    def insert_nodes(self, nodes: List[Node], chunk_size: int = 500) -> None:
+        """Atomically inserts already-validated nodes, parents before children.
+        A node's parent is either already stored or earlier in the list."""
+
+    @abstractmethod
+    def get_node(self, node_id: str) -> Optional[Node]:
+        pass
+
+    @abstractmethod
+    def get_nodes(self, node_ids: List[str]) -> List[Node]:
+        """Nodes that exist among node_ids, in no particular order."""
+
+    @abstractmethod
+    def get_children(self, node_id: Optional[str]) -> List[Node]:
+        """Children of node_id, or the roots when node_id is None."""
+
+    @abstractmethod
+    def iter_children(self, node_id: Optional[str], batch_size: int = 1000,
+                      with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        """Streams the children of node_id (roots when None) oldest first,
+        fetching batch_size rows at a time. With with_content=False only
+        NodeRefs are read, skipping the content and model_config columns."""
+
+    @abstractmethod
+    def get_path(self, node_id: str) -> List[Node]:
+        """Root->node path, or an empty list if the node does not exist."""
+
+    @abstractmethod
+    def get_node_view(self, node_id: str, limit: int) \
+            -> Optional[Tuple[Node, List[Tuple[Node, int]], List[Tuple[Node, int]]]]:
+        """The node with up to limit of its children and up to limit of its
+        siblings, each list ordered by (timestamp, id) with every node's own
+        child count; None if the node does not exist."""
+
+    @abstractmethod
+    def get_children_page(self, parent_id: Optional[str], limit: int,
+                          after: Optional[Tuple[datetime, str]] = None,
+                          exclude_id: Optional[str] = None) -> List[Tuple[Node, int]]:
+        """Up to limit children of parent_id (roots when None) ordered by
+        (timestamp, id) and strictly after the after key, each with its own
+        child count, leaving out exclude_id."""
+
+    @abstractmethod
+    def get_leaf_nodes(self) -> List[Node]:
+        pass
+
+    @abstractmethod
+    def iter_leaf_nodes(self, batch_size: int = 1000,
+                        with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        pass
+
+    @abstractmethod
+    def iter_subtree(self, node_id: str, batch_size: int = 1000,
+                     with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        """Streams node_id and everything below it, shallowest first."""
+
+    @abstractmethod
+    def get_subtree(self, node_id: str, max_depth: int, limit: int) -> List[Tuple[Node, int]]:
+        """Up to limit nodes at most max_depth levels below node_id (itself
+        included), each with its own child count, ordered by distance then
+        (timestamp, id) so every parent comes before its children."""
+
+    @abstractmethod
+    def count_subtree(self, node_id: str, max_depth: int) -> int:
+        """Nodes at most max_depth levels below node_id, itself included."""
+
+    @abstractmethod
+    def count_descendants(self, node_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def get_subtree_stats(self, node_id: str) -> Optional[SubtreeStats]:
+        """Descendant count, levels below the node and leaves under it
+        (itself if a leaf), or None if the node does not exist. Backends keep
+        these as counters maintained on insert rather than scanning."""
+
+    @abstractmethod
+    def search(self, terms: List[str], node_type: Optional[NodeType], root_id: Optional[str], limit: int,
+               after: Optional[Tuple[datetime, str]] = None) -> List[Node]:
+        """Up to limit nodes whose content holds every term (words as produced
+        by search_index.tokenize), newest first by (timestamp, id) and starting
+        just past the key in after, optionally of one type and under root_id.
+        Content need not be loaded on the returned nodes."""
+
+    @abstractmethod
+    def get_ancestor_ids(self, node_ids: List[str]) -> Dict[str, List[str]]:
+        """The ids on each node's path, root first and ending with the node."""
+
+    @abstractmethod
+    def iter_transitions(self, since: Optional[datetime] = None) -> Iterator[Transition]:
+        """Every node stamped at or after since (all nodes if None) with its
+        parent's type; parent_type is None for roots and orphans."""
+
+    @abstractmethod
+    def iter_topology(self) -> Iterator[NodeRef]:
+        """Every node's id, parent, type and depth, oldest first, without
+        loading content."""
+
+    @abstractmethod
+    def latest_timestamp(self) -> Optional[datetime]:
+        pass
+
+    @abstractmethod
+    def get_metadata(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set_metadata(self, key: str, value: str) -> None:
+        pass
+
+    def load_content(self, nodes: List[Node]) -> List[Node]:
+        """Makes sure every node's content is in memory, fetching whatever is
+        still missing in as few queries as the backend can. Backends that
+        keep content inline have nothing to do."""
+        return nodes
+
+    def close(self) -> None:
+        pass
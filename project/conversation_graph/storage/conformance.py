@@ -0,0 +1,607 @@
+"""
+Behavioural checks every StorageBackend must pass, so ConversationGraph acts
+the same on MySQL, SQLite and in memory. Run against the built-in backends with
+
+    python -m project.conversation_graph.storage.conformance [--mysql-database NAME]
+
+MySQL is only checked when a scratch database name is given, since the checks
+insert trees of their own.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from project.conversation_graph.graph.conversation_graph import ConversationGraph, VALIDATION_WATERMARK_KEY
+from project.conversation_graph.graph.export import export_graph, import_graph
+from project.conversation_graph.graph.models import Node, NodeType
+from project.conversation_graph.metrics import metrics
+from project.conversation_graph.storage.base import StorageBackend
+from project.conversation_graph.storage.memory import MemoryBackend
+from project.conversation_graph.storage.sql import SQLiteBackend, MySQLBackend
+
+
+def _node(node_type: NodeType, parent: Optional[Node] = None, content: str = "",
+          timestamp: Optional[datetime] = None) -> Node:
+    return Node(
+        id=str(uuid.uuid4()),
+        content=content or node_type.value.lower(),
+        node_type=node_type,
+        parent_id=parent.id if parent else None,
+        model_config={"model": "conformance"},
+        timestamp=timestamp or datetime.now(),
+        depth=parent.depth + 1 if parent else 0
+    )
+
+
+def _chain(backend: StorageBackend, turns: int = 2) -> List[Node]:
+    """Inserts a root followed by turns prompt/response pairs, one node per call."""
+    nodes = [_node(NodeType.SYSTEM)]
+    for _ in range(turns):
+        nodes.append(_node(NodeType.PROMPT, nodes[-1]))
+        nodes.append(_node(NodeType.RESPONSE, nodes[-1]))
+    for node in nodes:
+        backend.insert_nodes([node])
+    return nodes
+
+
+def check_get_node(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    fetched = backend.get_node(response.id)
+    assert fetched is not None, "inserted node not found"
+    assert (fetched.content, fetched.node_type, fetched.parent_id, fetched.depth) == \
+           (response.content, NodeType.RESPONSE, prompt.id, 2), "node fields not round-tripped"
+    assert fetched.model_config == {"model": "conformance"}, "model_config not round-tripped"
+    assert backend.get_node(str(uuid.uuid4())) is None, "missing node should be None"
+    assert {node.id for node in backend.get_nodes([root.id, response.id, str(uuid.uuid4())])} == \
+           {root.id, response.id}, "get_nodes should return only existing nodes"
+
+
+def check_children(backend: StorageBackend) -> None:
+    root = _node(NodeType.SYSTEM)
+    prompts = [_node(NodeType.PROMPT, root) for _ in range(3)]
+    backend.insert_nodes([root] + prompts)
+    assert {node.id for node in backend.get_children(root.id)} == {node.id for node in prompts}, \
+        "children mismatch"
+    assert root.id in {node.id for node in backend.get_children(None)}, "root not listed among roots"
+    assert backend.get_children(prompts[0].id) == [], "leaf should have no children"
+
+
+def check_batch_with_internal_parents(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    follow_up = _node(NodeType.PROMPT, response)
+    answer = _node(NodeType.RESPONSE, follow_up)
+    other_root = _node(NodeType.SYSTEM)
+    backend.insert_nodes([follow_up, answer, other_root], chunk_size=1)
+    assert [node.id for node in backend.get_path(answer.id)] == \
+           [root.id, prompt.id, response.id, follow_up.id, answer.id], "path through batch parents wrong"
+    assert [node.id for node in backend.get_path(other_root.id)] == [other_root.id], "root path wrong"
+
+
+def check_path(backend: StorageBackend) -> None:
+    nodes = _chain(backend, turns=3)
+    assert [node.id for node in backend.get_path(nodes[-1].id)] == [node.id for node in nodes], \
+        "path not ordered root first"
+    assert [node.id for node in backend.get_path(nodes[0].id)] == [nodes[0].id], "root path wrong"
+    assert backend.get_path(str(uuid.uuid4())) == [], "missing node should have an empty path"
+
+
+def check_node_view(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    start = prompt.timestamp
+    siblings = [_node(NodeType.PROMPT, root, timestamp=start + timedelta(seconds=i)) for i in range(1, 4)]
+    backend.insert_nodes(siblings)
+    node, children, sibling_rows = backend.get_node_view(prompt.id, 2)
+    assert node.id == prompt.id, "view of the wrong node"
+    assert [(child.id, count) for child, count in children] == [(response.id, 0)], "view children wrong"
+    assert [(sibling.id, count) for sibling, count in sibling_rows] == [(siblings[0].id, 0), (siblings[1].id, 0)], \
+        "view siblings should be the first page, without the node itself"
+    node, children, sibling_rows = backend.get_node_view(root.id, 2)
+    assert [(child.id, count) for child, count in children] == [(prompt.id, 1), (siblings[0].id, 0)], \
+        "root view children wrong"
+    assert sibling_rows == [], "a root view should have no siblings"
+    assert backend.get_node_view(str(uuid.uuid4()), 2) is None, "missing node should have no view"
+
+
+def check_children_page(backend: StorageBackend) -> None:
+    start = datetime.now()
+    root = _node(NodeType.SYSTEM, timestamp=start)
+    prompts = [_node(NodeType.PROMPT, root, timestamp=start + timedelta(seconds=i // 2)) for i in range(5)]
+    backend.insert_nodes([root] + prompts[::-1])
+    backend.insert_nodes([_node(NodeType.RESPONSE, prompts[0])])
+    ordered = sorted(prompts, key=lambda node: (node.timestamp, node.id))
+
+    first = backend.get_children_page(root.id, 2)
+    assert [node.id for node, _ in first] == [node.id for node in ordered[:2]], "first page wrong"
+    assert dict((node.id, count) for node, count in first).get(prompts[0].id, 1) == 1, "page child count wrong"
+    last = first[-1][0]
+    rest = backend.get_children_page(root.id, 10, after=(last.timestamp, last.id))
+    assert [node.id for node, _ in rest] == [node.id for node in ordered[2:]], "keyset page wrong"
+    without = backend.get_children_page(root.id, 10, exclude_id=ordered[1].id)
+    assert ordered[1].id not in {node.id for node, _ in without} and len(without) == 4, "exclude_id ignored"
+
+
+def check_leaf_nodes(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    sibling = _node(NodeType.PROMPT, root)
+    backend.insert_nodes([sibling])
+    leaves = {node.id for node in backend.get_leaf_nodes()}
+    assert {response.id, sibling.id} <= leaves, "leaves missing"
+    assert not {root.id, prompt.id} & leaves, "inner nodes listed as leaves"
+
+
+def check_count_descendants(backend: StorageBackend) -> None:
+    nodes = _chain(backend, turns=2)
+    backend.insert_nodes([_node(NodeType.PROMPT, nodes[0])])
+    assert backend.count_descendants(nodes[0].id) == 5, "root descendant count wrong"
+    assert backend.count_descendants(nodes[2].id) == 2, "inner descendant count wrong"
+    assert backend.count_descendants(nodes[-1].id) == 0, "leaf descendant count wrong"
+
+
+def check_subtree_stats(backend: StorageBackend) -> None:
+    nodes = _chain(backend, turns=2)
+    root = nodes[0]
+    assert backend.get_subtree_stats(nodes[-1].id) == (0, 0, 1), "new leaf stats wrong"
+    assert backend.get_subtree_stats(root.id) == (4, 4, 1), "chain stats wrong"
+
+    # Second child of the root adds a leaf; a child of a leaf replaces it
+    sibling = _node(NodeType.PROMPT, root)
+    backend.insert_nodes([sibling])
+    answer = _node(NodeType.RESPONSE, sibling)
+    follow_ups = [_node(NodeType.PROMPT, answer) for _ in range(2)]
+    backend.insert_nodes([answer] + follow_ups, chunk_size=1)
+    assert backend.get_subtree_stats(root.id) == (8, 4, 3), \
+        f"root stats wrong: {backend.get_subtree_stats(root.id)}"
+    assert backend.get_subtree_stats(sibling.id) == (3, 2, 2), "batch parent stats wrong"
+    assert backend.get_subtree_stats(nodes[2].id) == (2, 2, 1), "untouched branch stats changed"
+    assert backend.count_descendants(root.id) == 8, "descendant count disagrees with stats"
+    assert backend.get_subtree_stats(str(uuid.uuid4())) is None, "missing node should have no stats"
+
+
+def check_concurrent_inserts(backend: StorageBackend) -> None:
+    # Threads race to give the same parents their first and later children
+    root = _node(NodeType.SYSTEM)
+    prompts = [_node(NodeType.PROMPT, root) for _ in range(50)]
+    backend.insert_nodes([root] + prompts)
+    start = threading.Barrier(8)
+
+    def answer_all():
+        start.wait()
+        for prompt in prompts:
+            backend.insert_nodes([_node(NodeType.RESPONSE, prompt)])
+
+    threads = [threading.Thread(target=answer_all) for _ in range(8)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    assert backend.get_subtree_stats(root.id) == (450, 2, 400), \
+        f"concurrent insert stats wrong: {backend.get_subtree_stats(root.id)}"
+    assert backend.get_subtree_stats(prompts[0].id) == (8, 1, 8), "parent stats wrong"
+
+
+def check_streaming(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    sibling = _node(NodeType.PROMPT, root)
+    backend.insert_nodes([sibling])
+
+    children = list(backend.iter_children(root.id, batch_size=1))
+    assert [node.id for node in children] == [prompt.id, sibling.id], "streamed children wrong"
+    assert children[0].content == prompt.content, "streamed child content missing"
+    refs = list(backend.iter_children(root.id, with_content=False))
+    assert refs[0] == (prompt.id, root.id, NodeType.PROMPT, 1), f"child ref wrong: {refs[0]}"
+
+    assert {node.id for node in backend.iter_leaf_nodes(batch_size=1)} >= {response.id, sibling.id}, \
+        "streamed leaves missing"
+    assert not {root.id, prompt.id} & {ref.id for ref in backend.iter_leaf_nodes(with_content=False)}, \
+        "inner nodes streamed as leaves"
+
+    subtree = [ref.id for ref in backend.iter_subtree(root.id, batch_size=2, with_content=False)]
+    assert subtree[0] == root.id and set(subtree) == {root.id, prompt.id, sibling.id, response.id}, \
+        "streamed subtree wrong"
+    assert subtree.index(response.id) == 3, "subtree not shallowest first"
+    assert [node.id for node in backend.iter_subtree(prompt.id)] == [prompt.id, response.id], \
+        "streamed inner subtree wrong"
+    assert list(backend.iter_subtree(str(uuid.uuid4()))) == [], "missing subtree should be empty"
+
+
+def check_subtree(backend: StorageBackend) -> None:
+    nodes = _chain(backend, turns=2)
+    sibling = _node(NodeType.PROMPT, nodes[0])
+    backend.insert_nodes([sibling])
+
+    rows = backend.get_subtree(nodes[0].id, max_depth=2, limit=100)
+    assert [node.id for node, _ in rows][0] == nodes[0].id, "subtree should start at its root"
+    assert {node.id for node, _ in rows} == {nodes[0].id, nodes[1].id, nodes[2].id, sibling.id}, \
+        "subtree depth limit wrong"
+    counts = {node.id: count for node, count in rows}
+    assert counts[nodes[2].id] == 1 and counts[sibling.id] == 0, "subtree child counts wrong"
+    assert len(backend.get_subtree(nodes[0].id, max_depth=2, limit=2)) == 2, "subtree limit ignored"
+    assert backend.count_subtree(nodes[0].id, 2) == 4 and backend.count_subtree(nodes[0].id, 10) == 6, \
+        "subtree count wrong"
+    assert backend.count_subtree(str(uuid.uuid4()), 3) == 0, "missing subtree should count 0"
+
+
+def check_transitions(backend: StorageBackend) -> None:
+    earlier = datetime.now() - timedelta(hours=1)
+    old_root = _node(NodeType.SYSTEM, timestamp=earlier)
+    old_prompt = _node(NodeType.PROMPT, old_root, timestamp=earlier)
+    backend.insert_nodes([old_root, old_prompt])
+    new_response = _node(NodeType.RESPONSE, old_prompt)
+    backend.insert_nodes([new_response])
+
+    rows = {row.id: row for row in backend.iter_transitions()}
+    assert rows[old_root.id].parent_type is None, "root should have no parent type"
+    assert rows[old_prompt.id].parent_type == NodeType.SYSTEM, "parent type wrong"
+    assert rows[new_response.id].node_type == NodeType.RESPONSE, "node type wrong"
+
+    recent = {row.id for row in backend.iter_transitions(since=earlier + timedelta(minutes=30))}
+    assert recent == {new_response.id}, "since filter wrong"
+    assert backend.latest_timestamp() >= new_response.timestamp - timedelta(seconds=1), "latest timestamp wrong"
+
+
+def check_topology(backend: StorageBackend) -> None:
+    nodes = _chain(backend, turns=1)
+    refs = {ref.id: ref for ref in backend.iter_topology()}
+    assert set(refs) == {node.id for node in nodes}, "topology ids wrong"
+    assert [(refs[node.id].parent_id, refs[node.id].node_type, refs[node.id].depth) for node in nodes] == \
+           [(node.parent_id, node.node_type, node.depth) for node in nodes], "topology fields wrong"
+
+
+def check_metadata(backend: StorageBackend) -> None:
+    assert backend.get_metadata("conformance") is None, "unset key should be None"
+    backend.set_metadata("conformance", "1")
+    backend.set_metadata("conformance", "2")
+    assert backend.get_metadata("conformance") == "2", "metadata not overwritten"
+
+
+def check_graph(backend: StorageBackend) -> None:
+    graph = ConversationGraph(backend=backend, cache_max_entries=2)
+    ids = graph.import_conversation("system", {}, [("prompt", "response")])
+    prompt_id = graph.add_node("another", NodeType.PROMPT, ids[0])
+    assert graph.validate_tree(full=True) and graph.validate_tree(), "valid tree rejected"
+    assert [node.id for node in graph.get_siblings(prompt_id)] == [ids[1]], "siblings wrong"
+    view = graph.get_node_view(ids[0])
+    assert {node.id: count for node, count in view.children.items} == {ids[1]: 1, prompt_id: 0}, "node view wrong"
+    view = graph.get_node_view(prompt_id, limit=1)
+    assert [node.id for node, _ in view.siblings.items] == [ids[1]] and view.siblings.next_cursor is None, \
+        "node view siblings wrong"
+    try:
+        graph.add_node("bad", NodeType.PROMPT, prompt_id)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid transition accepted")
+
+
+def check_graph_topology_index(backend: StorageBackend) -> None:
+    graph = ConversationGraph(backend=backend)
+    ids = graph.import_conversation("system", {}, [("prompt", "response")])
+    graph = ConversationGraph(backend=backend, topology_index=True)
+    prompt_id = graph.add_node("another", NodeType.PROMPT, ids[0])
+    assert graph.count_descendants(ids[0]) == 3 and graph.subtree_size(ids[1]) == 2, "index counts wrong"
+    assert {node.id for node in graph.get_leaf_nodes()} == {ids[2], prompt_id}, "index leaves wrong"
+    assert [node.id for node in graph.get_siblings(prompt_id)] == [ids[1]], "index siblings wrong"
+    assert [node.id for node in graph.get_children(ids[0])] == [ids[1], prompt_id], "index children wrong"
+    assert [ref.id for ref in graph.iter_subtree(ids[0], batch_size=1, with_content=False)] == \
+           [ids[0], ids[1], prompt_id, ids[2]], "index subtree wrong"
+    assert [node.content for node in graph.iter_leaf_nodes(batch_size=1)] == ["response", "another"], \
+        "index leaf stream wrong"
+
+
+def check_graph_pages(backend: StorageBackend) -> None:
+    graph = ConversationGraph(backend=backend)
+    root_id = graph.create_root("system", {})
+    prompt_ids = [graph.add_node(f"prompt {i}", NodeType.PROMPT, root_id) for i in range(5)]
+    seen = []
+    cursor = None
+    while True:
+        page = graph.get_children_page(root_id, limit=2, cursor=cursor)
+        seen.extend(node.id for node, _ in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == prompt_ids, "paging did not visit every child once in order"
+    siblings = graph.get_siblings_page(prompt_ids[0], limit=10)
+    assert [node.id for node, _ in siblings.items] == prompt_ids[1:] and siblings.next_cursor is None, \
+        "sibling page wrong"
+    try:
+        graph.get_children_page(root_id, cursor="not a cursor")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("bad cursor accepted")
+
+
+def check_graph_group_commit(backend: StorageBackend) -> None:
+    graph = ConversationGraph(backend=backend, group_commit=True, group_commit_delay=0.01)
+    root_id = graph.create_root("system", {})
+    ids = []
+
+    def write_pairs():
+        for i in range(5):
+            ids.extend(graph.add_nodes_bulk([
+                {'content': f"prompt {i}", 'node_type': NodeType.PROMPT, 'parent_id': root_id},
+                {'content': f"response {i}", 'node_type': NodeType.RESPONSE, 'parent_index': 0}
+            ]))
+
+    threads = [threading.Thread(target=write_pairs) for _ in range(4)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+
+    assert len(ids) == 40 and all(backend.get_node(node_id) for node_id in ids), "group-committed nodes missing"
+    assert backend.count_descendants(root_id) == 40, "group commit descendant count wrong"
+    try:
+        graph.add_node("bad", NodeType.PROMPT, ids[0])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid transition accepted")
+    assert graph.writer.stats()["requests"] == 21, "not every write went through the writer"
+
+    # A request that breaks group building fails alone; the writer keeps going
+    broken = graph.writer.submit(None)
+    try:
+        broken.result(timeout=5)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("malformed write request accepted")
+    assert graph.add_node("after", NodeType.PROMPT, root_id), "writer stopped after a failed group"
+    graph.writer.close()
+    try:
+        graph.writer.submit([])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("closed writer accepted a request")
+
+
+def check_metrics_series(backend: StorageBackend) -> None:
+    graphs = [ConversationGraph(backend=backend, group_commit=True) for _ in range(2)]
+    series = [line.rsplit(" ", 1)[0] for line in metrics.render_prometheus().splitlines()
+              if not line.startswith("#")]
+    duplicates = {name for name in series if series.count(name) > 1}
+    assert not duplicates, f"duplicate metric series {sorted(duplicates)}"
+    assert sum(name.startswith("graph_group_commit_groups") for name in series) >= len(graphs), \
+        "each group commit writer should have its own series"
+    [graph.writer.close() for graph in graphs]
+
+
+def check_content_store(backend: StorageBackend) -> None:
+    store = getattr(backend, "content_store", None)
+    if store is None:
+        return
+    long_text = "the same long answer " * 100
+    root = _node(NodeType.SYSTEM)
+    prompts = [_node(NodeType.PROMPT, root, content=f"prompt {i}") for i in range(3)]
+    responses = [_node(NodeType.RESPONSE, prompt, content=long_text) for prompt in prompts]
+    backend.insert_nodes([root] + prompts + responses)
+
+    with backend.engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT encoding, size, length(data) FROM node_content").all()
+        inline = conn.exec_driver_sql("SELECT COUNT(*) FROM conversation_nodes WHERE content IS NOT NULL").scalar()
+    assert len(rows) == 5, "identical content should be stored once"
+    assert inline == 0, "content should not be kept inline"
+    assert any(encoding != "raw" and stored < size for encoding, size, stored in rows), \
+        "long content should be compressed"
+
+    store._cache.clear()
+    children = backend.get_children(prompts[0].id)
+    assert children[0].loaded_content is None, "get_children should not load content"
+    assert children[0].content == long_text, "content not loaded on access"
+    store._cache.clear()
+    path = backend.get_path(responses[1].id)
+    assert all(node.loaded_content is not None for node in path), "get_path should load content up front"
+    assert [node.content for node in path] == [root.content, "prompt 1", long_text], "path content wrong"
+
+    graph = ConversationGraph(backend=backend)
+    store._cache.clear()
+    child = graph.get_children(prompts[2].id)[0]
+    cached_bytes = graph.cache.bytes
+    assert child.content == long_text, "cached node content wrong"
+    assert graph.cache.bytes == cached_bytes + len(long_text), "content loaded after caching is not counted"
+
+
+def check_export_roundtrip(backend: StorageBackend) -> None:
+    root, prompt, response = _chain(backend, turns=1)
+    branch = _node(NodeType.PROMPT, root, content="another prompt")
+    backend.insert_nodes([branch])
+    path = os.path.join(tempfile.mkdtemp(), "export.jsonl.gz")
+    assert export_graph(backend, path, root.id, batch_size=2) == 4, "export should cover the whole tree"
+
+    target = MemoryBackend()
+    target.set_metadata(VALIDATION_WATERMARK_KEY, datetime.now().isoformat())
+    assert import_graph(target, path, batch_size=3) == 4, "import count wrong"
+    assert target.get_metadata(VALIDATION_WATERMARK_KEY) == root.timestamp.isoformat(), \
+        "import should rewind the validation watermark to its oldest node"
+    assert [node.content for node in target.get_path(response.id)] == \
+           [root.content, prompt.content, response.content], "imported path differs"
+    assert target.get_subtree_stats(root.id) == backend.get_subtree_stats(root.id), "imported stats differ"
+    assert import_graph(target, path, skip_existing=True) == 0, "skip_existing re-imported nodes"
+
+    subtree_path = os.path.join(tempfile.mkdtemp(), "subtree.jsonl")
+    export_graph(backend, subtree_path, prompt.id)
+    try:
+        import_graph(MemoryBackend(), subtree_path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("import accepted a subtree without its parent")
+
+    invalid = MemoryBackend()
+    bad_root = _node(NodeType.SYSTEM)
+    invalid.insert_nodes([bad_root, _node(NodeType.RESPONSE, bad_root)])
+    invalid_path = os.path.join(tempfile.mkdtemp(), "invalid.jsonl")
+    export_graph(invalid, invalid_path)
+    try:
+        import_graph(MemoryBackend(), invalid_path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("import accepted a SYSTEM -> RESPONSE transition")
+
+
+def check_search(backend: StorageBackend) -> None:
+    start = datetime.now()
+    root = _node(NodeType.SYSTEM, content="You answer questions about astronomy", timestamp=start)
+    first = _node(NodeType.PROMPT, root, content="Why is the Andromeda galaxy blue?",
+                  timestamp=start + timedelta(seconds=1))
+    answer = _node(NodeType.RESPONSE, first, content="Young stars in the galaxy's disk shine blue.",
+                   timestamp=start + timedelta(seconds=2))
+    second = _node(NodeType.PROMPT, answer, content="And the galaxy's core?",
+                   timestamp=start + timedelta(seconds=3))
+    other_root = _node(NodeType.SYSTEM, content="Galaxy brain mode", timestamp=start + timedelta(seconds=4))
+    backend.insert_nodes([root, first, answer, second])
+    backend.insert_nodes([other_root])
+
+    ids = [node.id for node in backend.search(["galaxy"], None, None, 10)]
+    assert ids == [other_root.id, second.id, answer.id, first.id], "search should return matches newest first"
+    assert [node.id for node in backend.search(["galaxy", "blue"], None, None, 10)] == [answer.id, first.id], \
+        "search should require every term"
+    assert [node.id for node in backend.search(["galaxy"], NodeType.PROMPT, None, 10)] == [second.id, first.id], \
+        "search node_type filter wrong"
+    assert [node.id for node in backend.search(["galaxy"], None, root.id, 10)] == [second.id, answer.id, first.id], \
+        "search root filter wrong"
+    assert [node.id for node in backend.search(["galaxy"], None, answer.id, 10)] == [second.id, answer.id], \
+        "search subtree filter wrong"
+    assert [node.id for node in backend.search(["galaxy"], None, None, 10, (answer.timestamp, answer.id))] == \
+           [first.id], "search should resume after the cursor key"
+    assert backend.search(["nebula"], None, None, 10) == [], "unknown term should match nothing"
+    assert backend.get_ancestor_ids([second.id, root.id]) == \
+           {second.id: [root.id, first.id, answer.id, second.id], root.id: [root.id]}, "ancestor ids wrong"
+
+
+def check_search_during_index_build(backend: StorageBackend) -> None:
+    start = datetime.now()
+    first_tree = _chain(backend, turns=1)
+    second_tree = [_node(NodeType.SYSTEM, content="Second tree", timestamp=start + timedelta(seconds=1))]
+    second_tree.append(_node(NodeType.PROMPT, second_tree[0], content="Tell me about comets",
+                             timestamp=start + timedelta(seconds=2)))
+    backend.insert_nodes(second_tree)
+    late = _node(NodeType.RESPONSE, second_tree[1], content="Comets are icy", timestamp=start + timedelta(seconds=3))
+
+    # Backends that scan trees to build their index see the late node arrive
+    # after the first tree was scanned but before its own parent was
+    iter_subtree = backend.iter_subtree
+
+    def scan_then_insert(*args, **kwargs):
+        yield from iter_subtree(*args, **kwargs)
+        if backend.get_node(late.id) is None:
+            backend.insert_nodes([late])
+
+    backend.iter_subtree = scan_then_insert
+    try:
+        backend.search(["comets"], None, None, 10)
+    finally:
+        del backend.iter_subtree
+    if backend.get_node(late.id) is None:
+        backend.insert_nodes([late])
+
+    assert [node.id for node in backend.search(["comets"], None, second_tree[0].id, 10)] == \
+           [late.id, second_tree[1].id], "node inserted during the index build lost its tree"
+    assert [node.id for node in backend.search(["comets"], None, second_tree[1].id, 10)] == \
+           [late.id, second_tree[1].id], "node inserted during the index build lost its parent"
+    assert first_tree[0].id not in {node.id for node in backend.search(["comets"], None, None, 10)}, \
+        "unrelated tree matched"
+
+
+def check_graph_search(backend: StorageBackend) -> None:
+    graph = ConversationGraph(backend=backend)
+    root_id = graph.create_root("Talk about tides", {"model": "conformance"})
+    parent_id = root_id
+    for turn in range(3):
+        prompt_id = graph.add_node(f"question {turn} about the moon", NodeType.PROMPT, parent_id)
+        parent_id = graph.add_node(f"the moon pulls the sea, answer {turn}", NodeType.RESPONSE, prompt_id)
+
+    page = graph.search("Moon", limit=4)
+    assert len(page.items) == 4 and page.next_cursor, "first search page wrong"
+    rest = graph.search("moon", limit=4, cursor=page.next_cursor)
+    assert len(rest.items) == 2 and rest.next_cursor is None, "last search page wrong"
+    hit = page.items[0]
+    assert hit.node.id == parent_id and "moon" in hit.snippet, "newest hit or snippet wrong"
+    assert hit.path[0] == root_id and hit.path[-1] == parent_id and len(hit.path) == 7, "hit path wrong"
+    assert [h.node.node_type for h in graph.search("question moon", node_type=NodeType.PROMPT).items] == \
+           [NodeType.PROMPT] * 3, "typed search wrong"
+    try:
+        graph.search("a of")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("query without searchable words accepted")
+
+
+CHECKS = [
+    check_get_node,
+    check_children,
+    check_batch_with_internal_parents,
+    check_path,
+    check_node_view,
+    check_children_page,
+    check_leaf_nodes,
+    check_count_descendants,
+    check_subtree_stats,
+    check_concurrent_inserts,
+    check_streaming,
+    check_subtree,
+    check_transitions,
+    check_topology,
+    check_metadata,
+    check_graph,
+    check_graph_topology_index,
+    check_graph_pages,
+    check_graph_group_commit,
+    check_metrics_series,
+    check_content_store,
+    check_export_roundtrip,
+    check_search,
+    check_search_during_index_build,
+    check_graph_search,
+]
+
+
+def run_conformance(make_backend: Callable[[], StorageBackend]) -> List[str]:
+    """Runs every check on a fresh backend and returns the failures."""
+    failures = []
+    for check in CHECKS:
+        backend = make_backend()
+        try:
+            check(backend)
+        except AssertionError as e:
+            failures.append(f"{check.__name__}: {e}")
+        finally:
+            backend.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mysql-database", help="scratch MySQL database to check as well")
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp()
+    backends = {
+        "memory": MemoryBackend,
+        "sqlite-memory": lambda: SQLiteBackend(":memory:"),
+        "sqlite-file": lambda: SQLiteBackend(os.path.join(scratch_dir, f"{uuid.uuid4()}.db")),
+        "sqlite-content-store": lambda: SQLiteBackend(":memory:", content_store=True),
+    }
+    if args.mysql_database:
+        from project.conversation_graph.config import MYSQL_CONFIG
+        backends["mysql"] = lambda: MySQLBackend(**{**MYSQL_CONFIG, "database": args.mysql_database})
+
+    failed = False
+    for name, make_backend in backends.items():
+        failures = run_conformance(make_backend)
+        print(f"{name}: {'ok' if not failures else 'FAILED'}")
+        for failure in failures:
+            print(f"  {failure}")
+        failed = failed or bool(failures)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
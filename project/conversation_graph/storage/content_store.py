@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import List, Dict, Iterable, Optional
+
+from sqlalchemy import event, select, insert
+from sqlalchemy.engine import Engine
+
+from project.conversation_graph.graph.models import Node, NodeContent
+from project.conversation_graph.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content shorter than this is stored as plain UTF-8; compressing it saves too little
+DEFAULT_COMPRESS_THRESHOLD = 512
+# Hashes per IN (...) when loading content for many nodes at once
+LOAD_CHUNK_SIZE = 500
+
+
+def decode_content(encoding: str, data: bytes) -> str:
+    if encoding == 'zlib':
+        data = zlib.decompress(data)
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Content is zstd-compressed but the zstandard package is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif encoding != 'raw':
+        raise ValueError(f"Unknown content encoding: {encoding}")
+    return data.decode()
+
+
+@event.listens_for(Node, 'load')
+def attach_content_loader(target: Node, context) -> None:
+    # Sessions of a content-store backend carry its loader; nodes keep it after
+    # being expunged, so their content can still be fetched on first access
+    loader = context.session.info.get('content_loader')
+    if loader is not None:
+        target._content_loader = loader
+
+
+class ContentStore:
+    """
+    Node text kept once per distinct content in node_content, keyed by its
+    SHA-256 and compressed above compress_threshold bytes when that makes it
+    smaller. codec is 'zlib', or 'zstd' if the zstandard package is installed.
+
+    Nodes only hold the hash, so queries over the tree's shape never move
+    content; load() and fill() fetch it when it is actually read, through a
+    small LRU of decoded text shared by every node with the same content.
+    """
+
+    def __init__(self, engine: Engine, compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+                 codec: str = 'zlib', cache_max_bytes: int = 16 * 1024 * 1024, connection_lock=None):
+        if codec not in ('zlib', 'zstd'):
+            raise ValueError(f"Unknown content codec: {codec}")
+        if codec == 'zstd' and zstandard is None:
+            raise ValueError("codec='zstd' needs the zstandard package")
+        self.engine = engine
+        self._connection_lock = connection_lock or nullcontext()
+        self.compress_threshold = compress_threshold
+        self.codec = codec
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.loads = 0
+        metrics.register_collector("content_store", self.stats)
+
+    def encode(self, content: str) -> Dict:
+        """The node_content row for content."""
+        raw = content.encode()
+        encoding, data = 'raw', raw
+        if len(raw) >= self.compress_threshold:
+            if self.codec == 'zstd':
+                compressed = zstandard.ZstdCompressor().compress(raw)
+            else:
+                compressed = zlib.compress(raw)
+            if len(compressed) < len(raw):
+                encoding, data = self.codec, compressed
+        return {'hash': hashlib.sha256(raw).hexdigest(), 'encoding': encoding, 'size': len(raw), 'data': data}
+
+    def write(self, session, contents: Iterable[str]) -> Dict[str, str]:
+        """Stores each distinct content within the caller's transaction,
+        skipping any already present; returns content -> hash."""
+        rows = {}
+        for content in contents:
+            if content not in rows:
+                rows[content] = self.encode(content)
+
+        # INSERT IGNORE: the same text may be written concurrently by another batch
+        prefix = 'OR IGNORE' if self.engine.dialect.name == 'sqlite' else 'IGNORE'
+        statement = insert(NodeContent.__table__).prefix_with(prefix)
+        values = list(rows.values())
+        for start in range(0, len(values), LOAD_CHUNK_SIZE):
+            session.execute(statement, values[start:start + LOAD_CHUNK_SIZE])
+
+        for content, row in rows.items():
+            self._remember(row['hash'], content)
+        return {content: row['hash'] for content, row in rows.items()}
+
+    def load(self, hash_: str) -> Optional[str]:
+        return self.load_many([hash_]).get(hash_)
+
+    def load_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        found = {}
+        missing = []
+        with self._lock:
+            for hash_ in set(hashes):
+                if hash_ in self._cache:
+                    self._cache.move_to_end(hash_)
+                    found[hash_] = self._cache[hash_]
+                else:
+                    missing.append(hash_)
+
+        if missing:
+            with self._connection_lock, self.engine.connect() as conn:
+                for start in range(0, len(missing), LOAD_CHUNK_SIZE):
+                    rows = conn.execute(
+                        select(NodeContent.hash, NodeContent.encoding, NodeContent.data)
+                        .where(NodeContent.hash.in_(missing[start:start + LOAD_CHUNK_SIZE]))
+                    )
+                    for row in rows:
+                        found[row.hash] = decode_content(row.encoding, row.data)
+                        self._remember(row.hash, found[row.hash])
+            self.loads += 1
+        return found
+
+    def fill(self, nodes: List[Node]) -> List[Node]:
+        """Loads the content of every node that only has its hash, in one pass."""
+        pending = [node for node in nodes if node.loaded_content is None and node.content_hash is not None]
+        if pending:
+            contents = self.load_many(node.content_hash for node in pending)
+            for node in pending:
+                if node.content_hash in contents:
+                    node.set_loaded_content(contents[node.content_hash])
+        return nodes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cached_entries": len(self._cache), "cached_bytes": self._cache_bytes, "loads": self.loads}
+
+    def _remember(self, hash_: str, content: str) -> None:
+        size = len(content)
+        if size > self.cache_max_bytes:
+            return
+        with self._lock:
+            if hash_ in self._cache:
+                self._cache.move_to_end(hash_)
+                return
+            self._cache[hash_] = content
+            self._cache_bytes += size
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
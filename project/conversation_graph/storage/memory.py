@@ -0,0 +1,211 @@
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Iterator, Tuple, Union
+
+from project.conversation_graph.graph.models import Node, NodeRef, NodeType, Transition, SubtreeStats
+from project.conversation_graph.graph.search_index import SearchIndex
+from project.conversation_graph.storage.base import StorageBackend
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Pure in-process backend: nodes in a dict, child ids in per-parent lists.
+    Nothing is persisted, so it suits tests and benchmarks that should measure
+    agent overhead rather than database latency.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Node] = {}
+        self._children: Dict[Optional[str], List[str]] = {}
+        self._metadata: Dict[str, str] = {}
+        # node id -> [descendant_count, max_depth_below, leaf_count]
+        self._stats: Dict[str, List[int]] = {}
+        self._latest: Optional[datetime] = None
+        self._search_index = SearchIndex()
+        self._lock = threading.RLock()
+
+    def insert_nodes(self, nodes: List[Node], chunk_size: int = 500) -> None:
+        with self._lock:
+            batch_ids = {node.id for node in nodes}
+            for node in nodes:
+                if node.id in self._nodes:
+                    raise ValueError(f"Node {node.id} already exists")
+                if node.parent_id is not None and node.parent_id not in self._nodes \
+                        and node.parent_id not in batch_ids:
+                    raise ValueError(f"Parent node {node.parent_id} not found")
+
+            for node in nodes:
+                self._nodes[node.id] = node
+                self._add_stats(node)
+                self._children.setdefault(node.parent_id, []).append(node.id)
+                if self._latest is None or node.timestamp > self._latest:
+                    self._latest = node.timestamp
+            self._search_index.add(nodes)
+
+    def _add_stats(self, node: Node) -> None:
+        self._stats[node.id] = [0, 0, 1]
+        if node.parent_id is None:
+            return
+
+        # A first child replaces its parent as a leaf; any later child adds one
+        new_leaf = 1 if self._children.get(node.parent_id) else 0
+        ancestor_id = node.parent_id
+        distance = 1
+        while ancestor_id is not None:
+            stats = self._stats[ancestor_id]
+            stats[0] += 1
+            stats[1] = max(stats[1], distance)
+            stats[2] += new_leaf
+            ancestor_id = self._nodes[ancestor_id].parent_id
+            distance += 1
+
+    def get_node(self, node_id: str) -> Optional[Node]:
+        return self._nodes.get(node_id)
+
+    def get_nodes(self, node_ids: List[str]) -> List[Node]:
+        return [self._nodes[node_id] for node_id in node_ids if node_id in self._nodes]
+
+    def get_children(self, node_id: Optional[str]) -> List[Node]:
+        with self._lock:
+            return [self._nodes[child_id] for child_id in self._children.get(node_id, [])]
+
+    def iter_children(self, node_id: Optional[str], batch_size: int = 1000,
+                      with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        with self._lock:
+            child_ids = list(self._children.get(node_id, []))
+        return self._iter_ids(child_ids, with_content)
+
+    def _iter_ids(self, node_ids: List[str], with_content: bool) -> Iterator[Union[Node, NodeRef]]:
+        for node_id in node_ids:
+            node = self._nodes[node_id]
+            yield node if with_content else node.to_ref()
+
+    def get_path(self, node_id: str) -> List[Node]:
+        path = []
+        node = self._nodes.get(node_id)
+        while node is not None:
+            path.append(node)
+            node = self._nodes.get(node.parent_id) if node.parent_id is not None else None
+        return path[::-1]
+
+    def search(self, terms: List[str], node_type: Optional[NodeType], root_id: Optional[str], limit: int,
+               after: Optional[Tuple[datetime, str]] = None) -> List[Node]:
+        return [self._nodes[node_id] for node_id in self._search_index.search(terms, node_type, root_id, limit, after)]
+
+    def get_ancestor_ids(self, node_ids: List[str]) -> Dict[str, List[str]]:
+        return {node_id: [node.id for node in self.get_path(node_id)] for node_id in node_ids if node_id in self._nodes}
+
+    def get_node_view(self, node_id: str, limit: int) \
+            -> Optional[Tuple[Node, List[Tuple[Node, int]], List[Tuple[Node, int]]]]:
+        with self._lock:
+            node = self._nodes.get(node_id)
+            if node is None:
+                return None
+            siblings = [] if node.parent_id is None else \
+                self.get_children_page(node.parent_id, limit, exclude_id=node_id)
+            return node, self.get_children_page(node_id, limit), siblings
+
+    def get_children_page(self, parent_id: Optional[str], limit: int,
+                          after: Optional[Tuple[datetime, str]] = None,
+                          exclude_id: Optional[str] = None) -> List[Tuple[Node, int]]:
+        with self._lock:
+            children = [
+                self._nodes[child_id] for child_id in self._children.get(parent_id, [])
+                if child_id != exclude_id
+            ]
+            if after is not None:
+                children = [node for node in children if (node.timestamp, node.id) > after]
+            children.sort(key=lambda node: (node.timestamp, node.id))
+            return [(node, len(self._children.get(node.id, []))) for node in children[:limit]]
+
+    def get_leaf_nodes(self) -> List[Node]:
+        with self._lock:
+            return [node for node_id, node in self._nodes.items() if not self._children.get(node_id)]
+
+    def iter_leaf_nodes(self, batch_size: int = 1000,
+                        with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        with self._lock:
+            leaf_ids = [node_id for node_id in self._nodes if not self._children.get(node_id)]
+        return self._iter_ids(leaf_ids, with_content)
+
+    def iter_subtree(self, node_id: str, batch_size: int = 1000,
+                     with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        with self._lock:
+            if node_id not in self._nodes:
+                return iter([])
+            subtree_ids = [node_id]
+            for current in subtree_ids:
+                subtree_ids.extend(self._children.get(current, []))
+        return self._iter_ids(subtree_ids, with_content)
+
+    def get_subtree(self, node_id: str, max_depth: int, limit: int) -> List[Tuple[Node, int]]:
+        with self._lock:
+            return [
+                (node, len(self._children.get(node.id, [])))
+                for node in self._subtree_levels(node_id, max_depth)[:limit]
+            ]
+
+    def count_subtree(self, node_id: str, max_depth: int) -> int:
+        with self._lock:
+            return len(self._subtree_levels(node_id, max_depth))
+
+    def _subtree_levels(self, node_id: str, max_depth: int) -> List[Node]:
+        if node_id not in self._nodes:
+            return []
+        nodes = []
+        level = [self._nodes[node_id]]
+        for _ in range(max_depth + 1):
+            if not level:
+                break
+            nodes.extend(level)
+            level = sorted(
+                (self._nodes[child_id] for node in level for child_id in self._children.get(node.id, [])),
+                key=lambda node: (node.timestamp, node.id)
+            )
+        return nodes
+
+    def count_descendants(self, node_id: str) -> int:
+        with self._lock:
+            stats = self._stats.get(node_id)
+            return stats[0] if stats else 0
+
+    def get_subtree_stats(self, node_id: str) -> Optional[SubtreeStats]:
+        with self._lock:
+            stats = self._stats.get(node_id)
+            return SubtreeStats(*stats) if stats else None
+
+    def iter_transitions(self, since: Optional[datetime] = None) -> Iterator[Transition]:
+        with self._lock:
+            if since is None:
+                nodes = list(self._nodes.values())
+            else:
+                # Insertion order is timestamp order, so recent nodes are at the end
+                nodes = []
+                for node in reversed(self._nodes.values()):
+                    if node.timestamp < since:
+                        break
+                    nodes.append(node)
+
+        for node in nodes:
+            parent = self._nodes.get(node.parent_id) if node.parent_id is not None else None
+            yield Transition(
+                id=node.id,
+                parent_id=node.parent_id,
+                node_type=node.node_type,
+                parent_type=parent.node_type if parent else None
+            )
+
+    def iter_topology(self) -> Iterator[NodeRef]:
+        with self._lock:
+            nodes = list(self._nodes.values())
+        for node in nodes:
+            yield node.to_ref()
+
+    def latest_timestamp(self) -> Optional[datetime]:
+        return self._latest
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        return self._metadata.get(key)
+
+    def set_metadata(self, key: str, value: str) -> None:
+        self._metadata[key] = value
@@ -0,0 +1,626 @@
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from itertools import islice
+from typing import List, Dict, Optional, Iterator, Tuple, Union
+
+from sqlalchemy import create_engine, event, select, insert, update, func, and_, or_, case, bindparam, text, \
+    literal, union_all
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, aliased
+from sqlalchemy.pool import StaticPool
+
+from project.conversation_graph.metrics import metrics
+from project.conversation_graph.graph.models import Base, Node, NodeAncestry, GraphMetadata, NodeType, NodeRef, Transition, \
+    NodeStats, SubtreeStats
+from project.conversation_graph.graph.search_index import SearchIndex
+from project.conversation_graph.storage.base import StorageBackend
+from project.conversation_graph.storage.content_store import ContentStore, DEFAULT_COMPRESS_THRESHOLD
+
+
+# Columns read when a caller only needs the shape of the tree
+REF_COLUMNS = (Node.id, Node.parent_id, Node.node_type, Node.depth)
+
+
+def children_page_query(parent_id: Optional[str], limit: int,
+                        after: Optional[Tuple[datetime, str]] = None,
+                        exclude_id: Optional[str] = None):
+    """Selects one keyset page of parent_id's children with their child
+    counts; served from idx_parent_timestamp_id however deep the page is."""
+    child = aliased(Node)
+    child_count = select(func.count(child.id)).where(child.parent_id == Node.id).scalar_subquery()
+    query = select(Node, child_count.label('child_count')).where(Node.parent_id == parent_id)
+    if after is not None:
+        timestamp, node_id = after
+        query = query.where(or_(Node.timestamp > timestamp, and_(Node.timestamp == timestamp, Node.id > node_id)))
+    if exclude_id is not None:
+        query = query.where(Node.id != exclude_id)
+    return query.order_by(Node.timestamp, Node.id).limit(limit)
+
+
+# Which part of a node view a node_view_query row belongs to
+NODE_ROW, CHILD_ROW, SIBLING_ROW = range(3)
+
+
+def node_view_query(node_id: str, limit: int):
+    """Selects node_id, the first limit of its children and the first limit
+    of its siblings, each with its child count and a part column
+    (NODE_ROW, CHILD_ROW or SIBLING_ROW), in one statement."""
+    child = aliased(Node)
+    child_count = select(func.count(child.id)).where(child.parent_id == Node.id).scalar_subquery()
+    node = aliased(Node)
+    parent_id = select(node.parent_id).where(node.id == node_id).scalar_subquery()
+    parts = (
+        select(Node, child_count.label('child_count')).where(Node.id == node_id),
+        children_page_query(node_id, limit),
+        children_page_query(parent_id, limit, exclude_id=node_id),
+    )
+    rows = union_all(*(
+        select(part.subquery(), literal(number).label('part')) for number, part in enumerate(parts)
+    )).subquery()
+    view_node = aliased(Node, rows)
+    return select(view_node, rows.c.child_count, rows.c.part) \
+        .order_by(rows.c.part, view_node.timestamp, view_node.id)
+
+
+def split_node_view(rows) -> Optional[Tuple[Node, List[Tuple[Node, int]], List[Tuple[Node, int]]]]:
+    """Splits node_view_query rows into the node, its children and its
+    siblings; None when the node does not exist."""
+    parts = {NODE_ROW: [], CHILD_ROW: [], SIBLING_ROW: []}
+    for node, child_count, part in rows:
+        parts[part].append((node, child_count))
+    if not parts[NODE_ROW]:
+        return None
+    return parts[NODE_ROW][0][0], parts[CHILD_ROW], parts[SIBLING_ROW]
+
+
+def subtree_query(node_id: str, max_depth: int, limit: int):
+    """Selects the nodes within max_depth levels of node_id from the closure
+    table, each with its child count, in one bounded statement."""
+    child = aliased(Node)
+    child_count = select(func.count(child.id)).where(child.parent_id == Node.id).scalar_subquery()
+    return select(Node, child_count.label('child_count')) \
+        .join(NodeAncestry, NodeAncestry.descendant_id == Node.id) \
+        .where(NodeAncestry.ancestor_id == node_id, NodeAncestry.distance <= max_depth) \
+        .order_by(NodeAncestry.distance, Node.timestamp, Node.id) \
+        .limit(limit)
+
+
+def subtree_stats_query(node_id: str):
+    return select(NodeStats.descendant_count, NodeStats.max_depth_below, NodeStats.leaf_count) \
+        .where(NodeStats.node_id == node_id)
+
+
+def search_query(terms: List[str], node_type: Optional[NodeType], root_id: Optional[str], limit: int,
+                 after: Optional[Tuple[datetime, str]] = None):
+    """Selects nodes whose inline content holds every term through the MySQL
+    FULLTEXT index, newest first; under root_id via the closure table."""
+    query = select(Node).where(match(Node._content, against=" ".join(f"+{term}" for term in terms)).in_boolean_mode())
+    if node_type is not None:
+        query = query.where(Node.node_type == node_type)
+    if root_id is not None:
+        query = query.join(NodeAncestry, NodeAncestry.descendant_id == Node.id) \
+            .where(NodeAncestry.ancestor_id == root_id)
+    if after is not None:
+        timestamp, node_id = after
+        query = query.where(or_(Node.timestamp < timestamp, and_(Node.timestamp == timestamp, Node.id < node_id)))
+    return query.order_by(Node.timestamp.desc(), Node.id.desc()).limit(limit)
+
+
+def ancestor_ids_query(node_ids: List[str]):
+    return select(NodeAncestry.descendant_id, NodeAncestry.ancestor_id) \
+        .where(NodeAncestry.descendant_id.in_(node_ids)) \
+        .order_by(NodeAncestry.distance.desc())
+
+
+def group_ancestor_ids(rows) -> Dict[str, List[str]]:
+    paths: Dict[str, List[str]] = {}
+    for row in rows:
+        paths.setdefault(row.descendant_id, []).append(row.ancestor_id)
+    return paths
+
+
+def count_subtree_query(node_id: str, max_depth: int, limit: Optional[int] = None):
+    """Counts the nodes at most max_depth below node_id, itself included,
+    stopping at limit when one is given so the cost stays bounded."""
+    if limit is None:
+        return select(func.count()) \
+            .select_from(NodeAncestry) \
+            .where(NodeAncestry.ancestor_id == node_id, NodeAncestry.distance <= max_depth)
+    region = select(NodeAncestry.descendant_id) \
+        .where(NodeAncestry.ancestor_id == node_id, NodeAncestry.distance <= max_depth) \
+        .limit(limit)
+    return select(func.count()).select_from(region.subquery())
+
+
+# Adds one batch's increments to an existing node's stats; run as executemany
+STATS_UPDATE = update(NodeStats.__table__) \
+    .where(NodeStats.node_id == bindparam('b_node_id')) \
+    .values(
+        descendant_count=NodeStats.descendant_count + bindparam('b_descendants'),
+        max_depth_below=case(
+            (NodeStats.max_depth_below < bindparam('b_depth'), bindparam('b_depth')),
+            else_=NodeStats.max_depth_below
+        ),
+        leaf_count=NodeStats.leaf_count + bindparam('b_leaves')
+    )
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    metrics.count_query()
+
+
+class SQLBackend(StorageBackend):
+    """
+    StorageBackend over any SQLAlchemy engine, using the closure table for
+    path and descendant queries so no statement needs recursion.
+
+    With content_store=True new nodes keep their text in a ContentStore and
+    only its hash in conversation_nodes; nodes read back load it on first
+    access of .content, and get_path loads the whole path's in one query.
+
+    search() uses the FULLTEXT index on MySQL with inline content. Otherwise
+    it builds a SearchIndex from every stored node on first use and keeps it
+    current with inserts made through this backend, the same single-writer
+    caveat as ConversationGraph's topology index.
+    """
+
+    def __init__(self, engine: Engine, content_store: bool = False,
+                 compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD, codec: str = 'zlib',
+                 connection_lock=None):
+        self.engine = engine
+        # Held around every use of a connection, for engines whose connections
+        # can't be used by two threads at once
+        self._connection_lock = connection_lock or nullcontext()
+        event.listen(self.engine, "before_cursor_execute", count_query)
+        Base.metadata.create_all(self.engine)
+        self.content_store: Optional[ContentStore] = None
+        info = {}
+        if content_store:
+            self.content_store = ContentStore(self.engine, compress_threshold, codec,
+                                              connection_lock=self._connection_lock)
+            info['content_loader'] = self.content_store.load
+        self.Session = sessionmaker(bind=self.engine, info=info)
+        self.fulltext = self.engine.dialect.name == 'mysql' and self.content_store is None
+        self._search_index: Optional[SearchIndex] = None
+        self._search_lock = threading.Lock()
+        # Inserts committed while the index is being built, as (nodes, timestamps)
+        self._search_backlog: Optional[List[Tuple[List[Node], Dict[str, datetime]]]] = None
+        self._backlog_lock = threading.Lock()
+
+    @contextmanager
+    def get_session(self):
+        with self._connection_lock:
+            session = self.Session()
+            try:
+                yield session
+                session.commit()
+            except:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+    def insert_nodes(self, nodes: List[Node], chunk_size: int = 500) -> None:
+        batch_ids = {node.id for node in nodes}
+        external_parent_ids = list({
+            node.parent_id for node in nodes
+            if node.parent_id is not None and node.parent_id not in batch_ids
+        })
+
+        with self.get_session() as session:
+            self._begin_write(session)
+            # The new node's ancestors are its parent's ancestors one step further away
+            ancestry = {parent_id: [] for parent_id in external_parent_ids}
+            if external_parent_ids:
+                for row in session.query(NodeAncestry) \
+                        .filter(NodeAncestry.descendant_id.in_(external_parent_ids)):
+                    ancestry[row.descendant_id].append((row.ancestor_id, row.distance))
+
+            node_rows = []
+            ancestry_rows = []
+            for node in nodes:
+                node_ancestors = [(node.id, 0)]
+                if node.parent_id is not None:
+                    node_ancestors += [
+                        (ancestor_id, distance + 1) for ancestor_id, distance in ancestry[node.parent_id]
+                    ]
+                ancestry[node.id] = node_ancestors
+
+                node_rows.append({
+                    'id': node.id,
+                    'content': node.content,
+                    'content_hash': None,
+                    'node_type': node.node_type,
+                    'model_config': node.model_config,
+                    'timestamp': node.timestamp,
+                    'parent_id': node.parent_id,
+                    'depth': node.depth
+                })
+                ancestry_rows.extend(
+                    {'ancestor_id': ancestor_id, 'descendant_id': node.id, 'distance': distance}
+                    for ancestor_id, distance in node_ancestors
+                )
+
+            if self.content_store is not None:
+                hashes = self.content_store.write(session, (node.content for node in nodes))
+                for node, row in zip(nodes, node_rows):
+                    node.content_hash = row['content_hash'] = hashes[node.content]
+                    row['content'] = None
+
+            stats_rows, ancestor_deltas = self._stats_changes(session, nodes, ancestry, external_parent_ids)
+
+            # Core executemany: the driver folds each chunk into one multi-row INSERT,
+            # and the statement compiles once instead of once per distinct row count
+            for start in range(0, len(node_rows), chunk_size):
+                session.execute(insert(Node.__table__), node_rows[start:start + chunk_size])
+            for start in range(0, len(ancestry_rows), chunk_size):
+                session.execute(insert(NodeAncestry.__table__), ancestry_rows[start:start + chunk_size])
+            for start in range(0, len(stats_rows), chunk_size):
+                session.execute(insert(NodeStats.__table__), stats_rows[start:start + chunk_size])
+            if ancestor_deltas:
+                session.execute(STATS_UPDATE, ancestor_deltas)
+
+        if self._search_index is not None or self._search_backlog is not None:
+            self._index_inserted(nodes, self._stored_timestamps(nodes, chunk_size))
+
+    def _index_inserted(self, nodes: List[Node], timestamps: Dict[str, datetime]) -> None:
+        """Adds committed nodes to the search index, or queues them while the
+        index is still being built."""
+        with self._backlog_lock:
+            if self._search_backlog is not None:
+                self._search_backlog.append((nodes, timestamps))
+                return
+        self._search_index.add(nodes, timestamps)
+
+    def _begin_write(self, session) -> None:
+        """Starts an insert's transaction; the row locks taken by
+        _stats_changes are enough where SELECT ... FOR UPDATE works."""
+
+    def _stored_timestamps(self, nodes: List[Node], chunk_size: int) -> Dict[str, datetime]:
+        """Timestamps of nodes as the database kept them, which may be rounded
+        (MySQL DATETIME drops microseconds), so search keys match the cursors
+        built from nodes read back."""
+        timestamps = {}
+        with self.get_session() as session:
+            for start in range(0, len(nodes), chunk_size):
+                ids = [node.id for node in nodes[start:start + chunk_size]]
+                timestamps.update(session.execute(select(Node.id, Node.timestamp).where(Node.id.in_(ids))).all())
+        return timestamps
+
+    @staticmethod
+    def _stats_changes(session, nodes: List[Node], ancestry: Dict[str, List[Tuple[str, int]]],
+                       external_parent_ids: List[str]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Works out the conversation_node_stats rows for the new nodes and the
+        increments for their existing ancestors. The existing parents' rows are
+        locked first (see _begin_write), since whether a parent was a leaf
+        decides whether its ancestors gain a leaf, and a concurrent first child
+        would change that.
+        """
+        had_children = set()
+        if external_parent_ids:
+            for row in session.query(NodeStats.node_id, NodeStats.descendant_count) \
+                    .filter(NodeStats.node_id.in_(external_parent_ids)).with_for_update():
+                if row.descendant_count > 0:
+                    had_children.add(row.node_id)
+
+        # ancestor id -> [descendants added, deepest new distance, leaves added]
+        deltas: Dict[str, List[int]] = {}
+        for node in nodes:
+            deltas.setdefault(node.id, [0, 0, 0])
+            if node.parent_id is None:
+                continue
+            # A first child replaces its parent as a leaf; any later child adds one
+            new_leaf = 1 if node.parent_id in had_children else 0
+            had_children.add(node.parent_id)
+            for ancestor_id, distance in ancestry[node.id]:
+                if distance == 0:
+                    continue
+                delta = deltas.setdefault(ancestor_id, [0, 0, 0])
+                delta[0] += 1
+                delta[1] = max(delta[1], distance)
+                delta[2] += new_leaf
+
+        batch_ids = {node.id for node in nodes}
+        stats_rows = [
+            {'node_id': node_id, 'descendant_count': delta[0], 'max_depth_below': delta[1],
+             'leaf_count': 1 + delta[2]}
+            for node_id, delta in deltas.items() if node_id in batch_ids
+        ]
+        ancestor_deltas = [
+            {'b_node_id': node_id, 'b_descendants': delta[0], 'b_depth': delta[1], 'b_leaves': delta[2]}
+            for node_id, delta in deltas.items() if node_id not in batch_ids
+        ]
+        return stats_rows, ancestor_deltas
+
+    def _stream(self, query, batch_size: int, with_content: bool) -> Iterator[Union[Node, NodeRef]]:
+        """Runs a select over Node (with_content) or REF_COLUMNS on a
+        server-side cursor, batch_size rows per fetch."""
+        if with_content:
+            with self.get_session() as session:
+                result = session.execute(query.execution_options(yield_per=batch_size))
+                for batch in result.scalars().partitions():
+                    [session.expunge(node) for node in batch]
+                    yield from batch
+            return
+
+        with self._connection_lock, self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for row in result:
+                yield NodeRef(
+                    id=row.id,
+                    parent_id=row.parent_id,
+                    node_type=NodeType(row.node_type),
+                    depth=row.depth
+                )
+
+    def get_node(self, node_id: str) -> Optional[Node]:
+        with self.get_session() as session:
+            node = session.query(Node).filter(Node.id == node_id).first()
+            if node: session.expunge(node)
+            return node
+
+    def get_nodes(self, node_ids: List[str]) -> List[Node]:
+        with self.get_session() as session:
+            nodes = session.query(Node).filter(Node.id.in_(node_ids)).all()
+            [session.expunge(node) for node in nodes]
+            return nodes
+
+    def get_children(self, node_id: Optional[str]) -> List[Node]:
+        with self.get_session() as session:
+            nodes = session.query(Node).filter(Node.parent_id == node_id).all()
+            [session.expunge(node) for node in nodes]
+            return nodes
+
+    def iter_children(self, node_id: Optional[str], batch_size: int = 1000,
+                      with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        columns = (Node,) if with_content else REF_COLUMNS
+        query = select(*columns).where(Node.parent_id == node_id).order_by(Node.timestamp, Node.id)
+        return self._stream(query, batch_size, with_content)
+
+    def get_path(self, node_id: str) -> List[Node]:
+        with self.get_session() as session:
+            path = session.query(Node) \
+                .join(NodeAncestry, NodeAncestry.ancestor_id == Node.id) \
+                .filter(NodeAncestry.descendant_id == node_id) \
+                .order_by(NodeAncestry.distance.desc()) \
+                .all()
+            [session.expunge(node) for node in path]
+        # Callers of get_path read every node's content, so fetch it all at once
+        return self.load_content(path)
+
+    def search(self, terms: List[str], node_type: Optional[NodeType], root_id: Optional[str], limit: int,
+               after: Optional[Tuple[datetime, str]] = None) -> List[Node]:
+        if self.fulltext:
+            with self.get_session() as session:
+                nodes = session.execute(search_query(terms, node_type, root_id, limit, after)).scalars().all()
+                [session.expunge(node) for node in nodes]
+                return list(nodes)
+
+        node_ids = self._get_search_index().search(terms, node_type, root_id, limit, after)
+        nodes = {node.id: node for node in self.get_nodes(node_ids)}
+        return [nodes[node_id] for node_id in node_ids if node_id in nodes]
+
+    def _get_search_index(self, batch_size: int = 5000) -> SearchIndex:
+        """The in-process search index, built by streaming every tree on first use."""
+        with self._search_lock:
+            if self._search_index is not None:
+                return self._search_index
+
+            # Inserts committed during the scan are queued and added before the
+            # index is published, so none are missed or indexed without their parent
+            with self._backlog_lock:
+                self._search_backlog = []
+            index = SearchIndex()
+            try:
+                root_ids = [ref.id for ref in self.iter_children(None, batch_size, with_content=False)]
+                for root_id in root_ids:
+                    nodes = self.iter_subtree(root_id, batch_size)
+                    while True:
+                        batch = list(islice(nodes, batch_size))
+                        if not batch:
+                            break
+                        index.add(self.load_content(batch))
+            except:
+                with self._backlog_lock:
+                    self._search_backlog = None
+                raise
+
+            with self._backlog_lock:
+                # Concurrent inserts can queue a child before its parent
+                queued = sorted(
+                    ((node, timestamps) for nodes, timestamps in self._search_backlog for node in nodes),
+                    key=lambda item: item[0].depth
+                )
+                for node, timestamps in queued:
+                    index.add([node], timestamps)
+                self._search_index = index
+                self._search_backlog = None
+            return index
+
+    def get_ancestor_ids(self, node_ids: List[str]) -> Dict[str, List[str]]:
+        with self.get_session() as session:
+            return group_ancestor_ids(session.execute(ancestor_ids_query(node_ids)))
+
+    def get_node_view(self, node_id: str, limit: int) \
+            -> Optional[Tuple[Node, List[Tuple[Node, int]], List[Tuple[Node, int]]]]:
+        with self.get_session() as session:
+            rows = session.execute(node_view_query(node_id, limit)).all()
+            session.expunge_all()
+            return split_node_view(rows)
+
+    def get_children_page(self, parent_id: Optional[str], limit: int,
+                          after: Optional[Tuple[datetime, str]] = None,
+                          exclude_id: Optional[str] = None) -> List[Tuple[Node, int]]:
+        with self.get_session() as session:
+            rows = session.execute(children_page_query(parent_id, limit, after, exclude_id)).all()
+            [session.expunge(row.Node) for row in rows]
+            return [(row.Node, row.child_count) for row in rows]
+
+    def get_leaf_nodes(self) -> List[Node]:
+        child = aliased(Node)
+        with self.get_session() as session:
+            nodes = session.query(Node) \
+                .outerjoin(child, child.parent_id == Node.id) \
+                .filter(child.id == None) \
+                .all()
+            [session.expunge(node) for node in nodes]
+            return nodes
+
+    def iter_leaf_nodes(self, batch_size: int = 1000,
+                        with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        child = aliased(Node)
+        columns = (Node,) if with_content else REF_COLUMNS
+        query = select(*columns) \
+            .outerjoin(child, child.parent_id == Node.id) \
+            .where(child.id == None)
+        return self._stream(query, batch_size, with_content)
+
+    def iter_subtree(self, node_id: str, batch_size: int = 1000,
+                     with_content: bool = True) -> Iterator[Union[Node, NodeRef]]:
+        columns = (Node,) if with_content else REF_COLUMNS
+        query = select(*columns) \
+            .join(NodeAncestry, NodeAncestry.descendant_id == Node.id) \
+            .where(NodeAncestry.ancestor_id == node_id) \
+            .order_by(NodeAncestry.distance)
+        return self._stream(query, batch_size, with_content)
+
+    def get_subtree(self, node_id: str, max_depth: int, limit: int) -> List[Tuple[Node, int]]:
+        with self.get_session() as session:
+            rows = session.execute(subtree_query(node_id, max_depth, limit)).all()
+            [session.expunge(row.Node) for row in rows]
+            return [(row.Node, row.child_count) for row in rows]
+
+    def count_subtree(self, node_id: str, max_depth: int) -> int:
+        with self.get_session() as session:
+            return session.execute(count_subtree_query(node_id, max_depth)).scalar() or 0
+
+    def count_descendants(self, node_id: str) -> int:
+        with self.get_session() as session:
+            return session.query(NodeStats.descendant_count) \
+                .filter(NodeStats.node_id == node_id) \
+                .scalar() or 0
+
+    def get_subtree_stats(self, node_id: str) -> Optional[SubtreeStats]:
+        with self.get_session() as session:
+            row = session.execute(subtree_stats_query(node_id)).first()
+            return SubtreeStats(*row) if row else None
+
+    def iter_transitions(self, since: Optional[datetime] = None) -> Iterator[Transition]:
+        parent = aliased(Node)
+        query = select(Node.id, Node.parent_id, Node.node_type, parent.node_type.label('parent_type')) \
+            .outerjoin(parent, parent.id == Node.parent_id)
+        if since is not None:
+            query = query.where(Node.timestamp >= since)
+
+        with self._connection_lock, self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query)
+            for row in result:
+                yield Transition(
+                    id=row.id,
+                    parent_id=row.parent_id,
+                    node_type=NodeType(row.node_type),
+                    parent_type=NodeType(row.parent_type) if row.parent_type else None
+                )
+
+    def iter_topology(self) -> Iterator[NodeRef]:
+        query = select(*REF_COLUMNS).order_by(Node.timestamp, Node.id)
+        return self._stream(query, 10_000, with_content=False)
+
+    def latest_timestamp(self) -> Optional[datetime]:
+        with self.get_session() as session:
+            return session.query(func.max(Node.timestamp)).scalar()
+
+    def get_metadata(self, key: str) -> Optional[str]:
+        with self.get_session() as session:
+            entry = session.query(GraphMetadata).filter(GraphMetadata.key == key).first()
+            return entry.value if entry else None
+
+    def set_metadata(self, key: str, value: str) -> None:
+        with self.get_session() as session:
+            updated = session.query(GraphMetadata).filter(GraphMetadata.key == key).update({'value': value})
+            if updated:
+                return
+
+            try:
+                with session.begin_nested():
+                    session.add(GraphMetadata(key=key, value=value))
+            except IntegrityError:
+                # Another process created the key first; overwrite it as usual
+                session.query(GraphMetadata).filter(GraphMetadata.key == key).update({'value': value})
+
+    def load_content(self, nodes: List[Node]) -> List[Node]:
+        if self.content_store is not None:
+            self.content_store.fill(nodes)
+        return nodes
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+class MySQLBackend(SQLBackend):
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 pool_size: int = 10, max_overflow: int = 20, **kwargs):
+        db_url = f"mysql+mysqlconnector://{user}:{password}@{host}/{database}"
+        super().__init__(create_engine(
+            db_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True
+        ), **kwargs)
+
+
+class SQLiteBackend(SQLBackend):
+    """
+    Single-file (or in-memory, with path=":memory:") backend for local runs,
+    tests and single-node deployments. WAL lets readers proceed while a write
+    commits; synchronous=NORMAL skips the per-commit fsync that WAL makes safe
+    to skip, and busy_timeout makes concurrent writers wait instead of failing.
+
+    The in-memory database lives on a single connection, so threads take
+    turns with it under a lock rather than interleaving their transactions.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=30000",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA mmap_size=268435456",
+    )
+
+    def __init__(self, path: str = ":memory:", **kwargs):
+        connection_lock = None
+        if path == ":memory:":
+            # One shared connection, or every pooled connection gets its own empty database
+            engine = create_engine(
+                "sqlite://",
+                poolclass=StaticPool,
+                connect_args={"check_same_thread": False}
+            )
+            # Reentrant, since a thread may read while streaming a query of its own
+            connection_lock = threading.RLock()
+        else:
+            engine = create_engine(
+                f"sqlite:///{path}",
+                connect_args={"check_same_thread": False, "timeout": 30}
+            )
+
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in self.PRAGMAS:
+                cursor.execute(pragma)
+            cursor.close()
+
+        super().__init__(engine, connection_lock=connection_lock, **kwargs)
+
+    def _begin_write(self, session) -> None:
+        # SQLite ignores FOR UPDATE, and pysqlite only sends BEGIN before the
+        # first write, so the parents' stats would be read outside any lock.
+        # Taking the write lock up front makes concurrent inserts queue instead.
+        session.execute(text("BEGIN IMMEDIATE"))
@@ -1,10 +1,39 @@
-from fastapi import FastAPI, HTTPException
+import json
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Callable, Awaitable
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from ..conversation_graph.config import MYSQL_CONFIG
-from ..conversation_graph.graph.conversation_graph import ConversationGraph, NodeType
+from ..conversation_graph.graph.async_conversation_graph import AsyncConversationGraph
+from ..conversation_graph.graph.conversation_graph import NodeType, Node, SUBTREE_MAX_NODES
+from ..conversation_graph.metrics import metrics
+from ..conversation_graph.graph.pagination import Page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .http_cache import HTTPResponseCache
+
+graph = AsyncConversationGraph(**MYSQL_CONFIG)
+response_cache = HTTPResponseCache()
+metrics.register_collector("http_response_cache", response_cache.stats)
+
+# Node rows are never updated, so anything derived from one node alone can be
+# cached for good; child lists only grow and are revalidated after a few seconds.
+# Agents write from their own processes, so CHILD_LIST_TTL is the only bound on
+# how stale a cached child list, subtree or search page can be.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHILD_LIST_TTL = 5
+CHILD_LIST_CACHE_CONTROL = f"private, max-age={CHILD_LIST_TTL}"
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await graph.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -13,54 +42,257 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-graph = ConversationGraph(**MYSQL_CONFIG)
+
+PageSize = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+# Characters of content to return per node; longer content is cut and flagged
+Truncate = Query(None, ge=0)
+
+
+def node_json(node: Node, truncate: Optional[int] = None) -> Dict[str, Any]:
+    data = node.to_dict()
+    if truncate is not None and len(node.content) > truncate:
+        data["content"] = node.content[:truncate]
+        data["content_truncated"] = True
+    return data
+
+
+def page_tags(page: Page) -> List[str]:
+    """Each listed node's has_children flag depends on its own child list."""
+    return [node.id for node, _ in page.items]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+async def cached_json(request: Request, build: Callable[[], Awaitable[Tuple[Dict[str, Any], Iterable[Optional[str]]]]],
+                      cache_control: str, ttl: Optional[float] = None, etag: Optional[str] = None) -> Response:
+    """
+    Serves the response for this path and query from response_cache, calling
+    build() for the body and its invalidation tags only on a miss. A matching
+    If-None-Match gets a 304 either way.
+    """
+    key = f"{request.url.path}?{request.url.query}"
+    entry = response_cache.get(key)
+    if entry is None:
+        data, tags = await build()
+        body = json.dumps(jsonable_encoder(data), separators=(",", ":")).encode()
+        entry = response_cache.put(key, body, tags=tags, ttl=ttl, etag=etag)
+
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def page_json(page: Page, truncate: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "items": [
+            {**node_json(node, truncate), "has_children": child_count > 0, "children": None}
+            for node, child_count in page.items
+        ],
+        "next_cursor": page.next_cursor
+    }
 
 
 @app.get("/api/nodes/{node_id}")
-async def get_node_and_children(node_id: str):
-    try:
-        node = graph.get_node(node_id)
-        if not node:
+async def get_node_and_children(node_id: str, request: Request, limit: int = PageSize,
+                                truncate: Optional[int] = Truncate):
+    """The node with the first page of its children and of its siblings, from
+    one query; use the children/siblings endpoints with the returned cursors
+    for the rest."""
+    async def build():
+        view = await graph.get_node_view(node_id, limit)
+        if not view:
             raise HTTPException(status_code=404, detail="Node not found")
 
-        children = graph.get_children(node_id)
-        siblings = graph.get_siblings(node_id)
-
-        return {
-            **node.to_dict(),
-            "has_children": len(children) > 0,
-            "children": [
-                {
-                    **child.to_dict(),
-                    "has_children": len(graph.get_children(child.id)) > 0,
-                    "children": None
-                }
-                for child in children
-            ],
-            "siblings": [sibling.to_dict() for sibling in siblings]
+        node, children, siblings = view
+        data = {
+            **node_json(node, truncate),
+            "has_children": len(children.items) > 0,
+            "children": page_json(children, truncate)["items"],
+            "children_cursor": children.next_cursor,
+            "siblings": page_json(siblings, truncate)["items"],
+            "siblings_cursor": siblings.next_cursor
         }
+        return data, [node.id, node.parent_id, *page_tags(children), *page_tags(siblings)]
+
+    try:
+        return await cached_json(request, build, CHILD_LIST_CACHE_CONTROL, ttl=CHILD_LIST_TTL)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/nodes/{node_id}/content")
+async def get_node_content(node_id: str, request: Request, truncate: Optional[int] = Truncate):
+    """
+    The node alone. Its row never changes, so the ETag is fixed by the id and
+    truncation and a matching If-None-Match is answered without any lookup.
+    """
+    etag = f'"{node_id}-{truncate}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+    async def build():
+        node = await graph.get_node(node_id)
+        if not node:
+            raise HTTPException(status_code=404, detail="Node not found")
+        return node_json(node, truncate), []
+
+    return await cached_json(request, build, IMMUTABLE_CACHE_CONTROL, etag=etag)
+
+
+@app.get("/api/nodes/{node_id}/children")
+async def get_children_page(node_id: str, request: Request, limit: int = PageSize, cursor: Optional[str] = None,
+                            truncate: Optional[int] = Truncate):
+    async def build():
+        page = await graph.get_children_page(node_id, limit, cursor)
+        return page_json(page, truncate), [node_id, *page_tags(page)]
+
+    try:
+        return await cached_json(request, build, CHILD_LIST_CACHE_CONTROL, ttl=CHILD_LIST_TTL)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/nodes/{node_id}/siblings")
+async def get_siblings_page(node_id: str, request: Request, limit: int = PageSize, cursor: Optional[str] = None,
+                            truncate: Optional[int] = Truncate):
+    async def build():
+        page = await graph.get_siblings_page(node_id, limit, cursor)
+        parent = await graph.get_node(node_id)
+        return page_json(page, truncate), [parent.parent_id if parent else None, *page_tags(page)]
+
+    try:
+        return await cached_json(request, build, CHILD_LIST_CACHE_CONTROL, ttl=CHILD_LIST_TTL)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+SUBTREE_MAX_DEPTH = 20
+
+
+def subtree_json(node_id: str, depth: int, rows: List[Tuple[Node, int]], truncate: int) -> Dict[str, Any]:
+    """Columnar encoding: parallel arrays, with each node's parent given as an
+    index into them (-1 for the requested node)."""
+    positions = {}
+    columns = {"ids": [], "parents": [], "types": [], "content": [], "child_counts": []}
+    for node, child_count in rows[:SUBTREE_MAX_NODES]:
+        positions[node.id] = len(columns["ids"])
+        columns["ids"].append(node.id)
+        columns["parents"].append(positions.get(node.parent_id, -1) if node.id != node_id else -1)
+        columns["types"].append(node.node_type.value)
+        columns["content"].append(node.content[:truncate])
+        columns["child_counts"].append(child_count)
+    return {"root": node_id, "depth": depth, "truncated": len(rows) > SUBTREE_MAX_NODES, **columns}
+
+
+@app.get("/api/nodes/{node_id}/subtree")
+async def get_subtree(node_id: str, request: Request,
+                      depth: int = Query(3, ge=0, le=SUBTREE_MAX_DEPTH),
+                      truncate: int = Query(200, ge=0)):
+    """
+    The region up to depth levels below the node in one response. Nodes are
+    only ever added, so the number of nodes down to one level past the region
+    (which also fixes the frontier's child counts) identifies its contents and
+    serves as the ETag; a matching If-None-Match gets a 304 after that count alone.
+    The count stops just past SUBTREE_MAX_NODES; larger regions use the node's
+    stored descendant count instead, which grows whenever the region does.
+    """
+    count = await graph.count_subtree(node_id, depth + 1, limit=SUBTREE_MAX_NODES + 1)
+    if count == 0:
+        raise HTTPException(status_code=404, detail="Node not found")
+    version = str(count)
+    if count > SUBTREE_MAX_NODES:
+        stats = await graph.get_subtree_stats(node_id)
+        version = f"all{stats.descendant_count}" if stats else str(await graph.count_subtree(node_id, depth + 1))
+
+    etag = f'"{node_id}-{depth}-{truncate}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    rows = await graph.get_subtree(node_id, depth, SUBTREE_MAX_NODES + 1)
+    return JSONResponse(subtree_json(node_id, depth, rows, truncate), headers=headers)
+
+
 @app.get("/api/roots")
-async def get_root_nodes():
-    return [
-        node.to_dict()
-        for node in graph.get_children(None)
-        if node.node_type == NodeType.SYSTEM
-    ]
+async def get_root_nodes(request: Request, limit: int = PageSize, cursor: Optional[str] = None,
+                         truncate: Optional[int] = Truncate):
+    async def build():
+        page = await graph.get_children_page(None, limit, cursor)
+        roots = Page(items=[(node, count) for node, count in page.items if node.node_type == NodeType.SYSTEM],
+                     next_cursor=page.next_cursor)
+        return page_json(roots, truncate), [None, *page_tags(roots)]
+
+    try:
+        return await cached_json(request, build, CHILD_LIST_CACHE_CONTROL, ttl=CHILD_LIST_TTL)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/search")
+async def search_nodes(request: Request, q: str = Query(..., min_length=1, max_length=500),
+                       node_type: Optional[NodeType] = None, root_id: Optional[str] = None,
+                       limit: int = PageSize, cursor: Optional[str] = None):
+    """
+    Nodes whose content contains every word of q, newest first, each with a
+    snippet and its path of ids from the root so the client can open it in
+    place. Results may lag new nodes by CHILD_LIST_TTL seconds.
+    """
+    async def build():
+        page = await graph.search(q, node_type, root_id, limit, cursor)
+        items = [
+            {
+                "id": hit.node.id,
+                "node_type": hit.node.node_type.value,
+                "parent_id": hit.node.parent_id,
+                "timestamp": hit.node.timestamp,
+                "snippet": hit.snippet,
+                "path": hit.path
+            }
+            for hit in page.items
+        ]
+        return {"items": items, "next_cursor": page.next_cursor}, []
+
+    try:
+        return await cached_json(request, build, CHILD_LIST_CACHE_CONTROL, ttl=CHILD_LIST_TTL)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Timings, query counts and cache stats for everything running in this
+    process, in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/api/nodes/{node_id}/descendants/count")
 async def get_descendant_count(node_id: str):
     try:
-        count = graph.count_descendants(node_id)
+        count = await graph.count_descendants(node_id)
         return {"count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/nodes/{node_id}/stats")
+async def get_subtree_stats(node_id: str):
+    stats = await graph.get_subtree_stats(node_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return stats._asdict()
+
+
 if __name__ == "__main__":
     import uvicorn
 
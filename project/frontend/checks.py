@@ -0,0 +1,126 @@
+"""
+Behavioural checks for the API's response cache, run without a database:
+HTTPResponseCache directly, and cached_json() behind a scratch route.
+
+    python -m project.frontend.checks
+"""
+import sys
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from ..conversation_graph.graph.conversation_graph import ConversationGraph, Node, NodeType
+from . import api
+from .http_cache import HTTPResponseCache
+
+
+def _child_of(parent_id: str) -> Node:
+    return Node(id=f"child-of-{parent_id}", parent_id=parent_id, node_type=NodeType.PROMPT)
+
+
+def check_tag_invalidation() -> None:
+    cache = HTTPResponseCache()
+    cache.put("children-a", b"[]", tags=["a"])
+    cache.put("children-a-and-b", b"[]", tags=["a", "b"])
+    cache.put("children-b", b"[]", tags=["b"])
+    cache.put("roots", b"[]", tags=[None])
+
+    graph = ConversationGraph.in_memory()
+    graph.add_write_listener(cache.invalidate_nodes)
+    graph.create_root("check system", {})
+    assert cache.get("roots") is None, "a new root should drop cached root lists"
+    assert cache.get("children-a") is not None, "unrelated entries should stay"
+
+    cache.invalidate_nodes([_child_of("a")])
+    assert cache.get("children-a") is None and cache.get("children-a-and-b") is None, \
+        "entries tagged with the parent should be dropped"
+    assert cache.get("children-b") is not None, "entries tagged only with other parents should stay"
+    cache.invalidate_nodes([_child_of("b")])
+    assert cache.get("children-b") is None, "the other tag of a dropped entry should still work"
+    assert cache.stats()["entries"] == 0 and cache.stats()["invalidations"] == 4, f"wrong stats {cache.stats()}"
+
+
+def check_expiry_and_eviction() -> None:
+    cache = HTTPResponseCache(max_entries=2)
+    cache.put("expired", b"{}", ttl=-1)
+    assert cache.get("expired") is None, "an entry past its ttl should miss"
+    cache.put("one", b"1")
+    cache.put("two", b"2")
+    cache.get("one")
+    cache.put("three", b"3")
+    assert cache.get("two") is None, "the least recently used entry should be evicted"
+    assert cache.get("one").body == b"1" and cache.get("three").body == b"3", "recent entries should stay"
+    assert cache.put("fixed", b"x", etag='"v1"').etag == '"v1"', "a given etag should be kept"
+    assert cache.put("hashed", b"x").etag == cache.put("hashed-again", b"x").etag, \
+        "same body should give the same etag"
+
+
+def check_revalidation() -> None:
+    builds: List[str] = []
+    app = FastAPI()
+
+    @app.get("/scratch/{name}")
+    async def scratch(name: str, request: Request):
+        async def build():
+            builds.append(name)
+            return {"name": name, "built": len(builds)}, [name]
+        return await api.cached_json(request, build, api.CHILD_LIST_CACHE_CONTROL, ttl=api.CHILD_LIST_TTL)
+
+    api.response_cache.clear()
+    client = TestClient(app)
+    first = client.get("/scratch/a")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.json() == {"name": "a", "built": 1}, "first request should build"
+    assert first.headers["cache-control"] == api.CHILD_LIST_CACHE_CONTROL, "wrong Cache-Control"
+
+    again = client.get("/scratch/a")
+    assert again.status_code == 200 and again.json() == first.json() and builds == ["a"], \
+        "repeat request should come from the cache"
+    not_modified = client.get("/scratch/a", headers={"If-None-Match": f'"stale", {etag}'})
+    assert not_modified.status_code == 304 and not not_modified.content, "matching If-None-Match should get a 304"
+    assert not_modified.headers["etag"] == etag, "304 should repeat the ETag"
+    assert client.get("/scratch/a", headers={"If-None-Match": '"stale"'}).status_code == 200, \
+        "a stale ETag should get the body"
+
+    api.response_cache.invalidate_nodes([_child_of("a")])
+    rebuilt = client.get("/scratch/a", headers={"If-None-Match": etag})
+    assert rebuilt.status_code == 200 and rebuilt.json()["built"] == 2, "invalidated entry should be rebuilt"
+    assert rebuilt.headers["etag"] != etag, "changed body should get a new ETag"
+
+    # Node content is immutable, so its ETag is answered without a lookup
+    content_etag = '"some-node-None"'
+    response = TestClient(api.app).get("/api/nodes/some-node/content", headers={"If-None-Match": content_etag})
+    assert response.status_code == 304 and response.headers["cache-control"] == api.IMMUTABLE_CACHE_CONTROL, \
+        "matching content ETag should get an immutable 304"
+    api.response_cache.clear()
+
+
+CHECKS = [
+    check_tag_invalidation,
+    check_expiry_and_eviction,
+    check_revalidation,
+]
+
+
+def run_checks() -> List[str]:
+    """Runs every check and returns the failures."""
+    failures = []
+    for check in CHECKS:
+        try:
+            check()
+        except AssertionError as e:
+            failures.append(f"{check.__name__}: {e}")
+    return failures
+
+
+def main():
+    failures = run_checks()
+    print(f"frontend: {'ok' if not failures else 'FAILED'}")
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
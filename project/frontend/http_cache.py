@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple, NamedTuple
+
+from ..conversation_graph.graph.models import Node
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires: Optional[float]
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class HTTPResponseCache:
+    """
+    Serialized API responses keyed on path and query, so repeat views are
+    answered without touching the database.
+
+    Each entry is tagged with the parent ids whose child lists it shows.
+    invalidate_nodes() drops every entry tagged with the parent of a new node,
+    for a ConversationGraph write listener in a process that both writes and
+    serves. The API process only reads, so there writes are picked up when an
+    entry's ttl runs out; entries with no ttl (immutable node content) only
+    leave through LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[Optional[str], Set[str]] = {}
+        self._tags_by_key: Dict[str, List[Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: bytes, tags: Iterable[Optional[str]] = (),
+            ttl: Optional[float] = None, etag: Optional[str] = None) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag=etag or body_etag(body),
+            expires=time.monotonic() + ttl if ttl is not None else None
+        )
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._tags_by_key[key] = list(tags)
+            for tag in self._tags_by_key[key]:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def _drop(self, key: str) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        for tag in self._tags_by_key.pop(key, []):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate_nodes(self, nodes: List[Node]) -> None:
+        with self._lock:
+            for node in nodes:
+                for key in list(self._keys_by_tag.get(node.parent_id, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._tags_by_key.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
@@ -11,8 +11,8 @@ export function App() {
         const initializeApp = async () => {
             try {
                 const roots = await api.fetchRoots();
-                if (roots.length > 0) {
-                    const rootData = await api.fetchNode(roots[0].id);
+                if (roots.items.length > 0) {
+                    const rootData = await api.fetchNode(roots.items[0].id);
                     addNodes({ [rootData.id]: rootData });
                     await selectNode(rootData.id);
                 }
@@ -1,3 +1,5 @@
+import { Page } from './types';
+
 export const api = {
     async fetchNode(nodeId: string) {
         const response = await fetch(`http://localhost:8000/api/nodes/${nodeId}`);
@@ -5,12 +7,20 @@ export const api = {
         return response.json();
     },
 
-    async fetchRoots() {
-        const response = await fetch('http://localhost:8000/api/roots');
+    async fetchRoots(cursor?: string): Promise<Page> {
+        const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`http://localhost:8000/api/roots${params}`);
         if (!response.ok) throw new Error('Failed to fetch roots');
         return response.json();
     },
 
+    async fetchChildren(nodeId: string, cursor?: string): Promise<Page> {
+        const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`http://localhost:8000/api/nodes/${nodeId}/children${params}`);
+        if (!response.ok) throw new Error('Failed to fetch children');
+        return response.json();
+    },
+
     async fetchPath(nodeId: string) {
         const path = [];
         let currentNode = await this.fetchNode(nodeId);
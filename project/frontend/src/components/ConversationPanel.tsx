@@ -7,7 +7,7 @@ interface ConversationPanelProps {
 }
 
 export const ConversationPanel: React.FC<ConversationPanelProps> = ({ path }) => {
-    const { nodesData, selectNode, expandedNodes, toggleNode } = useNodeStore();
+    const { nodesData, selectNode, expandedNodes, toggleNode, loadMoreChildren } = useNodeStore();
     const selectedNodeRef = useRef<HTMLDivElement>(null);
 
     const handleKeyDown = async (event: KeyboardEvent) => {
@@ -38,12 +38,25 @@ export const ConversationPanel: React.FC<ConversationPanelProps> = ({ path }) =>
             case 'ArrowLeft':
             case 'ArrowRight': {
                 const parentNode = currentNode.parent_id ? nodesData[currentNode.parent_id] : null;
-                if (!parentNode?.children || parentNode.children.length <= 1) return;
+                if (!parentNode?.children || (parentNode.children.length <= 1 && !parentNode.children_cursor)) return;
 
                 const siblings = parentNode.children;
                 const currentIndex = siblings.findIndex(node => node.id === currentNode.id);
                 if (currentIndex === -1) return;
 
+                // Past the loaded siblings, fetch the next page instead of wrapping around
+                if (parentNode.children_cursor) {
+                    if (event.key === 'ArrowLeft' && currentIndex === 0) return;
+                    if (event.key === 'ArrowRight' && currentIndex === siblings.length - 1) {
+                        await loadMoreChildren(parentNode.id);
+                        const loaded = useNodeStore.getState().nodesData[parentNode.id]?.children ?? siblings;
+                        if (loaded.length > siblings.length) {
+                            await selectNode(loaded[currentIndex + 1].id);
+                        }
+                        return;
+                    }
+                }
+
                 const newIndex = event.key === 'ArrowLeft'
                     ? (currentIndex - 1 + siblings.length) % siblings.length
                     : (currentIndex + 1) % siblings.length;
@@ -98,7 +111,7 @@ export const ConversationPanel: React.FC<ConversationPanelProps> = ({ path }) =>
         }
 
         const parentNode = node.parent_id ? nodesData[node.parent_id] : null;
-        if (parentNode?.children && parentNode.children.length > 1) {
+        if (parentNode?.children && (parentNode.children.length > 1 || parentNode.children_cursor)) {
             hints.push('← → Siblings');
         }
 
@@ -151,9 +164,18 @@ export const ConversationPanel: React.FC<ConversationPanelProps> = ({ path }) =>
                                 )}
                                 {nodesData[node.id]?.has_children && (
                                     <div className="mt-2 text-xs text-gray-500">
-                                        Has child nodes ({nodesData[node.id]?.children?.length || '?'})
+                                        Has child nodes ({nodesData[node.id]?.children?.length || '?'}
+                                        {nodesData[node.id]?.children_cursor ? '+' : ''})
                                     </div>
                                 )}
+                                {nodesData[node.id]?.children_cursor && (
+                                    <button
+                                        className="mt-2 text-xs px-2 py-1 bg-blue-100 rounded text-blue-700"
+                                        onClick={() => loadMoreChildren(node.id)}
+                                    >
+                                        Load more children
+                                    </button>
+                                )}
                             </>
                         )}
                     </div>
@@ -12,11 +12,20 @@ interface NodeStore {
 
     addNodes: (nodes: Record<string, Node>) => void;
     toggleNode: (nodeId: string) => Promise<void>;
+    loadMoreChildren: (nodeId: string) => Promise<void>;
     selectNode: (nodeId: string) => Promise<void>;
     setHoveredPath: (path: Node[]) => void;
     handleNodeClick: (nodeId: string) => Promise<void>;
 }
 
+// Children arrive a page at a time, so a refetched node keeps the longer list
+const mergeNode = (existing: Node | undefined, incoming: Node): Node => {
+    if (!existing?.children || (incoming.children && incoming.children.length >= existing.children.length)) {
+        return incoming;
+    }
+    return { ...incoming, children: existing.children, children_cursor: existing.children_cursor };
+};
+
 export const useNodeStore = create<NodeStore>((set: SetState<NodeStore>, get: GetState<NodeStore>) => ({
     nodesData: {},
     expandedNodes: new Set<string>(),
@@ -35,9 +44,49 @@ export const useNodeStore = create<NodeStore>((set: SetState<NodeStore>, get: Ge
             newNodes: newKeys.filter(k => !existingKeys.includes(k))
         });
 
-        set((state) => ({
-            nodesData: { ...state.nodesData, ...nodes }
-        }));
+        set((state) => {
+            const nodesData = { ...state.nodesData };
+            Object.values(nodes).forEach(node => {
+                nodesData[node.id] = mergeNode(state.nodesData[node.id], node);
+            });
+            return { nodesData };
+        });
+    },
+
+    loadMoreChildren: async (nodeId: string) => {
+        const node = get().nodesData[nodeId];
+        if (!node?.children_cursor) return;
+
+        try {
+            const page = await api.fetchChildren(nodeId, node.children_cursor);
+            console.log('Loaded more children:', {
+                nodeId,
+                childCount: page.items.length,
+                hasMore: !!page.next_cursor
+            });
+
+            const nodesToAdd: Record<string, Node> = {};
+            page.items.forEach(child => {
+                nodesToAdd[child.id] = child;
+            });
+            get().addNodes(nodesToAdd);
+
+            set((state) => ({
+                nodesData: {
+                    ...state.nodesData,
+                    [nodeId]: {
+                        ...state.nodesData[nodeId],
+                        children: [...(state.nodesData[nodeId].children ?? []), ...page.items],
+                        children_cursor: page.next_cursor
+                    }
+                }
+            }));
+        } catch (error) {
+            console.error('Failed to load more children:', {
+                nodeId,
+                error: error instanceof Error ? error.message : 'Unknown error'
+            });
+        }
     },
 
     toggleNode: async (nodeId: string) => {
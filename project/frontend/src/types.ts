@@ -5,9 +5,18 @@ export interface Node {
     content: string;
     timestamp: string;
     has_children: boolean;
-    children?: Node[];
+    children?: Node[] | null;
+    children_cursor?: string | null;
+    siblings?: Node[];
+    siblings_cursor?: string | null;
+    content_truncated?: boolean;
     model_config?: {
         model: string;
         [key: string]: any;
     };
-}
\ No newline at end of file
+}
+
+export interface Page {
+    items: Node[];
+    next_cursor: string | null;
+}
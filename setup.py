@@ -7,10 +7,14 @@ setup(
     install_requires=[
         "anthropic",
         "fastapi",
-        "sqlalchemy",
+        "sqlalchemy[asyncio]",
         "setuptools",
         "python-dotenv",
         "mysql-connector-python",
+        "aiomysql",
         "uvicorn"
-    ]
+    ],
+    extras_require={
+        "export": ["pyarrow"]
+    }
 )